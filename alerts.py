@@ -0,0 +1,352 @@
+"""价格提醒：按市场和字段建立索引的规则引擎
+
+规则保存在 JSON 文件中（见 alerts.example.json），每条规则形如：
+
+    {"id": "btc-100k", "market": "bitcoin-above-100k-on-friday", "field": "yes", "op": ">=", "value": 80}
+    {"market": "*", "field": "move", "window": 300, "op": "<=", "value": -10}
+    {"market": "*", "field": "spread", "op": ">", "value": 3}
+    {"symbol": "BTCUSDT", "field": "price", "op": "<", "value": 60000}
+    {"market": "...", "field": "yes", "op": ">=", "value": 60,
+     "binance": {"symbol": "BTCUSDT", "op": "<", "value": 65000}}
+
+字段：yes、no（美分）、spread（|yes + no - 100|）、move（window 秒内 Yes 的涨跌百分比）、
+price（币安价格）。binance 为附加条件，在规则触发时用最新币安价格检查。
+规则在条件由不满足变为满足时触发一次，之后在 cooldown 秒内不会重复触发。
+
+监控线程只把价格放入队列；规则在引擎自己的线程中评估，通知在另一个线程中发送，
+慢的 webhook 或桌面通知不会拖慢抓取。
+"""
+import json
+import logging
+import math
+import operator
+import os
+import platform
+import queue
+import shutil
+import subprocess
+import threading
+import time
+from collections import deque
+import requests
+import metrics
+from markets import market_id_from_href, parse_cents
+
+OPS = {
+    '>': operator.gt,
+    '>=': operator.ge,
+    '<': operator.lt,
+    '<=': operator.le,
+    '==': operator.eq,
+    '!=': operator.ne
+}
+MARKET_FIELDS = ('yes', 'no', 'spread', 'move')
+
+ALERTS_FIRED = metrics.counter('alerts_fired_total', '触发的价格提醒次数', label='channel')
+ALERT_EVAL = metrics.histogram('alert_eval_seconds', '评估一个价格对应规则的耗时')
+ALERT_DROPPED = metrics.counter('alert_ticks_dropped_total', '评估队列已满时丢弃的价格数')
+
+
+class Rule:
+    def __init__(self, rule_id, key, field, op, value, window=None, gate=None, notify=None, cooldown=300):
+        if op not in OPS:
+            raise ValueError(f"不支持的比较符: {op}")
+        self.id = rule_id
+        self.key = key          # 市场标识、'*'（所有市场）或币安交易对
+        self.field = field
+        self.op = op
+        self.compare = OPS[op]
+        self.value = float(value)
+        self.window = window    # move 字段的时间窗口（秒）
+        self.gate = gate        # (交易对, 比较函数, 比较符, 阈值) 或 None
+        self.notify = notify    # None 表示使用默认通知方式
+        self.cooldown = cooldown
+        self.active = {}        # 市场 -> 条件当前是否满足（'*' 规则按市场分别记录）
+        self.last_fired = {}
+
+    @classmethod
+    def from_dict(cls, data, index, default_cooldown=300):
+        field = data.get('field', 'yes')
+        if 'symbol' in data:
+            key = data['symbol'].upper()
+            field = 'price'
+        else:
+            key = data.get('market', '*')
+            if field not in MARKET_FIELDS:
+                raise ValueError(f"不支持的字段: {field}")
+        window = None
+        if field == 'move':
+            window = float(data.get('window', 300))
+        gate = None
+        if data.get('binance'):
+            cross = data['binance']
+            if cross.get('op') not in OPS:
+                raise ValueError(f"不支持的比较符: {cross.get('op')}")
+            gate = (cross['symbol'].upper(), OPS[cross['op']], cross['op'], float(cross['value']))
+        notify = data.get('notify')
+        if isinstance(notify, str):
+            notify = [notify]
+        return cls(
+            data.get('id') or f"rule-{index}", key, field, data.get('op', '>='), data['value'],
+            window=window, gate=gate, notify=notify, cooldown=float(data.get('cooldown', default_cooldown))
+        )
+
+    def describe(self, subject, value):
+        text = f"{self.id}: {subject} {self.field}"
+        if self.window:
+            text += f"({self.window:g}s)"
+        text += f"={value:g} {self.op} {self.value:g}"
+        if self.gate:
+            text += f" 且 {self.gate[0]} {self.gate[2]} {self.gate[3]:g}"
+        return text
+
+
+class MoveWindow:
+    """单个市场在一个时间窗口内的 Yes 序列，用定长环形缓冲区保存
+
+    每个价格 O(1) 追加，过期数据从队首弹出（均摊 O(1)）；容量用完时丢弃最旧的数据，
+    此时窗口实际覆盖的时间会短于 window。
+    """
+
+    def __init__(self, window, capacity=2048):
+        self.window = window
+        self.values = deque(maxlen=capacity)  # (时间, Yes)
+
+    def add(self, now, value):
+        self.values.append((now, value))
+        limit = now - self.window
+        while len(self.values) > 1 and self.values[0][0] < limit:
+            self.values.popleft()
+
+    def change_pct(self):
+        first = self.values[0][1]
+        last = self.values[-1][1]
+        if first == 0:
+            return 0.0
+        return (last - first) * 100 / first
+
+
+class AlertEngine:
+    """作为消费者挂接到监控核心上的规则引擎"""
+
+    def __init__(self, rules, notifier, max_pending=10000):
+        self.notifier = notifier
+        self.index = {}    # 市场标识/'*'/交易对 -> 字段 -> [Rule]
+        self.windows = {}  # (市场, 窗口) -> MoveWindow
+        self.market_windows = {}  # 市场 -> 该市场 move 规则用到的窗口
+        self.binance = {}
+        self.ticks = queue.Queue(max_pending)
+        self.thread = None
+        for rule in rules:
+            self.index.setdefault(rule.key, {}).setdefault(rule.field, []).append(rule)
+        metrics.gauge('alert_queue_depth', '等待评估的价格数', self.ticks.qsize)
+
+    @classmethod
+    def from_file(cls, path, notifier, default_cooldown=300):
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        rules = [Rule.from_dict(item, i, default_cooldown) for i, item in enumerate(data)]
+        logging.info(f"已加载 {len(rules)} 条提醒规则")
+        return cls(rules, notifier)
+
+    def start(self):
+        self.notifier.start()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.ticks.put(None)
+        if self.thread:
+            self.thread.join(timeout=5)
+        self.notifier.stop()
+
+    # 以下三个方法在抓取/订阅线程中调用，只做入队
+    def on_markets(self, market_urls):
+        """市场重新发现后，在引擎线程中丢弃已下架市场的状态"""
+        self.put(('r', {market_id_from_href(href) for href in market_urls.values()}, None, None, None, time.time()))
+
+    def on_price(self, idx, market_id, yes_price, no_price, price_changed, url):
+        self.put(('m', market_id, yes_price, no_price, url, time.time()))
+
+    def on_binance(self, symbol, price):
+        self.put(('b', symbol, price, None, None, time.time()))
+
+    def put(self, item):
+        try:
+            self.ticks.put_nowait(item)
+        except queue.Full:
+            # 宁可漏掉个别价格也不阻塞抓取线程
+            ALERT_DROPPED.inc()
+
+    def run(self):
+        while True:
+            item = self.ticks.get()
+            if item is None:
+                return
+            try:
+                with ALERT_EVAL.time():
+                    if item[0] == 'm':
+                        self.evaluate_market(*item[1:])
+                    elif item[0] == 'r':
+                        self.retain(item[1])
+                    else:
+                        self.evaluate_binance(item[1], item[2], item[5])
+            except Exception as e:
+                logging.error(f"评估提醒规则出错: {str(e)}")
+
+    def rules_for(self, key, field):
+        """某个市场某个字段相关的规则：该市场自己的规则加上 '*' 规则"""
+        own = self.index.get(key)
+        wildcard = self.index.get('*')
+        rules = own.get(field, []) if own else []
+        if wildcard and field in wildcard:
+            rules = rules + wildcard[field]
+        return rules
+
+    def evaluate_market(self, market_id, yes_price, no_price, url, now):
+        if market_id not in self.index and '*' not in self.index:
+            return
+        yes = parse_cents(yes_price)
+        no = parse_cents(no_price)
+        if math.isnan(yes):
+            return
+        values = {'yes': yes, 'no': no}
+        if not math.isnan(no):
+            values['spread'] = abs(yes + no - 100)
+        for field, value in values.items():
+            for rule in self.rules_for(market_id, field):
+                self.check(rule, market_id, value, now, url)
+
+        move_rules = self.rules_for(market_id, 'move')
+        if move_rules:
+            windows = self.market_windows.get(market_id)
+            if windows is None:
+                windows = self.market_windows[market_id] = sorted({rule.window for rule in move_rules})
+            for window in windows:
+                series = self.windows.get((market_id, window))
+                if series is None:
+                    series = self.windows[(market_id, window)] = MoveWindow(window)
+                series.add(now, yes)
+            for rule in move_rules:
+                self.check(rule, market_id, self.windows[(market_id, rule.window)].change_pct(), now, url)
+
+    def retain(self, market_ids):
+        """只保留仍在监控的市场的价格窗口和触发状态，新的每日市场不断出现时内存不会一直增长"""
+        for key in [key for key in self.windows if key[0] not in market_ids]:
+            del self.windows[key]
+        for market_id in [m for m in self.market_windows if m not in market_ids]:
+            del self.market_windows[market_id]
+        for fields in self.index.values():
+            for field, rules in fields.items():
+                if field == 'price':
+                    continue
+                for rule in rules:
+                    for state in (rule.active, rule.last_fired):
+                        for market_id in [m for m in state if m not in market_ids]:
+                            del state[market_id]
+
+    def evaluate_binance(self, symbol, price, now):
+        self.binance[symbol] = price
+        for rule in self.index.get(symbol, {}).get('price', []):
+            self.check(rule, symbol, price, now)
+
+    def check(self, rule, subject, value, now, url=None):
+        """条件由不满足变为满足时触发，冷却期内不重复触发"""
+        matched = rule.compare(value, rule.value)
+        was_active = rule.active.get(subject, False)
+        rule.active[subject] = matched
+        if not matched or was_active:
+            return
+        if rule.gate:
+            symbol, compare, _, threshold = rule.gate
+            price = self.binance.get(symbol)
+            if price is None or not compare(price, threshold):
+                # 附加条件不满足时不算触发，下次价格满足时再检查
+                rule.active[subject] = False
+                return
+        if now - rule.last_fired.get(subject, 0) < rule.cooldown:
+            return
+        rule.last_fired[subject] = now
+        self.notifier.send(rule, rule.describe(subject, value), url)
+
+
+class Notifier:
+    """在独立线程中发送通知：log、desktop（系统通知）、webhook（POST JSON）"""
+
+    def __init__(self, channels=('log',), webhook_url=None, timeout=(3, 5)):
+        self.channels = list(channels)
+        self.webhook_url = webhook_url
+        self.timeout = timeout
+        self.outbox = queue.Queue(1000)
+        self.session = None
+        self.thread = None
+
+    def start(self):
+        self.session = requests.Session()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        try:
+            self.outbox.put_nowait(None)
+        except queue.Full:
+            pass
+        if self.thread:
+            self.thread.join(timeout=5)
+        if self.session:
+            self.session.close()
+
+    def send(self, rule, message, url=None):
+        try:
+            self.outbox.put_nowait((rule.notify or self.channels, rule.id, message, url, time.time()))
+        except queue.Full:
+            logging.warning(f"通知队列已满，丢弃提醒: {message}")
+
+    def run(self):
+        while True:
+            item = self.outbox.get()
+            if item is None:
+                return
+            channels, rule_id, message, url, fired_at = item
+            for channel in channels:
+                try:
+                    if channel == 'log':
+                        logging.warning(f"价格提醒 {message}")
+                    elif channel == 'desktop':
+                        self.desktop(message)
+                    elif channel == 'webhook' and self.webhook_url:
+                        self.session.post(self.webhook_url, json={
+                            'rule': rule_id, 'message': message, 'url': url, 'time': fired_at
+                        }, timeout=self.timeout).raise_for_status()
+                    else:
+                        continue
+                    ALERTS_FIRED.inc(channel)
+                except Exception as e:
+                    logging.error(f"发送 {channel} 提醒失败: {str(e)}")
+
+    def desktop(self, message):
+        if platform.system() == 'Darwin':
+            # AppleScript 字符串只需转义反斜杠和双引号，中文保持原样
+            text = message.replace('\\', '\\\\').replace('"', '\\"')
+            script = f'display notification "{text}" with title "Polymarket 提醒"'
+            subprocess.run(['osascript', '-e', script], timeout=5, check=False)
+        elif shutil.which('notify-send'):
+            subprocess.run(['notify-send', 'Polymarket 提醒', message], timeout=5, check=False)
+        else:
+            logging.warning(f"价格提醒 {message}")
+
+
+def create_alert_engine(config):
+    """根据 [Alerts] 配置创建规则引擎，未启用时返回 None"""
+    if not config.getboolean('Alerts', 'enabled', fallback=False):
+        return None
+    channels = [c.strip() for c in config.get('Alerts', 'notify', fallback='log').split(',') if c.strip()]
+    notifier = Notifier(channels, config.get('Alerts', 'webhook', fallback='') or None)
+    # 相对路径相对于程序目录
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), config.get('Alerts', 'rules', fallback='alerts.json'))
+    return AlertEngine.from_file(
+        path,
+        notifier,
+        default_cooldown=config.getfloat('Alerts', 'cooldown', fallback=300)
+    )
@@ -0,0 +1,199 @@
+"""每个市场的滚动统计：EMA、已实现波动率、最高/最低价和变化频率
+
+每个时间窗口（默认 1 分钟、5 分钟、1 小时）用固定数量的时间桶组成环形缓冲区，
+每个价格只更新当前桶，O(1)；读取时合并所有未过期的桶（桶数固定，也是常数时间）。
+每个市场占用的内存只与窗口数和桶数有关，与运行时长无关。
+
+batch_stats 用 numpy 从历史记录一次性重新计算相同的数值（未安装 numpy 时逐条回放），
+numpy 在第一次批量计算时才导入，不拖慢启动。
+"""
+import math
+import threading
+import time
+from array import array
+
+DEFAULT_WINDOWS = (60, 300, 3600)
+
+
+def window_label(window):
+    """60 -> '1m'，3600 -> '1h'"""
+    if window % 3600 == 0:
+        return f"{int(window // 3600)}h"
+    if window % 60 == 0:
+        return f"{int(window // 60)}m"
+    return f"{window:g}s"
+
+
+def parse_windows(text):
+    """'60,300,3600' -> (60.0, 300.0, 3600.0)"""
+    return tuple(float(w) for w in text.split(',') if w.strip()) or DEFAULT_WINDOWS
+
+
+class WindowStats:
+    """一个时间窗口的环形桶：每桶记录观察次数、变化次数、变化平方和、最低价和最高价"""
+
+    def __init__(self, window, buckets=60):
+        self.window = window
+        self.buckets = buckets
+        self.width = window / buckets
+        self.epochs = array('q', [-1]) * buckets  # 桶当前对应的时间段编号
+        self.counts = array('d', [0.0]) * buckets
+        self.changes = array('d', [0.0]) * buckets
+        self.sumsq = array('d', [0.0]) * buckets
+        self.lows = array('d', [0.0]) * buckets
+        self.highs = array('d', [0.0]) * buckets
+        self.ema = None
+        self.last_time = None
+
+    def add(self, now, value, change):
+        epoch = int(now // self.width)
+        i = epoch % self.buckets
+        if self.epochs[i] != epoch:
+            # 桶中是一整圈之前的数据，直接覆盖
+            self.epochs[i] = epoch
+            self.counts[i] = 0.0
+            self.changes[i] = 0.0
+            self.sumsq[i] = 0.0
+            self.lows[i] = value
+            self.highs[i] = value
+        self.counts[i] += 1
+        if change:
+            self.changes[i] += 1
+            self.sumsq[i] += change * change
+        if value < self.lows[i]:
+            self.lows[i] = value
+        if value > self.highs[i]:
+            self.highs[i] = value
+        # 按实际时间间隔衰减的 EMA，时间常数等于窗口长度
+        if self.ema is None:
+            self.ema = value
+        else:
+            alpha = 1 - math.exp(-max(0.0, now - self.last_time) / self.window)
+            self.ema += alpha * (value - self.ema)
+        self.last_time = now
+
+    def summary(self, now):
+        current = int(now // self.width)
+        oldest = current - self.buckets + 1
+        ticks = changes = sumsq = 0.0
+        low = high = None
+        for i in range(self.buckets):
+            epoch = self.epochs[i]
+            if epoch < oldest or epoch > current:
+                continue
+            ticks += self.counts[i]
+            changes += self.changes[i]
+            sumsq += self.sumsq[i]
+            low = self.lows[i] if low is None else min(low, self.lows[i])
+            high = self.highs[i] if high is None else max(high, self.highs[i])
+        return {
+            'ema': self.ema,
+            'volatility': math.sqrt(sumsq),
+            'min': low,
+            'max': high,
+            'ticks': int(ticks),
+            'rate': changes * 60 / self.window  # 每分钟价格变化次数
+        }
+
+
+class MarketStats:
+    def __init__(self, windows, buckets):
+        self.last = None
+        self.windows = [WindowStats(w, buckets) for w in windows]
+
+    def add(self, now, value):
+        change = 0.0 if self.last is None else value - self.last
+        for stats in self.windows:
+            stats.add(now, value, change)
+        self.last = value
+
+
+class RollingAnalytics:
+    """所有市场的滚动统计，以 Yes 价格（美分）为准"""
+
+    def __init__(self, windows=DEFAULT_WINDOWS, buckets=60):
+        self.windows = tuple(windows)
+        self.labels = [window_label(w) for w in self.windows]
+        self.buckets = buckets
+        self.markets = {}
+        self.lock = threading.Lock()
+
+    def update(self, market_id, value, now=None):
+        """记录一个价格，nan 会被忽略"""
+        if math.isnan(value):
+            return
+        now = now or time.time()
+        with self.lock:
+            stats = self.markets.get(market_id)
+            if stats is None:
+                stats = self.markets[market_id] = MarketStats(self.windows, self.buckets)
+            stats.add(now, value)
+
+    def snapshot(self, market_id, now=None):
+        """{'1m': {...}, '5m': {...}, '1h': {...}}，市场没有数据时返回 None"""
+        now = now or time.time()
+        with self.lock:
+            stats = self.markets.get(market_id)
+            if stats is None:
+                return None
+            return {label: window.summary(now) for label, window in zip(self.labels, stats.windows)}
+
+    def retain(self, market_ids):
+        """只保留仍在监控的市场"""
+        keep = set(market_ids)
+        with self.lock:
+            for market_id in list(self.markets):
+                if market_id not in keep:
+                    del self.markets[market_id]
+
+
+def batch_stats(ticks, now, windows=DEFAULT_WINDOWS, buckets=60):
+    """用历史记录 [(时间, yes, ...)] 重新计算与 RollingAnalytics 相同的统计
+
+    窗口按同样的时间桶边界截取，所以结果与在线计算一致（浮点误差以内）；
+    EMA 与在线计算一样依赖全部给定的记录，历史取得越长越接近。
+    """
+    try:
+        import numpy
+    except ImportError:  # 未安装 numpy 时批量计算退化为逐条回放
+        numpy = None
+    if numpy is None:
+        analytics = RollingAnalytics(windows, buckets)
+        for tick in ticks:
+            analytics.update('batch', tick[1], tick[0])
+        return analytics.snapshot('batch', now)
+
+    data = numpy.array([(tick[0], tick[1]) for tick in ticks], dtype=float).reshape(-1, 2)
+    data = data[~numpy.isnan(data[:, 1])]
+    if len(data) == 0:
+        return None
+    times, values = data[:, 0], data[:, 1]
+    change = numpy.diff(values, prepend=values[0])
+    result = {}
+    for window in windows:
+        width = window / buckets
+        current = numpy.floor(now / width)
+        epochs = numpy.floor(times / width)
+        mask = (epochs >= current - buckets + 1) & (epochs <= current)
+        in_window = values[mask]
+        changes = change[mask]
+        # EMA 的闭式解：每条记录的权重为 (1 - e^(-dt/τ)) · e^(-(t_n - t)/τ)
+        decay = numpy.exp(-(times[-1] - times) / window)
+        alpha = 1 - numpy.exp(-numpy.diff(times) / window)
+        ema = values[0] * decay[0] + numpy.sum(alpha * values[1:] * decay[1:])
+        result[window_label(window)] = {
+            'ema': float(ema),
+            'volatility': float(numpy.sqrt(numpy.sum(changes * changes))),
+            'min': float(in_window.min()) if len(in_window) else None,
+            'max': float(in_window.max()) if len(in_window) else None,
+            'ticks': int(mask.sum()),
+            'rate': float(numpy.count_nonzero(changes)) * 60 / window
+        }
+    return result
+
+
+def history_stats(tick_store, market_id, now=None, windows=DEFAULT_WINDOWS, buckets=60, lookback=None):
+    """从价格历史中读取一个市场的记录并批量计算统计，lookback 默认取最长窗口的 5 倍"""
+    now = now or time.time()
+    lookback = lookback or max(windows) * 5
+    return batch_stats(tick_store.query_market(market_id, now - lookback, now + 1e-6), now, windows, buckets)
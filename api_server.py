@@ -0,0 +1,252 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from urllib.parse import urlparse, parse_qs
+import metrics
+
+
+class PriceApi:
+    """本地价格接口，作为消费者挂接到监控核心上
+
+    GET /snapshot          当前全部市场价格和币安价格（JSON）
+    GET /stream            Server-Sent Events：先推送一次 snapshot，之后推送每个版本的变化
+    GET /poll?since=<版本>  长轮询：有新版本立即返回变化，版本落后太多时返回完整快照
+    GET /stats?market=<id> 一个市场的滚动统计和从价格历史批量重算的统计（JSON）
+    GET /metrics           抓取流程指标（Prometheus 文本格式）
+
+    抓取线程只更新内存中的快照；发布任务按 publish_interval 把变化序列化一次，
+    所有订阅者共享同一份字节，订阅者数量不会增加抓取线程的工作量。
+    """
+
+    def __init__(self, host='127.0.0.1', port=8780, publish_interval=0.2, keepalive=15, poll_timeout=25):
+        self.host = host
+        self.port = port
+        self.publish_interval = publish_interval
+        self.keepalive = keepalive
+        self.poll_timeout = poll_timeout
+        self.lock = threading.Lock()
+        self.markets = {}       # market_id -> {'yes', 'no', 'url', 'updated', 'stats'}
+        self.binance = {}       # symbol -> price
+        self.changed_markets = {}
+        self.changed_binance = {}
+        self.removed = set()
+        self.version = 0
+        self.snapshot_body = self.encode_snapshot()
+        self.delta_body = b''
+        self.sse_snapshot = b''
+        self.sse_delta = b''
+        self.published = None   # 每发布一个版本就替换的 asyncio.Event
+        self.subscribers = 0
+        self.loop = None
+        self.server = None
+        self.thread = None
+        self.ready = threading.Event()
+        self.stats_provider = None  # market_id -> 统计，由监控核心设置
+
+    # 以下三个方法在抓取/订阅线程中调用，只更新字典
+    def on_markets(self, market_urls):
+        urls = set(market_urls.values())
+        with self.lock:
+            for market_id, info in list(self.markets.items()):
+                if info['url'] not in urls:
+                    del self.markets[market_id]
+                    self.changed_markets.pop(market_id, None)
+                    self.removed.add(market_id)
+
+    def on_price(self, idx, market_id, yes_price, no_price, price_changed, url):
+        info = {'yes': yes_price, 'no': no_price, 'url': url, 'updated': time.time()}
+        with self.lock:
+            previous = self.markets.get(market_id)
+            if previous is not None and 'stats' in previous:
+                info['stats'] = previous['stats']
+            self.markets[market_id] = info
+            if previous is None or previous['yes'] != yes_price or previous['no'] != no_price:
+                self.changed_markets[market_id] = info
+                self.removed.discard(market_id)
+
+    def on_stats(self, idx, market_id, stats):
+        """统计随价格一起发布，单独的统计变化不会产生新版本"""
+        with self.lock:
+            info = self.markets.get(market_id)
+            if info is not None:
+                info['stats'] = stats
+
+    def on_binance(self, symbol, price):
+        with self.lock:
+            if self.binance.get(symbol) != price:
+                self.binance[symbol] = price
+                self.changed_binance[symbol] = price
+
+    def seed(self, core):
+        """用核心中已有的价格初始化快照"""
+        for market_id, (yes_price, no_price) in list(core.last_prices.items()):
+            idx = core.market_index.get(market_id)
+            self.on_price(idx, market_id, yes_price, no_price, False, core.market_urls.get(idx, ''))
+        for symbol, price in list(core.binance_prices.items()):
+            self.on_binance(symbol, price)
+
+    def encode_snapshot(self):
+        return json.dumps({
+            'version': self.version,
+            'time': time.time(),
+            'markets': self.markets,
+            'binance': self.binance
+        }, ensure_ascii=False).encode('utf-8')
+
+    def publish(self):
+        """把自上次发布以来的变化序列化一次，并唤醒所有订阅者"""
+        with self.lock:
+            if not (self.changed_markets or self.changed_binance or self.removed):
+                return
+            self.version += 1
+            delta = json.dumps({
+                'version': self.version,
+                'time': time.time(),
+                'markets': self.changed_markets,
+                'binance': self.changed_binance,
+                'removed': sorted(self.removed)
+            }, ensure_ascii=False).encode('utf-8')
+            snapshot = self.encode_snapshot()
+            self.changed_markets = {}
+            self.changed_binance = {}
+            self.removed = set()
+        self.delta_body = delta
+        self.snapshot_body = snapshot
+        self.sse_delta = b'id: %d\nevent: update\ndata: %s\n\n' % (self.version, delta)
+        self.sse_snapshot = b'id: %d\nevent: snapshot\ndata: %s\n\n' % (self.version, snapshot)
+        published, self.published = self.published, asyncio.Event()
+        published.set()
+
+    async def publisher(self):
+        while True:
+            await asyncio.sleep(self.publish_interval)
+            try:
+                self.publish()
+            except Exception as e:
+                logging.error(f"发布价格快照出错: {str(e)}")
+
+    async def handle(self, reader, writer):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=10)
+            # 跳过请求头
+            while True:
+                line = await asyncio.wait_for(reader.readline(), timeout=10)
+                if line in (b'\r\n', b'\n', b''):
+                    break
+            parts = request_line.decode('latin-1').split()
+            if len(parts) < 2 or parts[0] != 'GET':
+                await self.respond(writer, 405, b'{"error": "method not allowed"}')
+                return
+            parsed = urlparse(parts[1])
+            if parsed.path == '/snapshot':
+                await self.respond(writer, 200, self.snapshot_body)
+            elif parsed.path == '/poll':
+                await self.long_poll(writer, parse_qs(parsed.query))
+            elif parsed.path == '/stream':
+                await self.stream(writer)
+            elif parsed.path == '/stats':
+                await self.market_stats(writer, parse_qs(parsed.query))
+            elif parsed.path == '/metrics':
+                await self.respond(writer, 200, metrics.REGISTRY.render().encode('utf-8'),
+                                   content_type='text/plain; version=0.0.4')
+            else:
+                await self.respond(writer, 404, b'{"error": "not found"}')
+        except (asyncio.TimeoutError, asyncio.CancelledError, ConnectionError):
+            # 客户端断开或服务器关闭
+            pass
+        except Exception as e:
+            logging.error(f"处理接口请求出错: {str(e)}")
+        finally:
+            writer.close()
+
+    async def respond(self, writer, status, body, content_type='application/json'):
+        reason = {200: 'OK', 404: 'Not Found', 405: 'Method Not Allowed'}.get(status, 'OK')
+        writer.write(
+            f"HTTP/1.1 {status} {reason}\r\n"
+            f"Content-Type: {content_type}; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Access-Control-Allow-Origin: *\r\n"
+            f"Connection: close\r\n\r\n".encode('latin-1') + body
+        )
+        await writer.drain()
+
+    async def long_poll(self, writer, query):
+        try:
+            since = int(query.get('since', ['-1'])[0])
+        except ValueError:
+            since = -1
+        if since >= self.version:
+            published = self.published
+            try:
+                await asyncio.wait_for(published.wait(), timeout=self.poll_timeout)
+            except asyncio.TimeoutError:
+                await self.respond(writer, 200, b'{"version": %d, "markets": {}, "binance": {}, "removed": []}' % self.version)
+                return
+        # 只落后一个版本时返回变化，否则返回完整快照
+        body = self.delta_body if self.delta_body and since == self.version - 1 else self.snapshot_body
+        await self.respond(writer, 200, body)
+
+    async def market_stats(self, writer, query):
+        market_id = query.get('market', [''])[0]
+        if not market_id or self.stats_provider is None:
+            await self.respond(writer, 404, b'{"error": "not found"}')
+            return
+        # 批量重算要读价格历史文件，放到线程池中执行，不阻塞其他订阅者
+        stats = await asyncio.get_running_loop().run_in_executor(None, self.stats_provider, market_id)
+        await self.respond(writer, 200, json.dumps(stats, ensure_ascii=False).encode('utf-8'))
+
+    async def stream(self, writer):
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: text/event-stream; charset=utf-8\r\n"
+            b"Cache-Control: no-cache\r\n"
+            b"Access-Control-Allow-Origin: *\r\n"
+            b"Connection: keep-alive\r\n\r\n"
+        )
+        self.subscribers += 1
+        try:
+            version = self.version
+            writer.write(self.sse_snapshot or b'event: snapshot\ndata: %s\n\n' % self.snapshot_body)
+            await writer.drain()
+            while True:
+                published = self.published
+                try:
+                    await asyncio.wait_for(published.wait(), timeout=self.keepalive)
+                except asyncio.TimeoutError:
+                    writer.write(b': keepalive\n\n')
+                    await writer.drain()
+                    continue
+                # 订阅者写得太慢错过了版本时，直接补发完整快照
+                writer.write(self.sse_delta if self.version == version + 1 else self.sse_snapshot)
+                version = self.version
+                await writer.drain()
+        finally:
+            self.subscribers -= 1
+
+    async def serve(self):
+        self.loop = asyncio.get_running_loop()
+        self.published = asyncio.Event()
+        self.server = await asyncio.start_server(self.handle, self.host, self.port, backlog=512)
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.ready.set()
+        logging.info(f"价格接口已启动: http://{self.host}:{self.port}")
+        publisher = asyncio.create_task(self.publisher())
+        try:
+            await self.server.serve_forever()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            publisher.cancel()
+
+    def start(self):
+        self.thread = threading.Thread(target=lambda: asyncio.run(self.serve()), daemon=True)
+        self.thread.start()
+        self.ready.wait(5)
+        return self
+
+    def stop(self):
+        if self.loop and self.server:
+            self.loop.call_soon_threadsafe(self.server.close)
+            self.thread.join(timeout=5)
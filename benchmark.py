@@ -0,0 +1,459 @@
+"""离线基准测试：让监控核心对着本地模拟服务器运行，测量吞吐、延迟和资源占用
+
+模拟服务器（fixture_server.py）在子进程中运行，价格按固定间隔变化并记录变化时间；
+监控核心在本进程中运行，挂接一个模拟界面刷新的消费者。结束后把每次价格变化与
+“显示”出该价格的时间对齐，得到端到端延迟。结果保存为 JSON，便于比较不同版本：
+
+    python benchmark.py --price-source http --markets 50 --duration 60
+    python benchmark.py --compare BENCH/旧结果.json BENCH/新结果.json
+
+--price-source distributed 时本进程作为协调者，另外启动 --workers 个本机工作进程（distributed.py）：
+
+    python benchmark.py --price-source distributed --workers 3 --worker-source selenium
+
+--page-weight 只加载模拟服务器的分类页面和几个市场页面，对比 [LoadProfile] 开启前后每个页面的流量和耗时：
+
+    python benchmark.py --page-weight --tag bitcoin --repeat 5
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+import requests
+import metrics
+from load_profile import LoadProfile, compare_profiles
+from monitor_core import MonitorCore, load_config, CONFIG_PATH
+from log_pipeline import setup_logging
+from markets import PRICE_SELECTOR, market_id_from_href
+from update_queue import UpdateQueue
+
+try:
+    import psutil
+except ImportError:  # 未安装 psutil 时只统计本进程的内存
+    psutil = None
+
+FIXTURE_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixture_server.py')
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'distributed.py')
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_fixtures(args):
+    """在子进程中启动模拟服务器，返回 (进程, HTTP 地址, WebSocket 地址)"""
+    ws_port = free_port()
+    command = [
+        sys.executable, '-u', FIXTURE_SCRIPT, '--port', '0', '--ws-port', str(ws_port),
+        '--markets', str(args.markets), '--change-rate', str(args.change_rate),
+        '--tick-interval', str(args.tick_interval), '--shared-markets', str(args.shared_markets)
+    ]
+    if args.recorded:
+        command += ['--recorded', args.recorded]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    base_url = ws_url = None
+    while base_url is None or ws_url is None:
+        line = process.stdout.readline()
+        if not line:
+            process.kill()
+            raise RuntimeError("模拟服务器启动失败")
+        url = line.strip().split(': ', 1)[-1]
+        if url.startswith('http'):
+            base_url = url
+        elif url.startswith('ws'):
+            ws_url = url
+    return process, base_url, ws_url
+
+
+def build_config(args, base_url, ws_url, history_dir):
+    """在配置文件的基础上把所有地址指向模拟服务器"""
+    config = load_config(args.config)
+    for section in ('Monitor', 'HttpSource', 'Binance', 'History', 'Api', 'Scheduler', 'Metrics', 'Distributed',
+                    'Snapshot'):
+        if not config.has_section(section):
+            config.add_section(section)
+    config.set('Monitor', 'url', ','.join(f"{base_url}/markets/crypto/{tag.strip()}" for tag in args.tag.split(',')))
+    config.set('Monitor', 'price_source', args.price_source)
+    if args.pool_size:
+        config.set('Monitor', 'pool_size', str(args.pool_size))
+    config.set('HttpSource', 'api_base', base_url)
+    config.set('Binance', 'ws_url', ws_url)
+    config.set('Binance', 'rest_url', base_url)
+    config.set('History', 'dir', history_dir)
+    # 不能覆盖正式运行时保存的快照
+    config.set('Snapshot', 'enabled', 'false')
+    config.set('Api', 'enabled', 'false')
+    config.set('Metrics', 'port', '0')
+    if args.requests_per_second:
+        config.set('Scheduler', 'requests_per_second', str(args.requests_per_second))
+    config.set('Distributed', 'port', str(free_port()))
+    # 模拟服务器的 /events 返回的是 polymarket.com 的链接，浏览器工作进程需要由分类页面发现链接
+    config.set('Distributed', 'discovery_source', 'http' if args.worker_source == 'http' else 'listing')
+    return config
+
+
+def start_workers(args, config, directory):
+    """启动本机工作进程，它们使用同一份指向模拟服务器的配置"""
+    path = os.path.join(directory, 'worker.ini')
+    with open(path, 'w', encoding='utf-8') as f:
+        config.write(f)
+    coordinator = f"http://127.0.0.1:{config.get('Distributed', 'port')}"
+    command = [sys.executable, '-u', WORKER_SCRIPT, '--coordinator', coordinator, '--config', path,
+               '--price-source', args.worker_source, '--log-level', 'WARNING']
+    return [subprocess.Popen(command + ['--worker-id', f"worker-{i}"]) for i in range(args.workers)]
+
+
+class ScreenConsumer:
+    """模拟界面：价格经有界合并队列按帧取出，取出的时间视为“显示”时间"""
+
+    def __init__(self, frame_interval=0.1, maxsize=1000):
+        self.frame_interval = frame_interval
+        self.updates = UpdateQueue(maxsize)
+        self.records = 0
+        self.binance_records = 0
+        self.first_price = None
+        self.shown = {}         # market_id -> 最近一次显示的 Yes
+        self.observations = {}  # market_id -> [(显示时间, Yes)]
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def on_price(self, idx, market_id, yes_price, no_price, price_changed, url):
+        self.records += 1
+        self.updates.push(market_id, yes_price)
+
+    def on_binance(self, symbol, price):
+        self.binance_records += 1
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join(timeout=5)
+
+    def run(self):
+        while not self.stop_event.wait(self.frame_interval):
+            now = time.time()
+            for market_id, yes_price in self.updates.drain():
+                if self.first_price is None:
+                    self.first_price = now
+                if self.shown.get(market_id) != yes_price:
+                    self.shown[market_id] = yes_price
+                    self.observations.setdefault(market_id, []).append((now, yes_price))
+
+
+class ResourceSampler:
+    """定期采样内存；CPU 时间用开始和结束时的 os.times() 计算"""
+
+    def __init__(self, interval=0.5):
+        self.interval = interval
+        self.rss_samples = []
+        self.tree_samples = []
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.process = psutil.Process() if psutil else None
+
+    def rss(self):
+        try:
+            with open('/proc/self/statm') as f:
+                return int(f.read().split()[1]) * resource.getpagesize()
+        except OSError:
+            # 非 Linux 系统只能取峰值（macOS 为字节，Linux 为 KB）
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return peak if sys.platform == 'darwin' else peak * 1024
+
+    def tree_rss(self, exclude):
+        """本进程及所有子进程（浏览器、chromedriver）的内存，不含模拟服务器"""
+        total = self.process.memory_info().rss
+        for child in self.process.children(recursive=True):
+            try:
+                if child.pid != exclude:
+                    total += child.memory_info().rss
+            except psutil.Error:
+                pass
+        return total
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            self.rss_samples.append(self.rss())
+            if self.process:
+                try:
+                    self.tree_samples.append(self.tree_rss(self.exclude))
+                except psutil.Error:
+                    pass
+
+    def start(self, exclude=None):
+        self.exclude = exclude
+        self.start_times = os.times()
+        self.start_wall = time.time()
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join(timeout=5)
+
+    def cpu(self):
+        """在浏览器退出之后调用，子进程的 CPU 时间才会计入 children"""
+        end = os.times()
+        wall = time.time() - self.start_wall
+        process = (end.user - self.start_times.user) + (end.system - self.start_times.system)
+        children = (end.children_user - self.start_times.children_user) + \
+                   (end.children_system - self.start_times.children_system)
+        return {
+            'process_seconds': round(process, 3),
+            'process_percent': round(process * 100 / wall, 1) if wall > 0 else 0,
+            'children_seconds': round(children, 3)
+        }
+
+    def memory(self):
+        mb = 1024 * 1024
+        result = {
+            'peak_mb': round(max(self.rss_samples, default=0) / mb, 1),
+            'mean_mb': round(sum(self.rss_samples) / len(self.rss_samples) / mb, 1) if self.rss_samples else 0
+        }
+        if self.tree_samples:
+            result['tree_peak_mb'] = round(max(self.tree_samples) / mb, 1)
+        return result
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def match_latencies(history, observations, since, until):
+    """把模拟服务器上的每次价格变化与第一次显示出该价格的时间对齐
+
+    返回 (延迟列表, 未被显示就被下一次变化覆盖的次数)。
+    """
+    latencies = []
+    missed = 0
+    for slug, changes in history.items():
+        shown = observations.get(market_id_from_href(slug), [])
+        for changed_at, yes in changes:
+            if not since <= changed_at <= until:
+                continue
+            for shown_at, shown_yes in shown:
+                if shown_at >= changed_at and shown_yes == yes:
+                    latencies.append(shown_at - changed_at)
+                    break
+            else:
+                missed += 1
+    return latencies, missed
+
+
+def histogram_summaries():
+    summaries = {}
+    for name, metric in list(metrics.REGISTRY.metrics.items()):
+        if isinstance(metric, metrics.Histogram) and metric.count:
+            summaries[name] = {
+                'count': metric.count,
+                'avg': round(metric.sum / metric.count, 4),
+                'p50': metric.quantile(0.5),
+                'p95': metric.quantile(0.95)
+            }
+    return summaries
+
+
+def run_benchmark(args):
+    process, base_url, ws_url = start_fixtures(args)
+    history_dir = tempfile.mkdtemp(prefix='bench_ticks_')
+    core = None
+    workers = []
+    try:
+        config = build_config(args, base_url, ws_url, history_dir)
+        if args.price_source == 'distributed':
+            workers = start_workers(args, config, history_dir)
+        core = MonitorCore(config)
+        screen = ScreenConsumer(args.frame_interval / 1000)
+        sampler = ResourceSampler()
+        core.add_consumer(screen)
+        # 本机工作进程的资源也计入
+        sampler.start(exclude=process.pid)
+        screen.start()
+        core.start()
+        start = time.time()
+        if not core.start_monitoring():
+            raise RuntimeError("监控启动失败")
+        time.sleep(args.duration)
+        end = time.time()
+        for worker in workers:
+            worker.terminate()
+        core.stop()
+        core = None
+        screen.stop()
+        sampler.stop()
+        cpu = sampler.cpu()
+
+        history = requests.get(f"{base_url}/fixture/history", params={'since': start}, timeout=10).json()
+        # 只统计首个价格显示之后的变化，排除浏览器启动和首次链接发现
+        measured_from = screen.first_price or end
+        latencies, missed = match_latencies(history, screen.observations, measured_from, end)
+        measured = max(end - measured_from, 1e-9)
+        return {
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'params': {
+                'price_source': args.price_source,
+                'markets': args.markets,
+                'categories': args.tag,
+                'shared_markets': args.shared_markets,
+                'change_rate': args.change_rate,
+                'tick_interval': args.tick_interval,
+                'duration': args.duration,
+                'pool_size': args.pool_size,
+                'requests_per_second': args.requests_per_second,
+                'frame_interval': args.frame_interval,
+                'recorded': args.recorded,
+                'workers': args.workers if args.price_source == 'distributed' else None,
+                'worker_source': args.worker_source if args.price_source == 'distributed' else None
+            },
+            'results': {
+                'time_to_first_price': round(measured_from - start, 3) if screen.first_price else None,
+                'price_records': screen.records,
+                'markets_per_second': round(screen.records / measured, 2),
+                'binance_records': screen.binance_records,
+                'latency': {
+                    'changes_shown': len(latencies),
+                    'changes_missed': missed,
+                    'mean': round(sum(latencies) / len(latencies), 3) if latencies else None,
+                    'p50': round(percentile(latencies, 0.5), 3) if latencies else None,
+                    'p90': round(percentile(latencies, 0.9), 3) if latencies else None,
+                    'p99': round(percentile(latencies, 0.99), 3) if latencies else None,
+                    'max': round(max(latencies), 3) if latencies else None
+                },
+                'cpu': cpu,
+                'memory': sampler.memory(),
+                'update_queue': screen.updates.stats(),
+                'metrics': histogram_summaries()
+            }
+        }
+    finally:
+        if core:
+            core.stop()
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.wait(timeout=15)
+        process.terminate()
+        process.wait(timeout=5)
+        shutil.rmtree(history_dir, ignore_errors=True)
+
+
+def run_page_weight(args):
+    """对比精简加载配置开启前后，模拟服务器上每个页面的下载字节数、请求数和读到价格的耗时"""
+    process, base_url, _ = start_fixtures(args)
+    try:
+        profile = LoadProfile.from_config(load_config(args.config))
+        tags = [tag.strip() for tag in args.tag.split(',') if tag.strip()]
+        urls = [f"{base_url}/markets/crypto/{tag}" for tag in tags]
+        events = requests.get(f"{base_url}/events", params={'tag_slug': tags[0]}, timeout=10).json()
+        urls += [f"{base_url}/event/{event['slug']}" for event in events[:3]]
+        pages = compare_profiles(urls, profile, PRICE_SELECTOR, args.repeat)
+        count = len(pages)
+        return {
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'params': {
+                'categories': args.tag,
+                'markets': args.markets,
+                'repeat': args.repeat,
+                'block_types': list(profile.block_types),
+                'block_urls': list(profile.block_urls)
+            },
+            'results': {
+                'bytes_saved_per_page': round(sum(p['bytes_saved'] for p in pages.values()) / count),
+                'time_saved_per_page': round(sum(p['time_saved'] for p in pages.values()) / count, 3),
+                'pages': {url[len(base_url):]: page for url, page in pages.items()}
+            }
+        }
+    finally:
+        process.terminate()
+        process.wait(timeout=5)
+
+
+def flatten(data, prefix=''):
+    items = {}
+    for key, value in data.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            items.update(flatten(value, name + '.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            items[name] = value
+    return items
+
+
+def compare(old_path, new_path):
+    """逐项打印两次结果的差异"""
+    with open(old_path, encoding='utf-8') as f:
+        old = flatten(json.load(f)['results'])
+    with open(new_path, encoding='utf-8') as f:
+        new = flatten(json.load(f)['results'])
+    for name in sorted(set(old) | set(new)):
+        if name.startswith('metrics.') or name.startswith('update_queue.'):
+            continue
+        a, b = old.get(name), new.get(name)
+        if a is None or b is None:
+            print(f"{name:40} {a!s:>12} {b!s:>12}")
+            continue
+        change = f"{(b - a) * 100 / a:+.1f}%" if a else ''
+        print(f"{name:40} {a:>12} {b:>12} {change:>9}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='监控离线基准测试')
+    parser.add_argument('--price-source', default='http', choices=['selenium', 'listing', 'tabs', 'http', 'distributed'])
+    parser.add_argument('--markets', type=int, default=20, help='分类下的市场数量')
+    parser.add_argument('--change-rate', type=float, default=0.3, help='每个间隔内单个市场价格变化的概率')
+    parser.add_argument('--tick-interval', type=float, default=1.0, help='模拟价格变化的间隔（秒）')
+    parser.add_argument('--duration', type=float, default=30, help='测量时长（秒）')
+    parser.add_argument('--pool-size', type=int, help='并行浏览器数量')
+    parser.add_argument('--workers', type=int, default=2, help='distributed 时启动的本机工作进程数')
+    parser.add_argument('--worker-source', default='selenium', choices=['selenium', 'listing', 'tabs', 'http'],
+                        help='distributed 时工作进程使用的价格来源')
+    parser.add_argument('--requests-per-second', type=float, help='逐个市场抓取时的全局请求预算')
+    parser.add_argument('--frame-interval', type=int, default=100, help='模拟界面刷新间隔（毫秒）')
+    parser.add_argument('--tag', default='bitcoin', help='分类名称，多个分类用逗号分隔')
+    parser.add_argument('--shared-markets', type=int, default=0, help='同时出现在所有分类中的市场数量')
+    parser.add_argument('--recorded', help='使用录制的事件数据代替生成的市场')
+    parser.add_argument('--config', default=CONFIG_PATH, help='配置文件路径')
+    parser.add_argument('--output', default='BENCH', help='结果保存目录')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='比较两次结果后退出')
+    parser.add_argument('--page-weight', action='store_true', help='只对比精简加载配置开启前后的页面流量和耗时')
+    parser.add_argument('--repeat', type=int, default=3, help='--page-weight 时每个页面加载的次数')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.compare:
+        compare(*args.compare)
+        return 0
+    setup_logging(load_config(args.config), 'WARNING', filename='benchmark.log')
+    if args.page_weight:
+        result = run_page_weight(args)
+        name = 'page_weight'
+    else:
+        result = run_benchmark(args)
+        name = args.price_source
+    os.makedirs(args.output, exist_ok=True)
+    path = os.path.join(args.output, f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{name}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(json.dumps(result['results'], ensure_ascii=False, indent=2))
+    print(f"结果已保存: {path}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
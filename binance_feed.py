@@ -0,0 +1,151 @@
+import asyncio
+import json
+import logging
+import random
+import threading
+import time
+import requests
+import metrics
+
+try:
+    import websockets
+except ImportError:  # 未安装 websockets 时只使用 REST 轮询
+    websockets = None
+
+BINANCE_REST = metrics.histogram('binance_rest_seconds', '币安 REST 价格请求耗时')
+BINANCE_MESSAGES = metrics.counter('binance_ws_messages_total', '收到的币安 WebSocket 行情消息数')
+BINANCE_ERRORS = metrics.counter('binance_errors_total', '币安订阅出错次数', label='source')
+
+
+class BinanceFeed:
+    """币安行情订阅：优先使用 WebSocket 组合流，断开期间回退到按交易对过滤的 REST 接口
+
+    所有网络 IO 都在独立线程的 asyncio 事件循环中进行，每收到一个价格调用 on_price(symbol, price)。
+    """
+
+    def __init__(self, symbols, on_price,
+                 ws_url='wss://stream.binance.com:9443',
+                 rest_url='https://api.binance.com',
+                 rest_interval=1, stale_after=5, timeout=(3, 5), max_backoff=60):
+        self.symbols = [s.upper() for s in symbols]
+        self.on_price = on_price
+        self.ws_url = ws_url.rstrip('/')
+        self.rest_url = rest_url.rstrip('/')
+        self.rest_interval = rest_interval  # REST 轮询间隔（秒）
+        self.stale_after = stale_after      # WebSocket 超过这么久没有消息就启用 REST
+        self.timeout = timeout
+        self.max_backoff = max_backoff
+        self.session = requests.Session()   # 保持长连接
+        self.last_message_time = 0
+        self.ws_connected = False
+        self.loop = None
+        self.stop_event = None
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=lambda: asyncio.run(self.run()), daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if self.loop and self.stop_event:
+            self.loop.call_soon_threadsafe(self.stop_event.set)
+        if self.thread:
+            self.thread.join(timeout=5)
+        self.session.close()
+
+    @property
+    def stream_url(self):
+        streams = '/'.join(f"{s.lower()}@miniTicker" for s in self.symbols)
+        return f"{self.ws_url}/stream?streams={streams}"
+
+    @property
+    def ws_healthy(self):
+        return self.ws_connected and time.time() - self.last_message_time < self.stale_after
+
+    async def run(self):
+        self.loop = asyncio.get_running_loop()
+        self.stop_event = asyncio.Event()
+        rest_task = asyncio.create_task(self.rest_fallback())
+        if websockets is None:
+            logging.warning("未安装 websockets，币安价格仅使用 REST 轮询")
+            await self.stop_event.wait()
+        else:
+            await self.stream_forever()
+        rest_task.cancel()
+
+    async def stream_forever(self):
+        """保持 WebSocket 连接，断开后按指数退避重连"""
+        backoff = 1
+        while not self.stop_event.is_set():
+            try:
+                await self.stream()
+                backoff = 1
+            except Exception as e:
+                BINANCE_ERRORS.inc('websocket')
+                logging.error(f"币安 WebSocket 连接出错: {str(e)}")
+            self.ws_connected = False
+            if self.stop_event.is_set():
+                break
+            delay = backoff * random.uniform(0.5, 1.5)
+            backoff = min(backoff * 2, self.max_backoff)
+            try:
+                await asyncio.wait_for(self.stop_event.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def stream(self):
+        async with websockets.connect(self.stream_url, open_timeout=10, ping_interval=20) as ws:
+            self.ws_connected = True
+            logging.info(f"币安 WebSocket 已连接: {self.stream_url}")
+            stop_task = asyncio.create_task(self.stop_event.wait())
+            try:
+                while True:
+                    recv_task = asyncio.create_task(ws.recv())
+                    done, _ = await asyncio.wait(
+                        {recv_task, stop_task}, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    if stop_task in done:
+                        recv_task.cancel()
+                        return
+                    self.handle_message(recv_task.result())
+            finally:
+                stop_task.cancel()
+
+    def handle_message(self, message):
+        data = json.loads(message).get('data', {})
+        if 's' in data and 'c' in data:
+            self.last_message_time = time.time()
+            BINANCE_MESSAGES.inc()
+            self.on_price(data['s'], float(data['c']))
+
+    async def rest_fallback(self):
+        """WebSocket 不可用时按固定间隔轮询 REST 接口，请求失败时按指数退避，只在失败和恢复时各记录一次"""
+        failures = 0
+        while True:
+            delay = self.rest_interval
+            if not self.ws_healthy:
+                try:
+                    prices = await self.loop.run_in_executor(None, self.fetch_rest)
+                    for symbol, price in prices.items():
+                        self.on_price(symbol, price)
+                    if failures:
+                        logging.info(f"币安 REST 价格已恢复（此前连续失败 {failures} 次）")
+                    failures = 0
+                except Exception as e:
+                    BINANCE_ERRORS.inc('rest')
+                    if not failures:
+                        logging.error(f"获取币安价格出错: {str(e)}")
+                    failures += 1
+                    delay = min(self.rest_interval * 2 ** failures, self.max_backoff)
+            await asyncio.sleep(delay)
+
+    def fetch_rest(self):
+        """只请求关注的交易对，而不是全部约 2000 个"""
+        with BINANCE_REST.time():
+            response = self.session.get(
+                f"{self.rest_url}/api/v3/ticker/price",
+                params={'symbols': json.dumps(self.symbols, separators=(',', ':'))},
+                timeout=self.timeout
+            )
+        response.raise_for_status()
+        return {item['symbol']: float(item['price']) for item in response.json()}
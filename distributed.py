@@ -0,0 +1,330 @@
+"""分布式抓取：协调者负责发现市场并分配链接，工作进程抓取各自的部分并把价格发回
+
+协调者是一个价格来源（price_source=distributed），运行在监控核心中：链接发现仍由监控循环定期调用，
+用 [Distributed] discovery_source 指定的来源完成；发现的链接按权重分给当前在线的工作进程。
+工作进程可以在本机或其他主机上运行，使用自己的价格来源和调度器：
+
+    python distributed.py --coordinator http://127.0.0.1:8790 --price-source selenium --pool-size 2
+
+协议（HTTP + JSON）只有一个请求，工作进程每 report_interval 秒发送一次，同时作为心跳：
+
+    POST /report  {"worker": 标识, "capacity": 权重, "version": 已知的分配版本,
+                   "ticks": [[market_id, yes, no], ...]}
+    -> {"version": 当前版本, "interval": 上报间隔, "hrefs": [...], "categories": [...]}
+
+分配变化后的第一次响应才带 hrefs 和 categories。超过 worker_timeout 秒没有上报的工作进程视为已退出。
+分配使用加权的最高随机权重（rendezvous）哈希：工作进程加入或退出时，只有它的那部分市场会移动。
+"""
+import argparse
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import signal
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import requests
+import metrics
+from monitor_core import load_config, create_scheduler, CONFIG_PATH
+from log_pipeline import setup_logging
+from price_source import PriceSource, create_price_source
+
+COORDINATORS = []  # 当前进程中的协调者，供指标读取
+TICKS_RECEIVED = metrics.counter('distributed_ticks_total', '协调者从工作进程收到的价格数')
+REBALANCES = metrics.counter('distributed_rebalances_total', '重新分配市场的次数', label='reason')
+metrics.gauge('distributed_workers', '在线的工作进程数', lambda: sum(len(c.workers) for c in COORDINATORS))
+
+
+def rendezvous_score(worker_id, capacity, href):
+    """加权最高随机权重哈希：-capacity / ln(u)，u 为 (0, 1) 内的均匀哈希值"""
+    digest = hashlib.blake2b(f"{worker_id}|{href}".encode('utf-8'), digest_size=8).digest()
+    u = (int.from_bytes(digest, 'big') + 1) / (2 ** 64 + 2)
+    return -capacity / math.log(u)
+
+
+def assign(hrefs, workers):
+    """把链接分给工作进程，workers 为 {标识: 权重}，返回 {标识: [链接]}"""
+    assignment = {worker_id: [] for worker_id in workers}
+    if not workers:
+        return assignment
+    for href in hrefs:
+        best = max(workers, key=lambda worker_id: rendezvous_score(worker_id, workers[worker_id], href))
+        assignment[best].append(href)
+    return assignment
+
+
+class CoordinatorHandler(BaseHTTPRequestHandler):
+    coordinator = None
+
+    def do_POST(self):
+        if self.path != '/report':
+            self.send_error(404)
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            data = json.loads(self.rfile.read(length) or b'{}')
+            body = json.dumps(self.coordinator.report(data)).encode('utf-8')
+        except Exception as e:
+            logging.error(f"处理工作进程上报出错: {str(e)}")
+            self.send_error(400)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class CoordinatorSource(PriceSource):
+    """协调者：发现市场、把链接分给工作进程，并把工作进程发回的价格交给监控核心"""
+
+    per_market = False
+    poll_interval = 0.5  # 把收到的价格交给监控核心的间隔
+
+    def __init__(self, discovery, host='127.0.0.1', port=8790, worker_timeout=10, report_interval=0.5):
+        self.discovery = discovery  # 用于链接发现的本地价格来源
+        self.host = host
+        self.port = port
+        self.worker_timeout = worker_timeout
+        self.report_interval = report_interval
+        self.workers = {}      # 标识 -> {'capacity', 'last_seen'}
+        self.assignment = {}   # 标识 -> [链接]
+        self.hrefs = []
+        self.category_urls = []
+        # 版本从启动时间开始编号，协调者重启后工作进程手里的旧版本不会碰巧相同
+        self.version = int(time.time() * 1000)
+        self.ticks = []
+        self.idle = False  # 有市场但没有工作进程，只在状态变化时提示一次
+        self.lock = threading.Lock()
+        self.httpd = None
+        self.thread = None
+
+    def start(self):
+        if not self.discovery.start():
+            return False
+        handler = type('Handler', (CoordinatorHandler,), {'coordinator': self})
+        self.httpd = ThreadingHTTPServer((self.host, self.port), handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        COORDINATORS.append(self)
+        logging.info(f"协调者已启动: {self.url}")
+        return True
+
+    def stop(self):
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+        if self in COORDINATORS:
+            COORDINATORS.remove(self)
+        self.discovery.stop()
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def discover(self, category_url):
+        return self.discovery.discover(category_url)
+
+    def discover_all(self, category_urls):
+        with self.lock:
+            if list(category_urls) != self.category_urls:
+                self.category_urls = list(category_urls)
+                self.rebalance('categories')
+        return self.discovery.discover_all(category_urls)
+
+    def fetch_prices(self, hrefs, on_record):
+        """更新要抓取的市场，然后把工作进程发回的价格交给监控核心"""
+        now = time.time()
+        with self.lock:
+            if set(hrefs) != set(self.hrefs):
+                self.hrefs = list(hrefs)
+                self.rebalance('markets')
+            lost = [worker_id for worker_id, worker in self.workers.items()
+                    if now - worker['last_seen'] > self.worker_timeout]
+            for worker_id in lost:
+                logging.warning(f"工作进程 {worker_id} 超过 {self.worker_timeout:g} 秒没有上报，重新分配它的市场")
+                del self.workers[worker_id]
+            if lost:
+                self.rebalance('worker_lost')
+            ticks, self.ticks = self.ticks, []
+        idle = bool(self.hrefs) and not self.workers
+        if idle and not self.idle:
+            logging.warning("没有在线的工作进程，市场价格不会更新")
+        self.idle = idle
+        for tick in ticks:
+            on_record(tick)
+
+    def rebalance(self, reason):
+        """重新计算分配（调用时已持有锁）"""
+        self.assignment = assign(self.hrefs, {worker_id: w['capacity'] for worker_id, w in self.workers.items()})
+        self.version += 1
+        REBALANCES.inc(reason)
+        logging.info(f"重新分配市场（{reason}）: " + ', '.join(
+            f"{worker_id} {len(hrefs)}" for worker_id, hrefs in self.assignment.items()
+        ))
+
+    def report(self, data):
+        """处理一次工作进程上报，返回响应内容"""
+        worker_id = str(data['worker'])
+        capacity = max(float(data.get('capacity', 1)), 0.01)
+        ticks = [tuple(tick[:3]) for tick in data.get('ticks', [])]
+        with self.lock:
+            worker = self.workers.get(worker_id)
+            if worker is None or worker['capacity'] != capacity:
+                if worker is None:
+                    logging.info(f"工作进程 {worker_id} 已加入，权重 {capacity:g}")
+                self.workers[worker_id] = {'capacity': capacity, 'last_seen': time.time()}
+                self.rebalance('worker_joined')
+            else:
+                worker['last_seen'] = time.time()
+            self.ticks.extend(ticks)
+            response = {'version': self.version, 'interval': self.report_interval}
+            if data.get('version') != self.version:
+                response['hrefs'] = self.assignment.get(worker_id, [])
+                response['categories'] = self.category_urls
+        TICKS_RECEIVED.inc(amount=len(ticks))
+        return response
+
+
+class Worker:
+    """工作进程：按协调者的分配抓取市场，定期把价格发回"""
+
+    def __init__(self, coordinator_url, source, scheduler, worker_id=None, capacity=1, timeout=(3, 10)):
+        self.coordinator_url = coordinator_url.rstrip('/')
+        self.source = source
+        self.scheduler = scheduler
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.capacity = capacity
+        self.timeout = timeout
+        self.interval = 0.5
+        self.version = None
+        self.hrefs = []
+        self.pending = {}  # market_id -> 最新的 (market_id, yes, no)，上报前同一市场只保留最新价格
+        self.lock = threading.Lock()
+        self.assigned = threading.Event()
+        self.stop_event = threading.Event()
+        self.session = requests.Session()
+
+    def on_record(self, record):
+        with self.lock:
+            self.pending[record[0]] = record
+
+    def report(self):
+        """上报价格并取回分配，失败时保留价格下次再发"""
+        with self.lock:
+            ticks, self.pending = self.pending, {}
+        try:
+            response = self.session.post(f"{self.coordinator_url}/report", json={
+                'worker': self.worker_id,
+                'capacity': self.capacity,
+                'version': self.version,
+                'ticks': [list(tick) for tick in ticks.values()]
+            }, timeout=self.timeout)
+            response.raise_for_status()
+            data = response.json()
+        except Exception as e:
+            with self.lock:
+                for market_id, tick in ticks.items():
+                    self.pending.setdefault(market_id, tick)
+            logging.error(f"向协调者上报失败: {str(e)}")
+            return
+        self.interval = data.get('interval', self.interval)
+        if 'hrefs' in data:
+            self.hrefs = list(data['hrefs'])
+            self.source.set_categories(data.get('categories', []))
+            self.scheduler.set_markets(self.hrefs)
+            self.version = data['version']
+            self.assigned.set()
+            logging.info(f"收到分配: {len(self.hrefs)} 个市场（版本 {self.version}）")
+
+    def report_forever(self):
+        # 上报在独立线程中进行，页面加载再慢也不会耽误心跳
+        while not self.stop_event.is_set():
+            self.report()
+            self.stop_event.wait(self.interval)
+        self.report()
+
+    def run(self):
+        """抓取分配到的市场，直到 stop 被调用"""
+        if not self.source.start():
+            return False
+        reporter = threading.Thread(target=self.report_forever, daemon=True)
+        reporter.start()
+        try:
+            while not self.stop_event.is_set():
+                if not self.assigned.wait(1):
+                    continue
+                try:
+                    if self.source.per_market:
+                        batch = self.scheduler.next_batch()
+                        if batch:
+                            self.source.fetch_prices(batch, self.on_record)
+                        delay = min(max(self.scheduler.time_until_next(), 0.05), 1)
+                    else:
+                        if self.hrefs:
+                            self.source.fetch_prices(list(self.hrefs), self.on_record)
+                        delay = self.source.poll_interval
+                except Exception as e:
+                    logging.error(f"抓取出错: {str(e)}")
+                    delay = 1
+                self.stop_event.wait(delay)
+        finally:
+            self.stop_event.set()
+            reporter.join(timeout=self.timeout[1] + 1)
+            self.source.stop()
+            self.session.close()
+        return True
+
+    def stop(self):
+        self.stop_event.set()
+
+
+def create_coordinator(config):
+    """根据 [Distributed] 配置创建协调者"""
+    discovery = create_price_source(config, config.get('Distributed', 'discovery_source', fallback='http'))
+    return CoordinatorSource(
+        discovery,
+        host=config.get('Distributed', 'host', fallback='127.0.0.1'),
+        port=config.getint('Distributed', 'port', fallback=8790),
+        worker_timeout=config.getfloat('Distributed', 'worker_timeout', fallback=10),
+        report_interval=config.getfloat('Distributed', 'report_interval', fallback=0.5)
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='分布式抓取的工作进程')
+    parser.add_argument('--coordinator', required=True, help='协调者地址，例如 http://127.0.0.1:8790')
+    parser.add_argument('--config', default=CONFIG_PATH, help='配置文件路径')
+    parser.add_argument('--price-source', default='selenium', choices=['selenium', 'listing', 'tabs', 'http'])
+    parser.add_argument('--pool-size', type=int, help='并行浏览器数量')
+    parser.add_argument('--capacity', type=float, help='分配权重，默认等于浏览器数量')
+    parser.add_argument('--worker-id', help='工作进程标识，默认为 主机名-进程号')
+    parser.add_argument('--log-level', help='日志级别，默认读取 [Logging] level')
+    args = parser.parse_args(argv)
+
+    config = load_config(args.config)
+    # 标识在这里确定一次，日志文件名和上报使用同一个标识，同一台机器上的多个工作进程各写各的日志文件
+    worker_id = args.worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    setup_logging(config, args.log_level, filename=f"worker_{re.sub(r'[^A-Za-z0-9_.-]', '_', worker_id)}.log")
+    if args.pool_size:
+        config.set('Monitor', 'pool_size', str(args.pool_size))
+    source = create_price_source(config, args.price_source)
+    capacity = args.capacity or config.getint('Monitor', 'pool_size', fallback=3)
+    worker = Worker(args.coordinator, source, create_scheduler(config), worker_id, capacity)
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda signum, frame: worker.stop())
+    return 0 if worker.run() else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,419 @@
+import contextvars
+import os
+import logging
+import queue
+import subprocess
+import threading
+import time
+import traceback
+from collections import deque
+from contextlib import contextmanager
+from selenium import webdriver
+from selenium.common.exceptions import InvalidSessionIdException
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.chrome.options import Options
+import metrics
+
+try:
+    import psutil
+except ImportError:  # 未安装 psutil 时用 ps 命令读取内存
+    psutil = None
+
+DRIVER_RECYCLES = metrics.counter('driver_recycles_total', '浏览器被替换的次数', label='reason')
+DRIVER_LAUNCH = metrics.histogram('driver_launch_seconds', '启动一个浏览器会话的耗时')
+
+# 这些错误说明浏览器或 chromedriver 已经不在了，继续使用只会一直出错
+DEAD_SESSION_MARKERS = (
+    'invalid session id', 'session deleted', 'chrome not reachable', 'disconnected',
+    'no such window', 'target window already closed', 'connection refused', 'max retries exceeded'
+)
+
+
+def create_chrome_driver(extra_args=(), profile=None):
+    """创建一个无头 Chrome 会话，profile 为精简加载配置（见 load_profile.py）"""
+    chrome_options = Options()
+    chrome_options.add_argument('--headless=new')
+    chrome_options.add_argument('--disable-gpu')
+    chrome_options.add_argument('--no-sandbox')
+    chrome_options.add_argument('--disable-dev-shm-usage')
+    chrome_options.add_argument('--disable-extensions')
+    for arg in extra_args:
+        chrome_options.add_argument(arg)
+    chrome_options.page_load_strategy = 'eager'
+    if profile:
+        profile.configure(chrome_options)
+
+    driver_path = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        'drivers/chromedriver-mac-arm64/chromedriver'
+    )
+
+    logging.info(f"使用 ChromeDriver 路径: {driver_path}")
+    service = Service(executable_path=driver_path)
+    driver = webdriver.Chrome(service=service, options=chrome_options)
+    driver.set_page_load_timeout(30)
+    if profile:
+        profile.apply(driver)
+    return driver
+
+
+def session_dead(error):
+    """判断异常是否表示浏览器会话已失效"""
+    if isinstance(error, (InvalidSessionIdException, ConnectionError)):
+        return True
+    text = str(error).lower()
+    return any(marker in text for marker in DEAD_SESSION_MARKERS)
+
+
+def process_tree_rss(root_pids):
+    """返回 {根进程 pid: 进程及全部子进程的 RSS（字节）}，用于统计 chromedriver 和它启动的 Chrome"""
+    if not root_pids:
+        return {}
+    if psutil is not None:
+        result = {}
+        for pid in root_pids:
+            try:
+                root = psutil.Process(pid)
+                total = root.memory_info().rss
+                for child in root.children(recursive=True):
+                    try:
+                        total += child.memory_info().rss
+                    except psutil.Error:
+                        pass
+                result[pid] = total
+            except psutil.Error:
+                pass
+        return result
+    # macOS 和 Linux 都支持的 ps 输出：pid ppid rss(KB)
+    output = subprocess.run(['ps', '-A', '-o', 'pid=,ppid=,rss='], capture_output=True, text=True, timeout=5).stdout
+    children = {}
+    rss = {}
+    for line in output.splitlines():
+        parts = line.split()
+        if len(parts) != 3:
+            continue
+        pid, ppid, kb = (int(x) for x in parts)
+        children.setdefault(ppid, []).append(pid)
+        rss[pid] = kb * 1024
+    result = {}
+    for root in root_pids:
+        if root not in rss:
+            continue
+        total = 0
+        stack = [root]
+        while stack:
+            pid = stack.pop()
+            total += rss.get(pid, 0)
+            stack.extend(children.get(pid, ()))
+        result[root] = total
+    return result
+
+
+def pool_options(config):
+    """读取 [Driver] 中的浏览器回收参数，作为 DriverPool 的关键字参数"""
+    return {
+        'max_loads': config.getint('Driver', 'max_loads', fallback=500),
+        'max_rss_mb': config.getint('Driver', 'max_rss_mb', fallback=1500),
+        'max_error_rate': config.getfloat('Driver', 'max_error_rate', fallback=0.5),
+        'error_window': config.getint('Driver', 'error_window', fallback=20),
+        'spares': config.getint('Driver', 'spares', fallback=1),
+        'check_interval': config.getfloat('Driver', 'check_interval', fallback=30),
+        'warm_url': config.get('Driver', 'warm_url', fallback='') or None
+    }
+
+
+class ManagedDriver:
+    """池中一个浏览器的健康状态"""
+
+    def __init__(self, driver, error_window=20):
+        self.driver = driver
+        self.created = time.time()
+        self.loads = 0
+        self.results = deque(maxlen=error_window)  # 最近若干次加载是否成功
+        self.dead = False
+        self.rss = 0
+
+    @property
+    def pid(self):
+        service = getattr(self.driver, 'service', None)
+        process = getattr(service, 'process', None)
+        return getattr(process, 'pid', None)
+
+    @property
+    def error_rate(self):
+        if not self.results:
+            return 0.0
+        return 1 - sum(self.results) / len(self.results)
+
+
+class DriverPool:
+    """由多个无头浏览器组成的驱动池，市场链接在各个浏览器之间分摊
+
+    池同时负责浏览器的生命周期：记录每个浏览器的加载次数、最近错误率和进程树内存，
+    归还时如果会话已失效、加载次数超过 max_loads、内存超过 max_rss_mb 或错误率过高，
+    就用预热好的备用浏览器替换它，旧浏览器在后台关闭。备用浏览器没准备好时，
+    仍可用的旧浏览器继续工作，只有失效的会话才会让池暂时少一个浏览器。
+    """
+
+    def __init__(self, size=3, factory=create_chrome_driver, max_loads=500, max_rss_mb=1500,
+                 max_error_rate=0.5, error_window=20, spares=1, check_interval=30, warm_url=None):
+        self.size = max(1, int(size))
+        self.factory = factory
+        self.max_loads = max_loads
+        self.max_rss = max_rss_mb * 1024 * 1024 if max_rss_mb else 0
+        self.max_error_rate = max_error_rate
+        self.error_window = error_window
+        self.spare_count = spares
+        self.check_interval = check_interval
+        self.warm_url = warm_url  # 预热时打开的页面，提前建立连接和缓存
+        self.drivers = []
+        self.managed = {}      # driver -> ManagedDriver
+        self.idle = queue.Queue()
+        self.spares = queue.Queue()
+        self.launching = 0     # 正在启动的浏览器数量
+        self.running = False
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.supervisor = None
+
+    def start(self):
+        """并行启动所有浏览器，全部成功才返回 True"""
+        errors = []
+
+        def launch():
+            try:
+                driver = self.create()
+                with self.lock:
+                    self.drivers.append(driver)
+            except Exception as e:
+                errors.append(e)
+                logging.error(f"ChromeDriver 初始化失败: {str(e)}\n{traceback.format_exc()}")
+
+        threads = [threading.Thread(target=launch) for _ in range(self.size)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        if errors:
+            self.stop()
+            return False
+
+        for driver in self.drivers:
+            self.idle.put(driver)
+        self.running = True
+        self.stop_event.clear()
+        self.top_up()
+        self.supervisor = threading.Thread(target=self.supervise, daemon=True)
+        self.supervisor.start()
+        logging.info(f"驱动池启动成功，共 {len(self.drivers)} 个浏览器")
+        return True
+
+    def stop(self):
+        """关闭池中所有浏览器"""
+        self.running = False
+        self.stop_event.set()
+        with self.lock:
+            drivers, self.drivers = self.drivers, []
+            self.managed = {}
+        while not self.spares.empty():
+            drivers.append(self.spares.get_nowait())
+        for driver in drivers:
+            self.quit(driver)
+        while not self.idle.empty():
+            self.idle.get_nowait()
+        logging.info("驱动池已关闭")
+
+    def create(self):
+        """启动一个浏览器并登记健康状态"""
+        with DRIVER_LAUNCH.time():
+            driver = self.factory()
+            if self.warm_url:
+                try:
+                    driver.get(self.warm_url)
+                except Exception as e:
+                    logging.debug(f"预热页面加载失败: {str(e)}")
+        with self.lock:
+            self.managed[driver] = ManagedDriver(driver, self.error_window)
+        return driver
+
+    def quit(self, driver):
+        try:
+            driver.quit()
+        except Exception as e:
+            logging.error(f"关闭浏览器出错: {str(e)}")
+
+    def take(self):
+        """取出一个空闲浏览器，等到有可用的为止；调用者负责用 release 归还"""
+        while True:
+            if not self.running:
+                raise RuntimeError("驱动池未运行")
+            try:
+                return self.idle.get(timeout=1)
+            except queue.Empty:
+                continue
+
+    @contextmanager
+    def acquire(self):
+        """借出一个空闲浏览器，用完后归还"""
+        driver = self.take()
+        try:
+            yield driver
+        finally:
+            if self.running:
+                self.release(driver)
+
+    def record(self, driver, error=None):
+        """记录一次页面加载的结果"""
+        managed = self.managed.get(driver)
+        if managed is None:
+            return
+        managed.loads += 1
+        managed.results.append(error is None)
+        if error is not None and session_dead(error):
+            if not managed.dead:
+                logging.warning(f"浏览器会话已失效，将替换: {str(error).splitlines()[0]}")
+            managed.dead = True
+
+    def load(self, driver, func, *args):
+        """调用 func(driver, *args) 加载页面并记录结果，异常继续抛出"""
+        try:
+            result = func(driver, *args)
+        except Exception as e:
+            self.record(driver, e)
+            raise
+        self.record(driver)
+        return result
+
+    def recycle_reason(self, managed):
+        if managed is None:
+            return None
+        if managed.dead:
+            return 'dead'
+        if self.max_loads and managed.loads >= self.max_loads:
+            return 'loads'
+        if self.max_rss and managed.rss >= self.max_rss:
+            return 'memory'
+        if len(managed.results) >= self.error_window and managed.error_rate >= self.max_error_rate:
+            return 'errors'
+        return None
+
+    def release(self, driver):
+        """归还浏览器；需要回收时换上备用浏览器"""
+        with self.lock:
+            managed = self.managed.get(driver)
+            reason = self.recycle_reason(managed)
+            spare = None
+            if reason is not None and not self.spares.empty():
+                spare = self.spares.get_nowait()
+            if reason is None or (spare is None and reason != 'dead'):
+                # 旧浏览器还能用时等备用浏览器预热好再换，不让本轮抓取等待
+                self.idle.put(driver)
+                retired = False
+            else:
+                # 在同一把锁内完成替换，避免补充浏览器时重复计数
+                if driver in self.drivers:
+                    self.drivers.remove(driver)
+                self.managed.pop(driver, None)
+                if spare is not None:
+                    self.drivers.append(spare)
+                    self.idle.put(spare)
+                retired = True
+        if retired:
+            DRIVER_RECYCLES.inc(reason)
+            logging.info(f"回收浏览器（{reason}）: 加载 {managed.loads} 次, "
+                         f"错误率 {managed.error_rate:.0%}, 内存 {managed.rss / 1024 / 1024:.0f}MB")
+            threading.Thread(target=self.quit, args=(driver,), daemon=True).start()
+        if reason is not None:
+            self.top_up()
+
+    def top_up(self):
+        """在后台补足工作浏览器和备用浏览器"""
+        with self.lock:
+            if not self.running:
+                return
+            missing = self.size + self.spare_count - len(self.drivers) - self.spares.qsize() - self.launching
+            self.launching += max(0, missing)
+        for _ in range(max(0, missing)):
+            threading.Thread(target=self.launch_spare, daemon=True).start()
+
+    def launch_spare(self):
+        try:
+            driver = self.create()
+        except Exception as e:
+            logging.error(f"启动备用浏览器失败: {str(e)}")
+            with self.lock:
+                self.launching -= 1
+            return
+        with self.lock:
+            self.launching -= 1
+            running = self.running
+            if running and len(self.drivers) < self.size:
+                # 有失效的浏览器被移除时直接补进工作池，否则作为备用
+                self.drivers.append(driver)
+                self.idle.put(driver)
+            elif running:
+                self.spares.put(driver)
+        if not running:
+            self.quit(driver)
+
+    def supervise(self):
+        """定期采样浏览器内存，并重试启动失败的浏览器"""
+        while not self.stop_event.wait(self.check_interval):
+            try:
+                with self.lock:
+                    managed = list(self.managed.values())
+                usage = process_tree_rss([m.pid for m in managed if m.pid])
+                for m in managed:
+                    m.rss = usage.get(m.pid, m.rss)
+                self.top_up()
+            except Exception as e:
+                logging.error(f"检查浏览器状态出错: {str(e)}")
+
+    def stats(self):
+        with self.lock:
+            return {
+                'drivers': len(self.drivers),
+                'spares': self.spares.qsize(),
+                'launching': self.launching,
+                'browsers': [
+                    {'loads': m.loads, 'error_rate': round(m.error_rate, 2),
+                     'rss_mb': round(m.rss / 1024 / 1024), 'age': round(time.time() - m.created)}
+                    for m in self.managed.values()
+                ]
+            }
+
+    def run(self, items, func):
+        """把 items 分给所有浏览器并行处理，每项调用 func(driver, item)"""
+        tasks = queue.Queue()
+        for item in items:
+            tasks.put(item)
+
+        def worker():
+            try:
+                while self.running and not tasks.empty():
+                    with self.acquire() as driver:
+                        while self.running:
+                            try:
+                                item = tasks.get_nowait()
+                            except queue.Empty:
+                                return
+                            try:
+                                func(driver, item)
+                            except Exception as e:
+                                logging.error(f"处理市场出错: {str(e)}")
+                            if self.recycle_reason(self.managed.get(driver)):
+                                # 需要回收时先归还，换上备用浏览器后继续处理剩下的市场
+                                break
+            except RuntimeError:
+                # 驱动池已关闭
+                return
+
+        num_workers = min(len(self.drivers), tasks.qsize())
+        # 工作线程继承调用者的日志上下文（抓取轮次等）
+        threads = [threading.Thread(target=contextvars.copy_context().run, args=(worker,), daemon=True)
+                   for _ in range(num_workers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
@@ -0,0 +1,453 @@
+"""本地离线测试用的模拟服务器
+
+提供与 Polymarket gamma 接口相同格式的 /events 数据、带价格元素的分类页面和市场页面、
+币安 /api/v3/ticker/price 接口，以及币安组合行情流的 WebSocket 替身，
+所有价格源和币安订阅都可以指向它离线运行：
+
+    python fixture_server.py --port 8765 --ws-port 8766 --markets 20
+    监控地址填 http://127.0.0.1:8765/markets/crypto/bitcoin
+
+录制真实数据供以后回放：
+
+    python fixture_server.py --record bitcoin,ethereum --recorded recorded.json
+"""
+import argparse
+import asyncio
+import html
+import json
+import logging
+import random
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import requests
+from markets import PRICE_SELECTOR, format_cents
+
+# 页面上价格元素的 class，与价格源使用的选择器保持一致
+PRICE_CLASS = ' '.join(PRICE_SELECTOR.split('.')).strip()
+
+try:
+    import websockets
+except ImportError:
+    websockets = None
+
+
+class MarketFixtures:
+    """按分类生成模拟市场，价格按概率随机游走
+
+    默认在每次读取时变动；设置 tick_interval 后改为每隔 tick_interval 秒变动一次，
+    读取不再影响价格，history 中记录每次变化的时间，供基准测试计算端到端延迟。
+    """
+
+    def __init__(self, num_markets=20, change_rate=0.3, seed=1, recorded=None, tick_interval=None, shared=0):
+        self.num_markets = num_markets
+        self.shared = shared  # 同时出现在所有分类中的市场数量
+        self.change_rate = change_rate
+        self.random = random.Random(seed)
+        self.recorded = recorded  # 录制好的事件数据 {tag_slug: [event, ...]}
+        self.tick_interval = tick_interval
+        self.prices = {}
+        self.history = {}  # slug -> deque[(变化时间, Yes 美分文本)]
+        self.lock = threading.Lock()
+        self.ticker = None
+        self.stop_event = threading.Event()
+
+    def market_slugs(self, tag):
+        shared = [f"will-crypto-market-cap-be-above-{i + 1}t" for i in range(self.shared)]
+        return shared + [f"will-{tag}-be-above-{(i + 1) * 1000}-on-friday" for i in range(self.num_markets)]
+
+    def next_price(self, slug):
+        """返回市场当前的 Yes 概率，并按 change_rate 随机变动"""
+        price = self.prices.get(slug)
+        if price is None:
+            price = round(self.random.uniform(0.05, 0.95), 3)
+        elif self.tick_interval is None and self.random.random() < self.change_rate:
+            price = self.step(price)
+        self.set_price(slug, price)
+        return price
+
+    def step(self, price):
+        return min(0.99, max(0.01, round(price + self.random.uniform(-0.03, 0.03), 3)))
+
+    def set_price(self, slug, price):
+        if self.prices.get(slug) != price:
+            self.prices[slug] = price
+            self.history.setdefault(slug, deque(maxlen=1000)).append((time.time(), format_cents(price)))
+
+    def tick(self):
+        """按 change_rate 让每个市场的价格变动一次"""
+        with self.lock:
+            for slug, price in list(self.prices.items()):
+                if self.random.random() < self.change_rate:
+                    self.set_price(slug, self.step(price))
+
+    def start(self):
+        if self.tick_interval and self.recorded is None and self.ticker is None:
+            self.ticker = threading.Thread(target=self.run_ticker, daemon=True)
+            self.ticker.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def run_ticker(self):
+        while not self.stop_event.wait(self.tick_interval):
+            self.tick()
+
+    def history_since(self, since=0):
+        """{slug: [[变化时间, Yes 美分文本], ...]}"""
+        with self.lock:
+            return {slug: [list(item) for item in items if item[0] >= since]
+                    for slug, items in self.history.items()}
+
+    def events(self, tag):
+        """返回与 gamma /events 接口格式一致的事件列表"""
+        if self.recorded is not None:
+            return self.recorded.get(tag, [])
+        with self.lock:
+            events = []
+            for slug in self.market_slugs(tag):
+                yes = self.next_price(slug)
+                events.append({
+                    'slug': slug,
+                    'title': slug.replace('-', ' '),
+                    'markets': [{
+                        'slug': slug,
+                        'closed': False,
+                        'outcomes': json.dumps(['Yes', 'No']),
+                        'outcomePrices': json.dumps([f"{yes:.3f}", f"{1 - yes:.3f}"])
+                    }]
+                })
+            return events
+
+    def listing(self, tag):
+        """分类页面上的市场：[(页面路径, 市场 slug, 标题, Yes, No)]，与 HTTP 价格源的链接规则一致"""
+        items = []
+        for event in self.events(tag):
+            event_markets = event.get('markets') or []
+            for market in event_markets:
+                if market.get('closed'):
+                    continue
+                if len(event_markets) > 1:
+                    path = f"/event/{event['slug']}/{market['slug']}"
+                else:
+                    path = f"/event/{event['slug']}"
+                try:
+                    outcome_prices = market.get('outcomePrices') or '[]'
+                    if isinstance(outcome_prices, str):
+                        outcome_prices = json.loads(outcome_prices)
+                    yes, no = format_cents(outcome_prices[0]), format_cents(outcome_prices[1])
+                except (ValueError, TypeError, IndexError):
+                    continue
+                items.append((path, market['slug'], market.get('question') or event.get('title', ''), yes, no))
+        return items
+
+    def market(self, slug):
+        """单个市场的 (标题, Yes, No)，不存在时返回 None"""
+        if self.recorded is None:
+            with self.lock:
+                if slug not in self.prices:
+                    return None
+                yes = self.next_price(slug)
+            return slug.replace('-', ' '), format_cents(yes), format_cents(1 - yes)
+        for tag in self.recorded:
+            for path, market_slug, title, yes, no in self.listing(tag):
+                if market_slug == slug:
+                    return title, yes, no
+        return None
+
+
+def record_events(tags, path, api_base="https://gamma-api.polymarket.com"):
+    """从真实接口录制各分类的事件数据，保存为 --recorded 可读取的 JSON"""
+    recorded = {}
+    with requests.Session() as session:
+        for tag in tags:
+            response = session.get(
+                f"{api_base}/events",
+                params={'tag_slug': tag, 'active': 'true', 'closed': 'false', 'limit': 500},
+                timeout=(3, 10)
+            )
+            response.raise_for_status()
+            recorded[tag] = response.json()
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(recorded, f, ensure_ascii=False)
+    return recorded
+
+
+# 真实页面上与价格无关的资源：样式、字体、统计脚本和图片，用于对比精简加载配置的效果
+ASSETS = {
+    'site.css': ('text/css', 40_000),
+    'inter.woff2': ('font/woff2', 90_000),
+    'analytics.js': ('application/javascript', 120_000),
+    'card.png': ('image/png', 25_000)
+}
+# 模拟第三方脚本较慢的响应（秒）
+ASSET_DELAY = {'analytics.js': 0.3}
+PAGE_HEAD = ('<link rel="stylesheet" href="/static/site.css">'
+             '<script src="/static/analytics.js"></script>')
+
+
+ASSET_HEADS = {
+    'site.css': ("@font-face { font-family: Inter; src: url('/static/inter.woff2') format('woff2'); }\n"
+                 "body { font-family: Inter, sans-serif; }\n"),
+    'analytics.js': "window.analytics = { track: function () {} };\n"
+}
+
+
+def asset_body(name):
+    """按 ASSETS 中的大小生成资源内容，文本资源用空格补齐"""
+    content_type, size = ASSETS[name]
+    head = ASSET_HEADS.get(name, '').encode('utf-8')
+    filler = b'\0' if content_type.startswith(('image/', 'font/')) else b' '
+    return head + filler * max(0, size - len(head))
+
+
+def price_spans(yes, no):
+    return (f'<span class="{PRICE_CLASS}">{yes}¢</span>'
+            f'<span class="{PRICE_CLASS}">{no}¢</span>')
+
+
+def category_page(fixtures, tag):
+    cards = ''.join(
+        f'<div class="market-card"><img src="/static/card.png?m={html.escape(path)}">'
+        f'<a href="{path}">{html.escape(title)}</a>{price_spans(yes, no)}'
+        f'<a href="{path}#comments">comments</a></div>\n'
+        for path, _, title, yes, no in fixtures.listing(tag)
+    )
+    return (f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{html.escape(tag)}</title>{PAGE_HEAD}</head>'
+            f'<body><div id="markets-grid-container">\n{cards}</div></body></html>')
+
+
+# 市场页面定时从 /fixture/price 读取价格并更新元素文本，供常驻标签页的 MutationObserver 使用
+MARKET_PAGE_SCRIPT = """
+const slug = %s;
+setInterval(async () => {
+    const r = await fetch('/fixture/price/' + slug);
+    if (!r.ok) return;
+    const p = await r.json();
+    const els = document.querySelectorAll('%s');
+    if (els.length < 2) return;
+    if (els[0].textContent !== p.yes + '¢') els[0].textContent = p.yes + '¢';
+    if (els[1].textContent !== p.no + '¢') els[1].textContent = p.no + '¢';
+}, %d);
+"""
+
+
+def market_page(slug, title, yes, no, refresh_ms=500):
+    script = MARKET_PAGE_SCRIPT % (json.dumps(slug), PRICE_SELECTOR, refresh_ms)
+    return (f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{html.escape(title)}</title>{PAGE_HEAD}</head>'
+            f'<body><img src="/static/card.png?m={html.escape(slug)}"><h1>{html.escape(title)}</h1>'
+            f'<div class="outcomes">{price_spans(yes, no)}</div>'
+            f'<script>{script}</script></body></html>')
+
+
+class TickerFixtures:
+    """模拟币安现货价格，每次读取时随机小幅波动"""
+
+    def __init__(self, seed=2):
+        self.random = random.Random(seed)
+        self.prices = {'BTCUSDT': 65000.0, 'ETHUSDT': 3200.0, 'SOLUSDT': 150.0}
+        self.lock = threading.Lock()
+
+    def price(self, symbol):
+        with self.lock:
+            price = self.prices.get(symbol, 1.0) * (1 + self.random.uniform(-0.0005, 0.0005))
+            self.prices[symbol] = price
+            return price
+
+    def tickers(self, symbols=None):
+        """与 /api/v3/ticker/price 格式一致，未指定交易对时返回全部"""
+        return [{'symbol': s, 'price': f"{self.price(s):.8f}"} for s in (symbols or list(self.prices))]
+
+    def mini_ticker(self, symbol):
+        """与组合流中 miniTicker 消息格式一致"""
+        return {
+            'stream': f"{symbol.lower()}@miniTicker",
+            'data': {'e': '24hrMiniTicker', 'E': int(time.time() * 1000), 's': symbol, 'c': f"{self.price(symbol):.8f}"}
+        }
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    fixtures = None
+    tickers = None
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        query = parse_qs(parsed.query)
+        if parsed.path == '/events':
+            tag = query.get('tag_slug', ['bitcoin'])[0]
+            self.send_json(self.fixtures.events(tag))
+        elif parsed.path.startswith('/markets/'):
+            tag = parsed.path.rstrip('/').split('/')[-1]
+            self.send_body(category_page(self.fixtures, tag).encode('utf-8'), 'text/html')
+        elif parsed.path.startswith('/event/'):
+            slug = parsed.path.rstrip('/').split('/')[-1]
+            market = self.fixtures.market(slug)
+            if market is None:
+                self.send_error(404)
+                return
+            self.send_body(market_page(slug, *market).encode('utf-8'), 'text/html')
+        elif parsed.path.startswith('/fixture/price/'):
+            market = self.fixtures.market(parsed.path.split('/')[-1])
+            if market is None:
+                self.send_error(404)
+                return
+            self.send_json({'yes': market[1], 'no': market[2]})
+        elif parsed.path.startswith('/static/'):
+            name = parsed.path.split('/')[-1]
+            if name not in ASSETS:
+                self.send_error(404)
+                return
+            time.sleep(ASSET_DELAY.get(name, 0))
+            self.send_body(asset_body(name), ASSETS[name][0])
+        elif parsed.path == '/fixture/history':
+            self.send_json(self.fixtures.history_since(float(query.get('since', ['0'])[0])))
+        elif parsed.path == '/api/v3/ticker/price':
+            if 'symbols' in query:
+                self.send_json(self.tickers.tickers(json.loads(query['symbols'][0])))
+            elif 'symbol' in query:
+                self.send_json(self.tickers.tickers(query['symbol'])[0])
+            else:
+                self.send_json(self.tickers.tickers())
+        else:
+            self.send_error(404)
+
+    def send_json(self, data):
+        self.send_body(json.dumps(data).encode('utf-8'), 'application/json')
+
+    def send_body(self, body, content_type):
+        self.send_response(200)
+        self.send_header('Content-Type', f"{content_type}; charset=utf-8")
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.debug(f"fixture {self.address_string()} {format % args}")
+
+
+class FixtureServer:
+    """在后台线程中运行的模拟服务器，port=0 时自动选择空闲端口"""
+
+    def __init__(self, host='127.0.0.1', port=0, fixtures=None, tickers=None):
+        self.fixtures = fixtures or MarketFixtures()
+        handler = type('Handler', (FixtureHandler,), {
+            'fixtures': self.fixtures,
+            'tickers': tickers or TickerFixtures()
+        })
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.fixtures.start()
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.fixtures.stop()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class StreamServer:
+    """币安组合行情流的 WebSocket 替身，按 interval 推送 miniTicker 消息"""
+
+    def __init__(self, host='127.0.0.1', port=0, tickers=None, interval=0.5):
+        self.host = host
+        self.port = port
+        self.tickers = tickers or TickerFixtures()
+        self.interval = interval
+        self.loop = None
+        self.server = None
+        self.thread = None
+        self.ready = threading.Event()
+
+    @property
+    def base_url(self):
+        return f"ws://{self.host}:{self.port}"
+
+    async def handler(self, ws):
+        request = getattr(ws, 'request', None)
+        path = request.path if request else getattr(ws, 'path', '')
+        streams = parse_qs(urlparse(path).query).get('streams', [''])[0]
+        symbols = [s.split('@')[0].upper() for s in streams.split('/') if s]
+        try:
+            while True:
+                for symbol in symbols:
+                    await ws.send(json.dumps(self.tickers.mini_ticker(symbol)))
+                await asyncio.sleep(self.interval)
+        except websockets.ConnectionClosed:
+            pass
+
+    async def serve(self):
+        self.loop = asyncio.get_running_loop()
+        self.server = await websockets.serve(self.handler, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.ready.set()
+        await self.server.wait_closed()
+
+    def start(self):
+        if websockets is None:
+            raise RuntimeError("需要安装 websockets 才能启动 WebSocket 替身")
+        self.thread = threading.Thread(target=lambda: asyncio.run(self.serve()), daemon=True)
+        self.thread.start()
+        self.ready.wait(5)
+        return self
+
+    def stop(self):
+        """关闭服务器并断开所有连接，可用于测试断线重连"""
+        if self.loop and self.server:
+            self.loop.call_soon_threadsafe(self.server.close)
+            self.thread.join(timeout=5)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Polymarket 离线模拟服务器')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--ws-port', type=int, default=8766, help='币安行情流替身端口，0 表示不启动')
+    parser.add_argument('--markets', type=int, default=20, help='每个分类的市场数量')
+    parser.add_argument('--shared-markets', type=int, default=0, help='同时出现在所有分类中的市场数量')
+    parser.add_argument('--change-rate', type=float, default=0.3, help='每次变动时价格变化的概率')
+    parser.add_argument('--tick-interval', type=float, help='价格按固定间隔（秒）变动，不设置时每次读取时变动')
+    parser.add_argument('--recorded', help='录制的事件 JSON 文件，格式为 {tag_slug: [event, ...]}')
+    parser.add_argument('--record', help='从真实接口录制这些分类（逗号分隔）到 --recorded 文件后退出')
+    args = parser.parse_args()
+
+    if args.record:
+        if not args.recorded:
+            parser.error('--record 需要同时指定 --recorded 输出文件')
+        recorded = record_events([t.strip() for t in args.record.split(',') if t.strip()], args.recorded)
+        print(f"已录制 {sum(len(v) for v in recorded.values())} 个事件到 {args.recorded}")
+        return
+
+    recorded = None
+    if args.recorded:
+        with open(args.recorded, encoding='utf-8') as f:
+            recorded = json.load(f)
+
+    fixtures = MarketFixtures(args.markets, args.change_rate, recorded=recorded,
+                              tick_interval=args.tick_interval, shared=args.shared_markets)
+    tickers = TickerFixtures()
+    server = FixtureServer(args.host, args.port, fixtures, tickers).start()
+    print(f"模拟服务器已启动: {server.base_url}", flush=True)
+    if args.ws_port:
+        stream = StreamServer(args.host, args.ws_port, tickers).start()
+        print(f"币安行情流替身已启动: {stream.base_url}", flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
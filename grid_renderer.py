@@ -0,0 +1,409 @@
+import time
+import tkinter as tk
+from tkinter import font, ttk
+import metrics
+
+GRID_RENDER = metrics.histogram('grid_render_seconds', '滚动、排序或市场增减后重新绑定可见格子的耗时')
+
+SORT_MODES = ('category', 'volatility', 'recent')  # 分类顺序、波动率从高到低、最近变化在前
+
+
+class MarketRow:
+    """一个市场的显示状态，与它是否在屏幕上无关"""
+
+    def __init__(self, market_id, order):
+        self.market_id = market_id
+        self.order = order       # 在分类布局中的位置，排序相同时按它排
+        self.market_text = ""
+        self.price_text = "-"
+        self.stats_text = ""
+        self.volatility = None
+        self.url = ""
+        self.changed_at = 0      # 最近一次价格变化的时间
+        self.flash_until = 0
+
+
+class GridModel:
+    """按市场标识保存全部格子的状态，并给出当前排序和过滤下要显示的行
+
+    set_layout 只增删有变化的市场，保留其余市场的价格、统计和变红状态。
+    lines() 返回 [('header', 标题) 或 ('cells', [market_id, ...])]，每个元素占一行。
+    """
+
+    def __init__(self, columns=3, sort='category', recent_seconds=300):
+        self.columns = columns
+        self.sort = sort
+        self.recent_only = False
+        self.recent_seconds = recent_seconds
+        self.layout = []  # [(标题或 None, [market_id, ...])]
+        self.rows = {}    # market_id -> MarketRow
+        self.cached = None
+
+    def set_layout(self, groups):
+        """按 [(标题, [market_id, ...])] 调整市场，返回 (新增的市场, 移除的市场)"""
+        ids = [market_id for _, market_ids in groups for market_id in market_ids]
+        keep = set(ids)
+        removed = [market_id for market_id in self.rows if market_id not in keep]
+        for market_id in removed:
+            del self.rows[market_id]
+        added = []
+        for order, market_id in enumerate(ids):
+            row = self.rows.get(market_id)
+            if row is None:
+                row = self.rows[market_id] = MarketRow(market_id, order)
+                added.append(market_id)
+            row.order = order
+        self.layout = [(title, list(market_ids)) for title, market_ids in groups]
+        self.cached = None
+        return added, removed
+
+    def set_sort(self, sort, recent_only=None):
+        if sort not in SORT_MODES:
+            raise ValueError(f"不支持的排序方式: {sort}")
+        self.sort = sort
+        if recent_only is not None:
+            self.recent_only = recent_only
+        self.cached = None
+
+    def update(self, market_id, market_text, price_text, changed, url, now):
+        """记录一个价格，市场不在布局中时返回 None"""
+        row = self.rows.get(market_id)
+        if row is None:
+            return None
+        row.market_text = market_text
+        row.price_text = price_text
+        row.url = url
+        if changed:
+            row.changed_at = now
+            if self.sort == 'recent' or self.recent_only:
+                self.cached = None
+        return row
+
+    def update_stats(self, market_id, stats_text, volatility):
+        row = self.rows.get(market_id)
+        if row is None:
+            return None
+        row.stats_text = stats_text
+        if volatility != row.volatility:
+            row.volatility = volatility
+            if self.sort == 'volatility':
+                self.cached = None
+        return row
+
+    @property
+    def stale(self):
+        """排序或过滤依据变了，需要重新生成行（只看最近变化时市场会随时间过期，总是需要）"""
+        return self.cached is None or self.recent_only
+
+    def visible_ids(self, now):
+        cutoff = now - self.recent_seconds
+        for title, market_ids in self.layout:
+            market_ids = [m for m in market_ids if not self.recent_only or self.rows[m].changed_at >= cutoff]
+            yield title, market_ids
+
+    def lines(self, now=None):
+        if not self.stale:
+            return self.cached
+        now = now or time.time()
+        groups = list(self.visible_ids(now))
+        if self.sort != 'category':
+            # 按数值排序时不再分组
+            market_ids = [m for _, ids in groups for m in ids]
+            if self.sort == 'volatility':
+                market_ids.sort(key=lambda m: (self.rows[m].volatility is None, -(self.rows[m].volatility or 0),
+                                               self.rows[m].order))
+            else:
+                market_ids.sort(key=lambda m: (-self.rows[m].changed_at, self.rows[m].order))
+            groups = [(None, market_ids)]
+        lines = []
+        for title, market_ids in groups:
+            # 只看最近变化时不显示没有市场的分组
+            if title is not None and (market_ids or not self.recent_only):
+                lines.append(('header', f"{title} ({len(market_ids)})"))
+            for start in range(0, len(market_ids), self.columns):
+                lines.append(('cells', market_ids[start:start + self.columns]))
+        self.cached = lines
+        return lines
+
+
+class GridCell:
+    """网格中的一个格子：固定的一组控件，并缓存当前显示的内容"""
+
+    def __init__(self, parent, renderer):
+        self.frame = tk.Frame(parent, relief="solid", borderwidth=1, bg=renderer.frame_bg)
+        self.market_label = tk.Label(
+            self.frame,
+            text="",
+            font=renderer.market_font,
+            fg='#000000',  # 使用黑色
+            bg=renderer.frame_bg,
+            anchor='center',
+            justify='center',
+            cursor="hand2"
+        )
+        self.market_label.pack(side='top', pady=(5, 0))
+        self.price_label = tk.Label(
+            self.frame,
+            text="-",
+            font=renderer.price_font,
+            fg=renderer.normal_color,
+            bg=renderer.frame_bg,
+            anchor='center',
+            justify='center'
+        )
+        self.price_label.pack(side='top', pady=(10, 0))
+        # 滚动统计（EMA、波动率、区间、变化频率）
+        self.stats_label = tk.Label(
+            self.frame,
+            text="",
+            font=renderer.stats_font,
+            fg='#555555',
+            bg=renderer.frame_bg,
+            anchor='center',
+            justify='center'
+        )
+        self.stats_label.pack(side='top', pady=(0, 5))
+        self.market_text = ""
+        self.price_text = "-"
+        self.stats_text = ""
+        self.color = renderer.normal_color
+        self.url = ""
+        self.market_id = None  # 当前显示的市场，滚动或排序后格子会换成别的市场
+        # 点击时读取当前链接，不必每次更新都重新绑定
+        self.market_label.bind('<Button-1>', lambda e: renderer.on_click(self.url) if self.url else None)
+
+    def set(self, market_text, price_text, color, url):
+        """只对真正变化的属性调用 config"""
+        if market_text != self.market_text:
+            self.market_label.config(text=market_text)
+            self.market_text = market_text
+        if price_text != self.price_text or color != self.color:
+            self.price_label.config(text=price_text, fg=color)
+            self.price_text = price_text
+            self.color = color
+        self.url = url
+
+    def set_stats(self, stats_text):
+        if stats_text != self.stats_text:
+            self.stats_label.config(text=stats_text)
+            self.stats_text = stats_text
+
+
+class RowSlot:
+    """屏幕上的一行：一个分组标题或一排格子，滚动时换绑到别的行"""
+
+    def __init__(self, parent, renderer):
+        self.frame = tk.Frame(parent, bg=parent.cget('bg'))
+        self.header = tk.Label(self.frame, font=renderer.market_font, fg='#0066CC', bg=parent.cget('bg'), anchor='w')
+        self.cells = [GridCell(self.frame, renderer) for _ in range(renderer.columns)]
+        for col in range(renderer.columns):
+            self.frame.columnconfigure(col, weight=1, uniform='cell')
+        self.line = None
+
+
+class GridRenderer:
+    """虚拟化的价格网格
+
+    所有市场的状态保存在 GridModel 中，控件只为可见的行创建，滚动、排序或市场增减时
+    把这些控件换绑到别的市场，界面开销只与窗口中显示的格子数有关，与市场总数无关。
+    价格更新先进入待处理字典，由调用方每帧调用一次 flush 统一写入可见的格子。
+    """
+
+    def __init__(self, root, parent, market_font, price_font, frame_bg, on_click,
+                 columns=3, flash_seconds=15, stats_font=('Arial', 12),
+                 sort='category', recent_seconds=300, resort_interval=2):
+        self.root = root
+        self.market_font = market_font
+        self.price_font = price_font
+        self.stats_font = stats_font
+        self.frame_bg = frame_bg
+        self.on_click = on_click
+        self.columns = columns
+        self.flash_seconds = flash_seconds    # 价格变化后红色保持的时间
+        self.resort_interval = resort_interval  # 按波动率或最近变化排序时，重新排序的最短间隔（秒）
+        self.normal_color = '#0066CC'
+        self.flash_color = 'red'
+        self.model = GridModel(columns, sort, recent_seconds)
+
+        self.body = tk.Frame(parent, bg=parent.cget('bg'))
+        self.body.pack(side='left', expand=True, fill='both')
+        self.scrollbar = ttk.Scrollbar(parent, orient='vertical', command=self.yview)
+        self.scrollbar.pack(side='right', fill='y')
+        self.body.columnconfigure(0, weight=1)
+        self.body.bind('<Configure>', lambda e: self.render())
+        for sequence in ('<MouseWheel>', '<Button-4>', '<Button-5>'):
+            self.root.bind(sequence, self.on_wheel, add='+')
+
+        # 行高按字体估算，不必等控件布局完成
+        self.cell_height = sum(self.line_height(f) for f in (market_font, price_font, stats_font)) + 32
+        self.header_height = self.line_height(market_font) + 4
+        self.slots = []
+        self.first = 0        # 第一条可见行的序号
+        self.visible = {}     # market_id -> 显示它的 GridCell
+        self.pending = {}     # market_id -> MarketRow，等待写入界面的可见格子
+        self.flashing = set()  # 正在显示红色的市场
+        self.last_sort = 0
+        metrics.gauge('grid_visible_cells', '当前绑定了市场的格子数', lambda: len(self.visible))
+        metrics.gauge('grid_markets', '网格中的市场总数', lambda: len(self.model.rows))
+
+    def line_height(self, spec):
+        if not isinstance(spec, font.Font):
+            spec = font.Font(root=self.root, font=spec)
+        return spec.metrics('linespace')
+
+    def layout(self, groups):
+        """按 [(标题, [market_id, ...])] 调整网格，标题为 None 时不显示标题行
+
+        只增删有变化的市场，其余市场保留原来的显示状态，返回 (新增的市场, 移除的市场)。
+        """
+        added, removed = self.model.set_layout(groups)
+        for market_id in removed:
+            self.pending.pop(market_id, None)
+            self.flashing.discard(market_id)
+        self.render()
+        return added, removed
+
+    def set_sort(self, sort, recent_only=None):
+        self.model.set_sort(sort, recent_only)
+        self.first = 0
+        self.render()
+
+    def update(self, market_id, market_text, price_text, price_changed, url=""):
+        """登记一次更新，只有当前可见的格子才会写入界面"""
+        now = time.time()
+        row = self.model.update(market_id, market_text, price_text, price_changed, url, now)
+        if row is None:
+            return
+        if price_changed:
+            row.flash_until = now + self.flash_seconds
+            self.flashing.add(market_id)
+        if market_id in self.visible:
+            self.pending[market_id] = row
+
+    def update_stats(self, market_id, stats_text, volatility=None):
+        """登记格子的统计文本，与价格一起在下一帧写入"""
+        row = self.model.update_stats(market_id, stats_text, volatility)
+        if row is not None and market_id in self.visible:
+            self.pending[market_id] = row
+
+    def show(self, cell, row, now):
+        color = self.flash_color if row.flash_until > now else self.normal_color
+        cell.set(row.market_text, row.price_text, color, row.url)
+        cell.set_stats(row.stats_text)
+
+    def flush(self):
+        """把本帧积累的更新一次性写入可见的格子，并恢复已过期的红色（每帧调用一次）"""
+        now = time.time()
+        # 排序依据变化后按间隔重新排序，避免格子每帧跳动
+        if self.model.stale and now - self.last_sort >= self.resort_interval:
+            self.render()
+        pending, self.pending = self.pending, {}
+        for market_id, row in pending.items():
+            cell = self.visible.get(market_id)
+            if cell is not None:
+                self.show(cell, row, now)
+
+        for market_id in list(self.flashing):
+            row = self.model.rows.get(market_id)
+            if row is None or row.flash_until <= now:
+                self.flashing.discard(market_id)
+                cell = self.visible.get(market_id)
+                if cell is not None and row is not None:
+                    self.show(cell, row, now)
+
+    def fitting(self, lines, start, height):
+        """从 start 开始能放下的行数（至少一行）"""
+        used = 0
+        count = 0
+        for kind, _ in lines[start:]:
+            used += self.header_height if kind == 'header' else self.cell_height
+            if count and used > height:
+                break
+            count += 1
+        return count
+
+    def max_first(self, lines, height):
+        """最后一屏第一行的序号"""
+        used = 0
+        for i in range(len(lines) - 1, -1, -1):
+            used += self.header_height if lines[i][0] == 'header' else self.cell_height
+            if used > height:
+                return min(i + 1, len(lines) - 1)
+        return 0
+
+    def render(self):
+        """把可见的行绑定到控件上，只有换了市场的格子才会重新写入"""
+        with GRID_RENDER.time():
+            now = time.time()
+            lines = self.model.lines(now)
+            self.last_sort = now
+            height = max(self.body.winfo_height(), self.cell_height)
+            self.first = max(0, min(self.first, self.max_first(lines, height)))
+            count = self.fitting(lines, self.first, height)
+            while len(self.slots) < count:
+                slot = RowSlot(self.body, self)
+                slot.frame.grid(row=len(self.slots), column=0, sticky='ew')
+                self.slots.append(slot)
+
+            visible = {}
+            for i, slot in enumerate(self.slots):
+                line = lines[self.first + i] if i < count else None
+                if line is None:
+                    if slot.line is not None:
+                        slot.frame.grid_remove()
+                        slot.line = None
+                    continue
+                if slot.line is None:
+                    slot.frame.grid()
+                kind, value = line
+                if kind == 'header':
+                    if slot.line is None or slot.line[0] != 'header':
+                        for cell in slot.cells:
+                            cell.frame.grid_remove()
+                        slot.header.grid(row=0, column=0, columnspan=self.columns, sticky='w', padx=5)
+                    slot.header.config(text=value)
+                else:
+                    if slot.line is not None and slot.line[0] == 'header':
+                        slot.header.grid_remove()
+                    for col, cell in enumerate(slot.cells):
+                        if col < len(value):
+                            row = self.model.rows[value[col]]
+                            cell.market_id = row.market_id
+                            self.show(cell, row, now)
+                            cell.frame.grid(row=0, column=col, padx=5, pady=5, sticky='nsew')
+                            visible[row.market_id] = cell
+                        else:
+                            cell.market_id = None
+                            cell.frame.grid_remove()
+                slot.line = line
+            self.visible = visible
+            # 不可见的市场不需要写入界面
+            self.pending = {m: row for m, row in self.pending.items() if m in visible}
+
+            if lines:
+                self.scrollbar.set(self.first / len(lines), (self.first + count) / len(lines))
+            else:
+                self.scrollbar.set(0, 1)
+
+    def yview(self, *args):
+        """滚动条回调：('moveto', 比例) 或 ('scroll', 数量, 'units'/'pages')"""
+        lines = self.model.lines()
+        if not lines:
+            return
+        if args[0] == 'moveto':
+            self.first = int(float(args[1]) * len(lines))
+        elif args[0] == 'scroll':
+            step = int(args[1])
+            if args[2] == 'pages':
+                step *= max(1, self.fitting(lines, self.first, self.body.winfo_height()) - 1)
+            self.first += step
+        self.render()
+
+    def on_wheel(self, event):
+        # 只处理网格区域内的滚轮事件
+        if not str(event.widget).startswith(str(self.body)):
+            return
+        if event.num == 4 or event.delta > 0:
+            self.yview('scroll', -1, 'units')
+        elif event.num == 5 or event.delta < 0:
+            self.yview('scroll', 1, 'units')
@@ -0,0 +1,198 @@
+"""抓取用浏览器的精简加载配置
+
+价格只需要页面上的几个文本元素，图片、字体、媒体、统计和广告脚本都是多余的下载和执行。
+LoadProfile 通过 DevTools 的 Network.setBlockedURLs 按资源类型（换算成扩展名）和地址模式拦截请求，
+同时关闭图片解码和 Chrome 的后台网络功能。
+
+对比开启和关闭配置时离线页面的流量和耗时：
+
+    python benchmark.py --page-weight
+"""
+import json
+import logging
+import time
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+import metrics
+from driver_pool import create_chrome_driver
+
+PAGE_BYTES = metrics.counter('page_bytes_total', '抓取页面下载的字节数（需开启 [LoadProfile] measure）')
+PAGE_REQUESTS = metrics.counter('page_requests_total', '抓取页面发出的请求数', label='result')
+
+# 资源类型对应的地址模式，setBlockedURLs 只支持按地址拦截
+TYPE_PATTERNS = {
+    'image': ('*.png*', '*.jpg*', '*.jpeg*', '*.gif*', '*.webp*', '*.avif*', '*.svg*', '*.ico*'),
+    'media': ('*.mp4*', '*.webm*', '*.mp3*', '*.m3u8*'),
+    'font': ('*.woff*', '*.ttf*', '*.otf*', '*.eot*'),
+    'stylesheet': ('*.css*',)
+}
+
+DEFAULT_BLOCK_URLS = (
+    '*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*', '*segment.io*',
+    '*sentry.io*', '*hotjar.com*', '*intercom.io*', '*mixpanel.com*', '*amplitude.com*',
+    '*clarity.ms*', '*/analytics.js*'
+)
+
+# 与抓取无关的后台功能：翻译、投屏、组件更新、同步等
+DEFAULT_DISABLE_FEATURES = (
+    'Translate', 'MediaRouter', 'OptimizationHints', 'AutofillServerCommunication', 'InterestFeedContentSuggestions'
+)
+LEAN_ARGS = (
+    '--disable-background-networking',
+    '--disable-component-update',
+    '--disable-default-apps',
+    '--disable-sync',
+    '--disable-client-side-phishing-detection',
+    '--no-first-run',
+    '--mute-audio'
+)
+
+
+def split_list(text):
+    return tuple(item.strip() for item in text.split(',') if item.strip())
+
+
+class LoadProfile:
+    def __init__(self, enabled=True, block_types=('image', 'media', 'font'), block_urls=DEFAULT_BLOCK_URLS,
+                 disable_features=DEFAULT_DISABLE_FEATURES, measure=False):
+        self.enabled = enabled
+        self.block_types = tuple(block_types)
+        self.block_urls = tuple(block_urls)
+        self.disable_features = tuple(disable_features)
+        self.measure = measure  # 开启后记录每个页面的流量，需要 Chrome 性能日志
+
+    @classmethod
+    def from_config(cls, config):
+        """读取 [LoadProfile] 配置"""
+        return cls(
+            enabled=config.getboolean('LoadProfile', 'enabled', fallback=True),
+            block_types=split_list(config.get('LoadProfile', 'block_types', fallback='image,media,font')),
+            block_urls=split_list(config.get('LoadProfile', 'block_urls', fallback=','.join(DEFAULT_BLOCK_URLS))),
+            disable_features=split_list(config.get(
+                'LoadProfile', 'disable_features', fallback=','.join(DEFAULT_DISABLE_FEATURES)
+            )),
+            measure=config.getboolean('LoadProfile', 'measure', fallback=False)
+        )
+
+    @property
+    def blocked_patterns(self):
+        patterns = []
+        for kind in self.block_types:
+            patterns.extend(TYPE_PATTERNS.get(kind, ()))
+        return patterns + list(self.block_urls)
+
+    def configure(self, options):
+        """在创建浏览器前设置启动参数"""
+        if self.measure:
+            options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+        if not self.enabled:
+            return
+        for arg in LEAN_ARGS:
+            options.add_argument(arg)
+        if self.disable_features:
+            options.add_argument(f"--disable-features={','.join(self.disable_features)}")
+        if 'image' in self.block_types:
+            # 同时跳过图片解码
+            options.add_argument('--blink-settings=imagesEnabled=false')
+            options.add_experimental_option('prefs', {'profile.managed_default_content_settings.images': 2})
+
+    def apply(self, driver):
+        """浏览器启动后通过 DevTools 设置拦截规则，对之后打开的所有页面生效"""
+        if not self.enabled:
+            return
+        patterns = self.blocked_patterns
+        if patterns:
+            driver.execute_cdp_cmd('Network.enable', {})
+            driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': patterns})
+
+    def record(self, driver):
+        """汇总上次调用以来的页面流量并计入指标，未开启 measure 时不做任何事"""
+        if not self.measure:
+            return None
+        try:
+            usage = network_usage(driver.get_log('performance'))
+        except Exception as e:
+            logging.debug(f"读取性能日志失败: {str(e)}")
+            return None
+        PAGE_BYTES.inc(amount=usage['bytes'])
+        PAGE_REQUESTS.inc('finished', usage['finished'])
+        PAGE_REQUESTS.inc('blocked', usage['blocked'])
+        return usage
+
+
+def network_usage(entries):
+    """从 Chrome 性能日志统计流量：{'bytes', 'finished', 'blocked', 'failed', 'span'}
+
+    span 是第一个请求发出到最后一个请求结束的时间（秒），即页面网络活动的持续时间。
+    """
+    usage = {'bytes': 0, 'finished': 0, 'blocked': 0, 'failed': 0, 'span': 0.0}
+    first = last = None
+    for entry in entries:
+        message = json.loads(entry['message'])['message']
+        method = message.get('method')
+        params = message.get('params', {})
+        timestamp = params.get('timestamp')
+        if method == 'Network.requestWillBeSent':
+            first = timestamp if first is None else min(first, timestamp)
+        elif method == 'Network.loadingFinished':
+            usage['finished'] += 1
+            usage['bytes'] += int(params.get('encodedDataLength', 0))
+            last = timestamp if last is None else max(last, timestamp)
+        elif method == 'Network.loadingFailed':
+            if params.get('blockedReason'):
+                usage['blocked'] += 1
+            else:
+                usage['failed'] += 1
+            last = timestamp if last is None else max(last, timestamp)
+    if first is not None and last is not None:
+        usage['span'] = max(0.0, last - first)
+    return usage
+
+
+def measure_pages(urls, profile, selector, repeat=3):
+    """用指定配置逐个加载页面，等到 selector 对应的价格元素出现为止
+
+    返回 {地址: 平均的 {'bytes', 'finished', 'blocked', 'failed', 'span', 'wall'}}，wall 是从开始加载到读到价格的耗时。
+    """
+    driver = create_chrome_driver(profile=profile)
+    results = {}
+    try:
+        for url in urls:
+            samples = []
+            for _ in range(repeat):
+                # 每次清空缓存，与抓取时资源第一次加载的情况一致
+                driver.execute_cdp_cmd('Network.clearBrowserCache', {})
+                driver.get_log('performance')
+                start = time.perf_counter()
+                driver.get(url)
+                WebDriverWait(driver, 10, poll_frequency=0.05).until(
+                    EC.presence_of_all_elements_located((By.CSS_SELECTOR, selector))
+                )
+                wall = time.perf_counter() - start
+                # 等页面上剩余的请求结束后再读取日志
+                time.sleep(0.5)
+                usage = network_usage(driver.get_log('performance'))
+                usage['wall'] = wall
+                samples.append(usage)
+            results[url] = {key: sum(s[key] for s in samples) / len(samples) for key in samples[0]}
+    finally:
+        driver.quit()
+    return results
+
+
+def compare_profiles(urls, profile, selector, repeat=3):
+    """分别关闭和开启精简配置加载同一组页面，返回每个页面节省的字节数和耗时"""
+    lean = LoadProfile(True, profile.block_types, profile.block_urls, profile.disable_features, measure=True)
+    full = LoadProfile(enabled=False, measure=True)
+    before = measure_pages(urls, full, selector, repeat)
+    after = measure_pages(urls, lean, selector, repeat)
+    pages = {}
+    for url in urls:
+        pages[url] = {
+            'full': before[url],
+            'lean': after[url],
+            'bytes_saved': before[url]['bytes'] - after[url]['bytes'],
+            'time_saved': before[url]['wall'] - after[url]['wall']
+        }
+    return pages
@@ -0,0 +1,347 @@
+"""非阻塞日志：抓取线程和界面线程只把日志记录放入队列，由后台线程格式化并写入文件
+
+- 每条记录写成一行 JSON，带上当前的 market_id 和 cycle（抓取轮次）等上下文
+- 日志文件按大小和时间轮转，按数量和天数保留，不再在启动时删除旧日志
+- 各子系统（模块名，如 price_source、binance_feed，或具名 logger 如 summary）可以单独设置级别
+
+在本机测量日志对调用线程增加的延迟和后台写入的吞吐：
+
+    python log_pipeline.py --records 200000 --threads 4
+"""
+import argparse
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+import metrics
+
+LOG_ENQUEUE = metrics.histogram(
+    'log_enqueue_seconds', '调用线程中处理一条日志（附加上下文并放入队列）的耗时',
+    buckets=(1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 1e-3, 1e-2)
+)
+LOG_RECORDS = metrics.counter('log_records_total', '写入日志文件的记录数', label='level')
+LOG_DROPPED = metrics.counter('log_dropped_total', '日志队列已满时丢弃的记录数')
+
+# 当前线程的日志上下文，例如 {'cycle': 12, 'market_id': '...'}
+LOG_CONTEXT = contextvars.ContextVar('log_context', default={})
+CONTEXT_FIELDS = ('cycle', 'market_id', 'category', 'worker')
+
+
+def subsystem(record):
+    """记录所属的子系统：具名 logger 用它的名字（如 summary），其余用模块名"""
+    return record.module if record.name == 'root' else record.name
+
+
+@contextmanager
+def log_context(**fields):
+    """在 with 块内产生的日志都带上这些字段"""
+    token = LOG_CONTEXT.set({**LOG_CONTEXT.get(), **fields})
+    try:
+        yield
+    finally:
+        LOG_CONTEXT.reset(token)
+
+
+class JsonFormatter(logging.Formatter):
+    """一行一条 JSON：time、level、subsystem、thread、message 以及上下文字段"""
+
+    def format(self, record):
+        data = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'subsystem': subsystem(record),
+            'thread': record.threadName,
+            'message': record.getMessage()
+        }
+        for field in CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                data[field] = value
+        if record.exc_info:
+            data['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data['exception'] = record.exc_text
+        return json.dumps(data, ensure_ascii=False)
+
+
+class AsyncQueueHandler(logging.handlers.QueueHandler):
+    """在调用线程中执行：按子系统级别过滤、附加上下文并放入队列，队列满时丢弃而不是等待"""
+
+    def __init__(self, log_queue, default_level=logging.ERROR, levels=None):
+        super().__init__(log_queue)
+        self.default_level = default_level
+        self.levels = levels or {}  # 子系统（模块名） -> 级别
+
+    def handle(self, record):
+        if record.levelno < self.levels.get(subsystem(record), self.default_level):
+            return False
+        start = time.perf_counter()
+        for field, value in LOG_CONTEXT.get().items():
+            setattr(record, field, value)
+        result = super().handle(record)
+        LOG_ENQUEUE.observe(time.perf_counter() - start)
+        return result
+
+    def prepare(self, record):
+        # 只合并消息参数，格式化留给后台线程
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_DROPPED.inc()
+
+
+class RotatingLogHandler(logging.FileHandler):
+    """按大小或时间轮转的日志文件（只在后台写入线程中使用）
+
+    当前文件写满 max_bytes 或距上次轮转超过 rotate_seconds 时改名为 <文件名>.<时间>，
+    轮转后只保留最近 backup_count 个文件，并删除超过 retention_days 天的文件。
+    """
+
+    def __init__(self, path, max_bytes=10 * 1024 * 1024, rotate_seconds=86400, backup_count=20, retention_days=7):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        super().__init__(path, encoding='utf-8')
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.backup_count = backup_count
+        self.retention_days = retention_days
+        self.next_rotation = time.time() + rotate_seconds
+        self.prune()
+
+    def emit(self, record):
+        try:
+            if self.should_rotate():
+                self.rotate()
+            super().emit(record)
+            LOG_RECORDS.inc(record.levelname)
+        except Exception:
+            self.handleError(record)
+
+    def should_rotate(self):
+        if self.stream is None:
+            return False
+        if self.rotate_seconds and time.time() >= self.next_rotation:
+            return True
+        return bool(self.max_bytes) and self.stream.tell() >= self.max_bytes
+
+    def rotate(self):
+        self.stream.close()
+        self.stream = None
+        if os.path.getsize(self.baseFilename) > 0:
+            target = f"{self.baseFilename}.{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            suffix = 1
+            while os.path.exists(target):
+                target = f"{self.baseFilename}.{datetime.now().strftime('%Y%m%d_%H%M%S')}_{suffix}"
+                suffix += 1
+            os.replace(self.baseFilename, target)
+        self.next_rotation = time.time() + self.rotate_seconds
+        self.stream = self._open()
+        self.prune()
+
+    def prune(self):
+        """删除超出数量或天数的旧文件"""
+        directory, name = os.path.split(self.baseFilename)
+        rotated = sorted(
+            os.path.join(directory, f) for f in os.listdir(directory or '.') if f.startswith(name + '.')
+        )
+        cutoff = time.time() - self.retention_days * 86400
+        for index, path in enumerate(rotated):
+            try:
+                if index < len(rotated) - self.backup_count or os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError as e:
+                logging.debug(f"删除旧日志 {path} 失败: {str(e)}")
+
+
+class LogPipeline:
+    """队列处理器加后台写入线程"""
+
+    def __init__(self, handler, default_level=logging.ERROR, levels=None, queue_size=10000):
+        self.queue = queue.Queue(queue_size)
+        self.handler = handler
+        self.queue_handler = AsyncQueueHandler(self.queue, default_level, levels)
+        self.listener = logging.handlers.QueueListener(self.queue, handler)
+        metrics.gauge('log_queue_depth', '等待写入的日志记录数', self.queue.qsize)
+
+    def start(self):
+        root = logging.getLogger()
+        for old in list(root.handlers):
+            root.removeHandler(old)
+        root.addHandler(self.queue_handler)
+        # 根记录器放行所有子系统中最低的级别，具体过滤在 AsyncQueueHandler 中进行
+        root.setLevel(min([self.queue_handler.default_level, *self.queue_handler.levels.values()]))
+        self.listener.start()
+        return self
+
+    def stop(self):
+        """写完队列中剩余的记录"""
+        logging.getLogger().removeHandler(self.queue_handler)
+        self.listener.stop()
+        self.handler.close()
+
+
+def parse_level(level, fallback=logging.ERROR, problems=None):
+    """'INFO' 或 20 -> 20；无法识别的级别返回 fallback，并把说明加入 problems"""
+    if isinstance(level, int):
+        return level
+    value = logging.getLevelName(str(level).strip().upper())
+    if isinstance(value, int):
+        return value
+    if problems is not None:
+        problems.append(f"无法识别的日志级别 {level!r}，改用 {logging.getLevelName(fallback)}")
+    return fallback
+
+
+def parse_levels(text, default=logging.ERROR, problems=None):
+    """'price_source:INFO, binance_feed:WARNING' -> {'price_source': 20, 'binance_feed': 30}"""
+    levels = {}
+    for item in text.split(','):
+        if ':' in item:
+            name, level = item.split(':', 1)
+            levels[name.strip()] = parse_level(level, default, problems)
+    return levels
+
+
+# 旧版本每次启动新建的日志文件，如 monitor_20240101_120000.log
+LEGACY_LOG = re.compile(r'^monitor_\d{8}_\d{6}\.log$')
+
+
+def remove_legacy_logs(directory, retention_days):
+    """删除旧版本留下的超过保留天数的日志（它们不在轮转文件的命名规则内）"""
+    cutoff = time.time() - retention_days * 86400
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        try:
+            if LEGACY_LOG.match(name) and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError as e:
+            logging.debug(f"删除旧日志 {path} 失败: {str(e)}")
+
+
+PIPELINE = None
+
+
+def setup_logging(config=None, level=None, log_dir=None, filename='monitor.log'):
+    """按 [Logging] 配置启动日志管道，level（名称或数值）和 log_dir 不为空时覆盖配置
+
+    同一目录下的多个进程（例如分布式工作进程）应使用不同的 filename，各自轮转。
+    """
+    global PIPELINE
+    get = (lambda option, fallback: config.get('Logging', option, fallback=fallback)) if config else \
+        (lambda option, fallback: fallback)
+    problems = []
+    level = parse_level(get('level', 'ERROR') if level is None else level, logging.ERROR, problems)
+    levels = parse_levels(get('levels', 'summary:INFO'), level, problems)
+    # 相对路径相对于程序目录
+    directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), log_dir or get('dir', 'LOGS'))
+    retention_days = float(get('retention_days', '7'))
+    handler = RotatingLogHandler(
+        os.path.join(directory, filename),
+        max_bytes=int(float(get('max_mb', '10')) * 1024 * 1024),
+        rotate_seconds=float(get('rotate_hours', '24')) * 3600,
+        backup_count=int(get('backup_count', '20')),
+        retention_days=retention_days
+    )
+    if get('format', 'json') == 'json':
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(module)s - %(message)s'))
+    if PIPELINE:
+        PIPELINE.stop()
+    else:
+        # 退出前写完队列中剩余的日志
+        atexit.register(shutdown_logging)
+    PIPELINE = LogPipeline(handler, level, levels, int(get('queue_size', '10000'))).start()
+    for problem in problems:
+        logging.error(problem)
+    threading.Thread(target=remove_legacy_logs, args=(directory, retention_days), daemon=True).start()
+    return PIPELINE
+
+
+def shutdown_logging():
+    """停止后台写入线程，之后的日志不再记录"""
+    global PIPELINE
+    if PIPELINE:
+        PIPELINE.stop()
+        PIPELINE = None
+
+
+def measure(records, threads, directory):
+    """多个线程同时写日志，分别测量同步写文件和日志管道的调用耗时与吞吐"""
+    results = {}
+    message = "价格变化 %s: %s / %s"
+
+    def produce(count):
+        for i in range(count):
+            with log_context(market_id=f"market-{i % 50}", cycle=i // 50):
+                logging.info(message, f"market-{i % 50}", '55', '45')
+
+    for mode in ('sync', 'async'):
+        path = os.path.join(directory, f"{mode}.log")
+        root = logging.getLogger()
+        if mode == 'sync':
+            handler = logging.FileHandler(path, encoding='utf-8')
+            handler.setFormatter(JsonFormatter())
+            for old in list(root.handlers):
+                root.removeHandler(old)
+            root.addHandler(handler)
+            root.setLevel(logging.INFO)
+            pipeline = None
+        else:
+            handler = RotatingLogHandler(path, max_bytes=0, rotate_seconds=0)
+            handler.setFormatter(JsonFormatter())
+            pipeline = LogPipeline(handler, logging.INFO, queue_size=records * threads + 1).start()
+        per_thread = records // threads
+        workers = [threading.Thread(target=produce, args=(per_thread,)) for _ in range(threads)]
+        start = time.perf_counter()
+        for t in workers:
+            t.start()
+        for t in workers:
+            t.join()
+        produced = time.perf_counter() - start
+        if pipeline:
+            pipeline.stop()
+        else:
+            root.removeHandler(handler)
+            handler.close()
+        written = time.perf_counter() - start
+        results[mode] = {
+            'records': per_thread * threads,
+            'caller_us_per_record': round(produced / per_thread * 1e6, 2),
+            'records_per_second': round(per_thread * threads / written)
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='测量日志对调用线程的延迟和写入吞吐')
+    parser.add_argument('--records', type=int, default=100000)
+    parser.add_argument('--threads', type=int, default=4)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        results = measure(args.records, args.threads, directory)
+    for mode, result in results.items():
+        print(f"{mode:6} {result}")
+    print(f"log_enqueue_seconds: {LOG_ENQUEUE.summary()}")
+
+
+if __name__ == '__main__':
+    main()
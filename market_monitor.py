@@ -1,48 +1,27 @@
-import os
 import logging
 from datetime import datetime
 import tkinter as tk
 from tkinter import ttk, font
-import threading
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
 import time
 import traceback
-import requests  # 添加到文件开头的导入部分
+import metrics
+from grid_renderer import GridRenderer
+from update_queue import UpdateQueue
+from monitor_core import MonitorCore, load_config, split_urls, category_name, mark_startup
+from log_pipeline import setup_logging
+from markets import display_name
 
-# 创建日志目录
-log_dir = 'LOGS'
-if not os.path.exists(log_dir):
-    os.makedirs(log_dir)
+UI_LATENCY = metrics.histogram('ui_update_latency_seconds', '价格从抓取线程推入到界面刷新完成的延迟')
+UI_FRAME = metrics.histogram('ui_frame_seconds', '每帧应用界面更新的耗时')
 
-# 清理旧的日志文件
-def cleanup_old_logs(log_dir):
-    try:
-        log_files = [f for f in os.listdir(log_dir) if f.endswith('.log')]
-        if log_files:
-            log_files.sort()  # 按文件名排序
-            # 删除除最新文件外的所有文件
-            for old_file in log_files[:-1]:
-                os.remove(os.path.join(log_dir, old_file))
-    except Exception as e:
-        print(f"清理日志文件时出错: {str(e)}")
-
-# 清理旧日志
-cleanup_old_logs(log_dir)
+class MarketMonitor:
+    """Tk 界面，作为消费者挂接到监控核心上"""
 
-# 配置日志
-logging.basicConfig(
-    filename=os.path.join(log_dir, f'monitor_{datetime.now().strftime("%Y%m%d_%H%M%S")}.log'),
-    level=logging.ERROR,  # 只记录 ERROR 级别以上的日志
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+    SORT_LABELS = {'category': '分类', 'volatility': '波动率', 'recent': '最近变化'}
 
-class MarketMonitor:
-    def __init__(self):
+    def __init__(self, core=None):
+        self.core = core if core is not None else MonitorCore()
+        config = self.core.config
         self.root = tk.Tk()
         self.root.title("Polymarket 监控器")
         # 创建两种不同大小的字体
@@ -54,17 +33,27 @@ class MarketMonitor:
         self.FRAME_BG = '#C0C0C0'  # 稍浅一点的浅灰色，用于方格背景
         
         self.price_update_interval = 1000  # 每秒更新一次价格
+        self.frame_interval = config.getint('Monitor', 'frame_interval', fallback=100)  # 界面刷新间隔（毫秒）
+        # 后台线程只向队列推送更新，由 Tk 主循环按帧取出
+        self.updates = UpdateQueue(config.getint('Monitor', 'update_queue_size', fallback=1000))
+        self.last_stats_log = time.time()
+        self.pending_start = None  # 等待上一次抓取循环退出后再开始监控的 after 任务
+        # 格子中显示哪个窗口的滚动统计
+        self.stats_window = config.get('Analytics', 'display', fallback='5m')
+        metrics.gauge('update_queue_depth', '等待界面处理的更新数', lambda: len(self.updates))
+        metrics.gauge('update_queue_dropped', '因队列已满被丢弃的更新数', lambda: self.updates.stats()['dropped'])
         self.setup_ui()
-        self.monitoring = False
-        self.driver = None
-        self.monitor_thread = None
-        self.last_prices = {}
-        self.color_timers = {}
+        self.core.add_consumer(self)
+        # 先用上次退出时的快照画出网格，再启动较慢的后台服务
+        snapshot = self.core.restore_snapshot()
+        if snapshot:
+            self.apply_updates()
+            self.root.update_idletasks()
+        self.core.start()
+        if snapshot and snapshot.get('monitoring'):
+            # 上次退出时正在监控，启动后在后台刷新价格
+            self.root.after_idle(self.start_monitoring)
         logging.info("程序初始化完成")
-        # 启动币安价格更新线程
-        self.binance_thread = threading.Thread(target=self.binance_price)
-        self.binance_thread.daemon = True  # 设置为守护线程
-        self.binance_thread.start()
 
     def setup_ui(self):
         # 第一行：输入框和按钮
@@ -72,8 +61,12 @@ class MarketMonitor:
         input_frame.pack(pady=10, padx=10, fill='x')
         
         self.url_entry = ttk.Entry(input_frame, width=50)
-        self.url_entry.insert(0, "https://polymarket.com/markets/crypto/bitcoin")
+        self.url_entry.insert(0, ', '.join(self.core.category_urls))
         self.url_entry.pack(side='left', padx=5)
+        # 输入时只更新标签，回车或离开输入框时才切换监控的分类
+        self.url_entry.bind('<KeyRelease>', self.update_crypto_label)
+        self.url_entry.bind('<Return>', self.apply_categories)
+        self.url_entry.bind('<FocusOut>', self.apply_categories)
         
         self.start_btn = tk.Button(
             input_frame, 
@@ -125,6 +118,11 @@ class MarketMonitor:
             font=('Arial', 16)
         )
         self.ethereum_btn.pack(side='left', padx=5)
+        self.category_buttons = {
+            'solana': self.solana_btn,
+            'bitcoin': self.bitcoin_btn,
+            'ethereum': self.ethereum_btn
+        }
         
         # 第二行：标签
         label_frame = tk.Frame(self.root, bg=self.BG_COLOR)
@@ -191,7 +189,7 @@ class MarketMonitor:
 
         # 创建币安价格标签
         self.binance_labels = {}
-        for crypto in ['BTC', 'ETH', 'SOL']:
+        for crypto in [s.replace('USDT', '') for s in self.core.binance_symbols]:
             label = tk.Label(
                 binance_frame,
                 text=f"{crypto}: $0",
@@ -202,336 +200,196 @@ class MarketMonitor:
             label.pack(side='left', padx=10)
             self.binance_labels[crypto] = label
 
-        # 第三行：价格显示网格
+        # 第三行：网格排序和过滤
+        config = self.core.config
+        sort_frame = tk.Frame(self.root, bg=self.BG_COLOR)
+        sort_frame.pack(padx=15, fill='x')
+        tk.Label(sort_frame, text="排序:", bg=self.BG_COLOR, font=('Arial', 14)).pack(side='left')
+        self.sort_box = ttk.Combobox(sort_frame, values=list(self.SORT_LABELS.values()), state='readonly', width=10)
+        self.sort_box.set(self.SORT_LABELS.get(config.get('Grid', 'sort', fallback='category'), '分类'))
+        self.sort_box.pack(side='left', padx=5)
+        self.sort_box.bind('<<ComboboxSelected>>', self.apply_sort)
+        self.recent_only = tk.BooleanVar(value=config.getboolean('Grid', 'recent_only', fallback=False))
+        ttk.Checkbutton(sort_frame, text="只看最近变化", variable=self.recent_only, command=self.apply_sort).pack(
+            side='left', padx=5)
+
+        # 第四行：价格显示网格
         self.grid_frame = tk.Frame(self.root, bg=self.BG_COLOR)
         self.grid_frame.pack(padx=10, pady=10, expand=True, fill='both')
         
-        # 初始化价格标签列表
-        self.price_labels = []
+        # 虚拟化的价格网格，只为可见的行创建控件
+        self.grid = GridRenderer(
+            self.root,
+            self.grid_frame,
+            self.market_font,
+            self.price_font,
+            self.FRAME_BG,
+            on_click=self.open_browser,
+            columns=config.getint('Grid', 'columns', fallback=3),
+            recent_seconds=config.getfloat('Grid', 'recent_seconds', fallback=300),
+            resort_interval=config.getfloat('Grid', 'resort_interval', fallback=2)
+        )
+        self.apply_sort()
         
         # 初始化时更新标签
         self.update_crypto_label()
-
-    def create_grid(self, num_links):
-        """根据链接数量创建网格"""
-        # 清除现有的网格
-        for widget in self.grid_frame.winfo_children():
-            widget.destroy()
         
-        # 计算需要的行数（向上取整）
-        num_rows = (num_links + 2) // 3  # 改为3列
-        
-        # 创建新的网格
-        self.price_labels = []
-        for i in range(num_rows):
-            row_labels = []
-            for j in range(3):  # 改为3列
-                cell_frame = tk.Frame(
-                    self.grid_frame,
-                    relief="solid",
-                    borderwidth=1,
-                    bg=self.FRAME_BG
-                )
-                cell_frame.grid(row=i, column=j, padx=5, pady=5, sticky="nsew")
-                
-                label = tk.Label(
-                    cell_frame,
-                    text="-",
-                    font=self.price_font,
-                    fg='#0066CC',
-                    bg=self.FRAME_BG,
-                    anchor='center',
-                    justify='center',
-                    pady=10
-                )
-                label.pack(expand=True, fill='both', padx=5, pady=5)
-                row_labels.append(label)
-                
-                self.grid_frame.columnconfigure(j, weight=1)
-            self.price_labels.append(row_labels)
-            self.grid_frame.rowconfigure(i, weight=1)
+        # 开始按帧处理更新队列
+        self.root.after(self.frame_interval, self.drain_updates)
 
-    def setup_driver(self):
-        try:
-            chrome_options = Options()
-            chrome_options.add_argument('--headless=new')
-            chrome_options.add_argument('--disable-gpu')
-            chrome_options.add_argument('--no-sandbox')
-            chrome_options.add_argument('--disable-dev-shm-usage')
-            chrome_options.add_argument('--disable-extensions')
-            chrome_options.page_load_strategy = 'eager'
-            
-            driver_path = os.path.join(
-                os.path.dirname(os.path.abspath(__file__)),
-                'drivers/chromedriver-mac-arm64/chromedriver'
-            )
-            
-            logging.info(f"使用 ChromeDriver 路径: {driver_path}")
-            service = Service(executable_path=driver_path)
-            self.driver = webdriver.Chrome(service=service, options=chrome_options)
-            self.driver.set_page_load_timeout(30)
-            logging.info("ChromeDriver 初始化成功")
-            return True
-        except Exception as e:
-            logging.error(f"ChromeDriver 初始化失败: {str(e)}\n{traceback.format_exc()}")
-            self.status_label.config(text=f"状态: 驱动初始化失败 - {str(e)}")
-            return False
+    def create_grid(self, layout):
+        """按分类分组增删格子，只监控一个分类时不显示分组标题"""
+        if len(layout) == 1:
+            groups = [(None, layout[0][1])]
+        else:
+            groups = [(category_name(url), market_ids) for url, market_ids in layout]
+        added, removed = self.grid.layout(groups)
+        if added or removed:
+            logging.info(f"网格新增 {len(added)} 个市场，移除 {len(removed)} 个市场")
 
-    def monitor_prices(self):
-        last_links_check_time = 0  # 记录上次检查链接的时间
-        last_links_count = 0       # 记录上次的链接数量
-        
-        while self.monitoring:
-            try:
-                current_time = time.time()
-                
-                # 每10分钟检查一次链接
-                if current_time - last_links_check_time >= 600:  # 600秒 = 10分钟
-                    self.driver.get(self.url_entry.get())
-                    time.sleep(2)
-                    
-                    market_container = WebDriverWait(self.driver, 10).until(
-                        EC.presence_of_element_located((By.ID, "markets-grid-container"))
-                    )
-                    
-                    # 获取并过滤链接
-                    market_links = market_container.find_elements(By.TAG_NAME, "a")
-                    valid_links = []
-                    for link in market_links:
-                        href = link.get_attribute('href')
-                        if href and '#comments' not in href:
-                            valid_links.append(href)
-                    
-                    num_links = len(valid_links)
-                    
-                    # 检查链接数量是否变化
-                    if num_links != last_links_count:
-                        # 更新网格
-                        self.root.after(0, self.create_grid, num_links)
-                        time.sleep(0.5)
-                        last_links_count = num_links
-                    
-                    # 更新链接映射
-                    self.market_urls = {}
-                    for idx, href in enumerate(valid_links):
-                        self.market_urls[idx] = href
-                    
-                    # 更新检查时间
-                    last_links_check_time = current_time
-                
-                # 获取价格（每5秒一次）
-                for idx, href in enumerate(self.market_urls.values()):
-                    try:
-                        self.driver.get(href)
-                        prices = WebDriverWait(self.driver, 10).until(
-                            EC.presence_of_all_elements_located(
-                                (By.CSS_SELECTOR, ".c-bjtUDd.c-bjtUDd-ijxkYfH-css")
-                            )
-                        )
-                        
-                        if len(prices) >= 2:
-                            market_id = href.rstrip('/').split('/')[-1]
-                            market_id = market_id.replace('will-', '')
-                            market_id = market_id.replace('bitcoin-', '')
-                            market_id = market_id.replace('solana-', '')
-                            market_id = market_id.replace('ethereum-', '')
-                            
-                            # 移除价格中的美分符号
-                            yes_price = prices[0].text.replace('¢', '')
-                            no_price = prices[1].text.replace('¢', '')
-                            
-                            price_changed = False
-                            if market_id in self.last_prices:
-                                last_yes, last_no = self.last_prices[market_id]
-                                if last_yes != yes_price or last_no != no_price:
-                                    price_changed = True
-                            
-                            self.last_prices[market_id] = (yes_price, no_price)
-                            display_text = f"{market_id}\n\n{yes_price}\n{no_price}"
-                            self.root.after(0, self.update_price_label, idx, display_text, price_changed)
-                    
-                    except Exception as e:
-                        continue
-            
-            except Exception as e:
-                pass
-            
-            self.root.update()
-            time.sleep(5)
+    def apply_sort(self, event=None):
+        """切换网格的排序方式和过滤条件"""
+        labels = {label: sort for sort, label in self.SORT_LABELS.items()}
+        self.grid.set_sort(labels.get(self.sort_box.get(), 'category'), self.recent_only.get())
 
-    def update_price_label(self, idx, text, price_changed):
-        try:
-            row = idx // 3  # 改为3列
-            col = idx % 3   # 改为3列
-            if row < len(self.price_labels) and col < len(self.price_labels[row]):
-                label = self.price_labels[row][col]
-                
-                # 分割文本
-                lines = text.split('\n')
-                if len(lines) == 4:
-                    market_id = lines[0]
-                    yes_price = lines[2]
-                    no_price = lines[3]
-                    
-                    # 移除特定前缀
-                    market_id = market_id.replace('bitcoin-', '')
-                    market_id = market_id.replace('solana-', '')
-                    market_id = market_id.replace('ethereum-', '')
-                    market_id = market_id.replace('will-', '')
-                    
-                    # 使用保存的原始链接
-                    market_url = self.market_urls.get(idx, '')
-                    
-                    # 创建两个标签：一个用于市场名称，一个用于价格
-                    market_label = tk.Label(
-                        label.master,
-                        text=market_id,
-                        font=self.market_font,
-                        fg='#000000', #使用黑色
-                        bg=self.FRAME_BG,
-                        anchor='center',
-                        justify='center',
-                        cursor="hand2"
-                    )
-                    market_label.pack(side='top', pady=(5, 0))
-                    
-                    # 绑定点击事件，使用原始链接
-                    if market_url:
-                        market_label.bind('<Button-1>', lambda e, url=market_url: self.open_browser(url))
-                    
-                    # 价格标签
-                    price_label = tk.Label(
-                        label.master,
-                        text=f"{yes_price}   {no_price}",
-                        font=self.price_font,
-                        fg='#0066CC' if not price_changed else 'red',
-                        bg=self.FRAME_BG,
-                        anchor='center',
-                        justify='center'
-                    )
-                    price_label.pack(side='top', pady=(10, 5))
-                    
-                    # 删除原标签
-                    label.destroy()
-                    
-                    # 保存新标签的引用
-                    self.price_labels[row][col] = (market_label, price_label)
-                    
-                    # 设置颜色变化计时器
-                    if price_changed:
-                        timer_key = f"{row}_{col}"
-                        if timer_key in self.color_timers:
-                            self.root.after_cancel(self.color_timers[timer_key])
-                        
-                        self.color_timers[timer_key] = self.root.after(
-                            15000,
-                            lambda: self.restore_color(row, col, market_id, f"{yes_price}   {no_price}")
-                        )
-        except Exception as e:
-            logging.error(f"更新标签错: {str(e)}\n{traceback.format_exc()}")
+    def on_layout(self, layout):
+        """核心发现的市场有增减时调整网格（在工作线程中调用，只推入队列）"""
+        self.updates.push('layout', layout)
+
+    def on_price(self, idx, market_id, yes_price, no_price, price_changed, url):
+        # 格子按市场标识对应，同一市场未被界面取走的旧价格会被新价格覆盖，但变化标记要保留
+        self.updates.push(('market', market_id), (
+            market_id, display_name(market_id), f"{yes_price}   {no_price}", price_changed, url, time.perf_counter()
+        ), merge=lambda old, new: new[:3] + (old[3] or new[3],) + new[4:])
+
+    def on_stats(self, idx, market_id, stats):
+        window = stats.get(self.stats_window) if stats else None
+        if window:
+            self.updates.push(('stats', market_id), (market_id, window))
+
+    def format_stats(self, window):
+        """EMA、波动率、区间和每分钟变化次数"""
+        if window['min'] is None:
+            return ""
+        return (f"{self.stats_window} EMA {window['ema']:.1f}  σ {window['volatility']:.1f}  "
+                f"{window['min']:g}-{window['max']:g}  {window['rate']:.1f}次/分")
 
-    def restore_color(self, row, col, market_id, price_text):
-        """恢复标签的默认颜色"""
+    def on_binance(self, symbol, price):
+        crypto = symbol.replace('USDT', '')
+        if crypto not in self.binance_labels:
+            return
+        # BTC、ETH 显示整数，其余保留两位小数
+        text = f"{crypto}: ${price:,.0f}" if crypto in ('BTC', 'ETH') else f"{crypto}: ${price:.2f}"
+        self.updates.push(('binance', crypto), text)
+
+    def drain_updates(self):
+        """在 Tk 主循环中按固定帧率取出并应用所有待处理更新"""
+        self.apply_updates()
+        self.root.after(self.frame_interval, self.drain_updates)
+
+    def apply_updates(self):
         try:
-            if row < len(self.price_labels) and col < len(self.price_labels[row]):
-                market_label, price_label = self.price_labels[row][col]
-                price_label.config(fg='#0066CC')  # 恢复价格为蓝色
-                timer_key = f"{row}_{col}"
-                if timer_key in self.color_timers:
-                    del self.color_timers[timer_key]
+            frame_start = time.perf_counter()
+            queued = []
+            updates = self.updates.drain()
+            # 先调整网格，同一帧中新市场的价格才有格子可写
+            for key, payload in updates:
+                if key == 'layout':
+                    self.create_grid(payload)
+            for key, payload in updates:
+                if key == 'layout':
+                    continue
+                elif key[0] == 'market':
+                    self.grid.update(*payload[:5])
+                    queued.append(payload[5])
+                elif key[0] == 'stats':
+                    self.grid.update_stats(payload[0], self.format_stats(payload[1]), payload[1]['volatility'])
+                elif key[0] == 'binance':
+                    self.binance_labels[key[1]].config(text=payload)
+            # 网格每帧只在这里写一次界面，包括恢复过期的红色和按间隔重新排序
+            self.grid.flush()
+            if self.grid.visible:
+                mark_startup('first_paint')
+            now = time.perf_counter()
+            for queued_at in queued:
+                UI_LATENCY.observe(now - queued_at)
+            UI_FRAME.observe(now - frame_start)
+            
+            # 每分钟记录一次队列状态，便于观察背压
+            if time.time() - self.last_stats_log >= 60:
+                logging.info(f"更新队列状态: {self.updates.stats()}")
+                self.last_stats_log = time.time()
         except Exception as e:
-            logging.error(f"恢复颜色时出错: {str(e)}")
+            logging.error(f"处理界面更新出错: {str(e)}\n{traceback.format_exc()}")
 
     def start_monitoring(self):
-        if not self.monitoring:
-            logging.info("开始监控...")
-            self.monitoring = True
+        self.cancel_pending_start()
+        self.apply_categories()
+        if not self.core.monitoring:
             # 将开始按钮变为红色
             self.start_btn.configure(fg='red')
-            if self.setup_driver():
-                self.monitor_thread = threading.Thread(target=self.monitor_prices)
-                self.monitor_thread.start()
-                logging.info("监控线程已启动")
-            else:
-                self.monitoring = False
+            if self.core.stopping:
+                # 刚停止时上一次的抓取循环可能还在等待页面加载，稍后再试，不在按钮回调中等待
+                self.pending_start = self.root.after(200, self.start_monitoring)
+            elif not self.core.start_monitoring():
                 # 恢复按钮颜色
                 self.start_btn.configure(fg='black')
-                logging.error("监控启动失败")
 
     def stop_monitoring(self):
-        logging.info("停止监控...")
-        self.monitoring = False
-        if self.driver:
-            self.driver.quit()
+        self.cancel_pending_start()
+        self.core.stop_monitoring()
         # 恢复开始按钮颜色
         self.start_btn.configure(fg='black')
-        logging.info("监控已停止")
-        if hasattr(self, 'binance_thread'):
-            self.binance_thread = None
+
+    def cancel_pending_start(self):
+        if self.pending_start:
+            self.root.after_cancel(self.pending_start)
+            self.pending_start = None
 
     def run(self):
         logging.info("启动主程序...")
         self.root.mainloop()
+        self.core.stop()
 
     def update_url(self, crypto_name):
-        """更新URL中的加密货币名称"""
-        current_url = self.url_entry.get()
-        parts = current_url.rstrip('/').split('/')
+        """添加或移除一个加密货币分类，至少保留一个分类"""
+        urls = split_urls(self.url_entry.get()) or [self.core.category_urls[0]]
+        parts = urls[0].rstrip('/').split('/')
         parts[-1] = crypto_name
         new_url = '/'.join(parts)
+        matching = [u for u in urls if u.rstrip('/').split('/')[-1] == crypto_name]
+        if not matching:
+            urls.append(new_url)
+        elif len(urls) > len(matching):
+            urls = [u for u in urls if u not in matching]
         self.url_entry.delete(0, tk.END)
-        self.url_entry.insert(0, new_url)
-        # 立即更新标签
+        self.url_entry.insert(0, ', '.join(urls))
+        self.apply_categories()
+
+    def apply_categories(self, event=None):
+        """把输入框中的分类同步给核心（后台线程不能直接读取输入框）"""
+        urls = split_urls(self.url_entry.get())
+        if urls:
+            self.core.set_categories(urls)
         self.update_crypto_label()
 
     def update_crypto_label(self, event=None):
-        """更新加密货币标签"""
+        """更新加密货币标签和分类按钮的颜色"""
         try:
-            url = self.url_entry.get().rstrip('/')
-            crypto_name = url.split('/')[-1].capitalize()  # 首字母大写
-            self.crypto_label.config(text=crypto_name)
-            logging.debug(f"更新加密货币标签为: {crypto_name}")
+            names = [category_name(url) for url in split_urls(self.url_entry.get())]
+            self.crypto_label.config(text=' / '.join(names))
+            for name, button in self.category_buttons.items():
+                button.configure(fg='red' if name.capitalize() in names else 'black')
+            logging.debug(f"更新加密货币标签为: {names}")
         except Exception as e:
             logging.error(f"更新加密货币标签出错: {str(e)}")
 
     def open_browser(self, url):
         """在默认浏览器中打开URL"""
+        self.core.mark_viewed(url)
         import webbrowser
         webbrowser.open(url)
 
-    def binance_price(self):
-        """实时更新币安价格"""
-        while True:
-            try:
-                response = requests.get('https://api.binance.com/api/v3/ticker/price')
-                if response.status_code == 200:
-                    prices = {item['symbol']: item['price'] for item in response.json()}
-                    
-                    # 更新BTC价格
-                    if 'BTCUSDT' in prices:
-                        btc_price = float(prices['BTCUSDT'])
-                        self.root.after(0, lambda: self.binance_labels['BTC'].config(
-                            text=f"BTC: ${btc_price:,.0f}"
-                        ))
-                    
-                    # 更新ETH价格
-                    if 'ETHUSDT' in prices:
-                        eth_price = float(prices['ETHUSDT'])
-                        self.root.after(0, lambda: self.binance_labels['ETH'].config(
-                            text=f"ETH: ${eth_price:,.0f}"
-                        ))
-                    
-                    # 更新SOL价格
-                    if 'SOLUSDT' in prices:
-                        sol_price = float(prices['SOLUSDT'])
-                        self.root.after(0, lambda: self.binance_labels['SOL'].config(
-                            text=f"SOL: ${sol_price:.2f}"
-                        ))
-            except Exception as e:
-                print(f"获取币安价格出错: {str(e)}")
-            
-            time.sleep(1)  # 每秒更新一次
-
     def update_datetime(self):
         """更新日期和时间显示"""
         now = datetime.now()
@@ -545,8 +403,10 @@ class MarketMonitor:
         self.root.after(1000, self.update_datetime)
 
 if __name__ == "__main__":
+    config = load_config()
+    setup_logging(config)
     try:
-        app = MarketMonitor()
+        app = MarketMonitor(MonitorCore(config))
         app.run()
     except Exception as e:
         logging.critical(f"程序发生严重错误: {str(e)}\n{traceback.format_exc()}") 
\ No newline at end of file
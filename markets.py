@@ -0,0 +1,43 @@
+"""市场链接和价格文本的解析，不依赖 selenium 和 requests，启动时可以很快导入"""
+
+# 市场页面上 Yes/No 价格所在元素的 CSS 选择器
+PRICE_SELECTOR = ".c-bjtUDd.c-bjtUDd-ijxkYfH-css"
+
+
+def market_id_from_href(href):
+    """从市场链接中提取市场标识
+
+    保留币种名称：同时监控多个分类时，不同币种的同名市场（如 up-or-down-on-...）不能混在一起。
+    """
+    market_id = href.rstrip('/').split('/')[-1]
+    market_id = market_id.replace('will-', '')
+    return market_id
+
+
+def display_name(market_id):
+    """界面上显示的市场名称，去掉币种名称（网格已按分类分组）"""
+    market_id = market_id.replace('bitcoin-', '')
+    market_id = market_id.replace('solana-', '')
+    market_id = market_id.replace('ethereum-', '')
+    return market_id
+
+
+def format_cents(probability):
+    """把 0~1 的概率转换成页面上显示的美分数值（不带 ¢）"""
+    cents = float(probability) * 100
+    if 0 < cents < 1:
+        return '<1'
+    return f"{cents:.1f}".rstrip('0').rstrip('.')
+
+
+def parse_cents(text):
+    """把页面上的价格文本（如 '55'、'<1'）转换成数值，无法解析时返回 nan"""
+    text = text.strip().replace('¢', '')
+    try:
+        if text.startswith('<'):
+            return float(text[1:]) / 2
+        if text.startswith('>'):
+            return (float(text[1:]) + 100) / 2
+        return float(text)
+    except ValueError:
+        return float('nan')
@@ -0,0 +1,220 @@
+"""抓取流程的内置指标：计时直方图、计数器和仪表，可输出为 Prometheus 文本格式
+
+指标对象在模块级别创建一次，热路径上只做一次 bisect 和几次整数加法：
+
+    PAGE_LOAD = metrics.histogram('page_load_seconds', '单个市场页面 driver.get 耗时')
+    with PAGE_LOAD.time():
+        driver.get(href)
+"""
+import bisect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 默认直方图分桶（秒），覆盖从毫秒级界面更新到十秒级页面加载
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def escape_label(value):
+    """Prometheus 标签值中的反斜杠、双引号和换行需要转义"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.bounds = list(buckets)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.bounds, value)
+        with self.lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def quantile(self, q):
+        """根据分桶估算分位数（取所在桶的上界）"""
+        with self.lock:
+            counts, total = list(self.counts), self.count
+        if total == 0:
+            return 0.0
+        target = q * total
+        seen = 0
+        for i, c in enumerate(counts):
+            seen += c
+            if seen >= target:
+                return self.bounds[i] if i < len(self.bounds) else float('inf')
+        return float('inf')
+
+    def render(self):
+        with self.lock:
+            counts, total, value_sum = list(self.counts), self.count, self.sum
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        cumulative = 0
+        for bound, c in zip(self.bounds, counts):
+            cumulative += c
+            lines.append(f'{self.name}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'{self.name}_bucket{{le="+Inf"}} {total}')
+        lines.append(f"{self.name}_sum {value_sum}")
+        lines.append(f"{self.name}_count {total}")
+        return lines
+
+    def summary(self):
+        if self.count == 0:
+            return None
+        return (f"{self.name} n={self.count} avg={self.sum / self.count:.3f}s "
+                f"p50<={self.quantile(0.5)}s p95<={self.quantile(0.95)}s")
+
+
+class Counter:
+    """可带一个标签的计数器，例如 scrape_failures_total{reason="timeout"}"""
+
+    def __init__(self, name, help_text, label=None):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, label_value=None, amount=1):
+        with self.lock:
+            self.values[label_value] = self.values.get(label_value, 0) + amount
+
+    def render(self):
+        with self.lock:
+            values = dict(self.values)
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        if not values and self.label is None:
+            lines.append(f"{self.name} 0")
+        for label_value, value in sorted(values.items(), key=lambda kv: str(kv[0])):
+            if self.label is None or label_value is None:
+                lines.append(f"{self.name} {value}")
+            else:
+                lines.append(f'{self.name}{{{self.label}="{escape_label(label_value)}"}} {value}')
+        return lines
+
+    def summary(self):
+        with self.lock:
+            values = dict(self.values)
+        if not values:
+            return None
+        if self.label is None:
+            return f"{self.name}={sum(values.values())}"
+        return f"{self.name}=" + ','.join(f"{k}:{v}" for k, v in sorted(values.items(), key=lambda kv: str(kv[0])))
+
+
+class Gauge:
+    """读取时才调用 fn 求值的仪表，例如队列深度"""
+
+    def __init__(self, name, help_text, fn):
+        self.name = name
+        self.help_text = help_text
+        self.fn = fn
+
+    def value(self):
+        try:
+            return float(self.fn())
+        except Exception:
+            return float('nan')
+
+    def render(self):
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge", f"{self.name} {self.value()}"]
+
+    def summary(self):
+        return f"{self.name}={self.value():g}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def register(self, metric):
+        """同名指标只注册一次，重复注册时返回已有对象（仪表则替换求值函数）"""
+        with self.lock:
+            existing = self.metrics.get(metric.name)
+            if existing is not None and not isinstance(metric, Gauge):
+                return existing
+            self.metrics[metric.name] = metric
+            return metric
+
+    def render(self):
+        """Prometheus 文本格式"""
+        with self.lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def summary(self):
+        """一行摘要，用于定期写入日志"""
+        with self.lock:
+            metrics = list(self.metrics.values())
+        return ' | '.join(s for s in (m.summary() for m in metrics) if s)
+
+
+REGISTRY = Registry()
+
+
+def histogram(name, help_text, buckets=DEFAULT_BUCKETS):
+    return REGISTRY.register(Histogram(name, help_text, buckets))
+
+
+def counter(name, help_text, label=None):
+    return REGISTRY.register(Counter(name, help_text, label))
+
+
+def gauge(name, help_text, fn):
+    return REGISTRY.register(Gauge(name, help_text, fn))
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MetricsServer:
+    """独立的 /metrics 端点（价格接口未启用时使用）"""
+
+    def __init__(self, host='127.0.0.1', port=9108):
+        self.httpd = ThreadingHTTPServer((host, port), MetricsHandler)
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        host, port = self.httpd.server_address[:2]
+        logging.info(f"指标端点已启动: http://{host}:{port}/metrics")
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,624 @@
+"""监控核心：价格抓取、币安订阅和价格历史，不依赖 tkinter
+
+界面（market_monitor.py）作为消费者挂接到核心上；也可以不启动界面在服务器上运行：
+
+    python monitor_core.py --headless --url https://polymarket.com/markets/crypto/bitcoin
+
+可以同时监控多个分类，它们共用同一个驱动池/HTTP 客户端、币安订阅和价格历史：
+
+    python monitor_core.py --headless --url .../crypto/bitcoin --url .../crypto/ethereum
+"""
+import argparse
+import configparser
+import json
+import logging
+import math
+import os
+import signal
+import threading
+import time
+import traceback
+import metrics
+from analytics import RollingAnalytics, history_stats, parse_windows
+from scheduler import PollScheduler
+from tick_store import TickStore
+from markets import market_id_from_href, parse_cents
+from log_pipeline import log_context, setup_logging
+
+# selenium、requests、websockets 等较重的模块在用到时才导入（见 start 和 setup_price_source），
+# 界面可以先用快照画出网格
+
+DEFAULT_URL = "https://polymarket.com/markets/crypto/bitcoin"
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+CONFIG_PATH = os.path.join(APP_DIR, 'config.ini')
+
+DISCOVERY = metrics.histogram('discovery_seconds', '链接发现（加载分类页并提取市场链接）耗时')
+CYCLE = metrics.histogram('monitor_cycle_seconds', '一轮抓取循环（不含休眠）耗时')
+MONITOR_ERRORS = metrics.counter('monitor_errors_total', '抓取循环中被忽略的异常次数', label='stage')
+# 调度统计和指标摘要使用单独的子系统，默认级别为 ERROR 时也能在日志中看到（见 [Logging] levels）
+SUMMARY_LOG = logging.getLogger('summary')
+
+# 启动耗时从导入本模块开始计算（本模块和它的依赖都很轻）
+STARTED_AT = time.perf_counter()
+STARTUP = {}  # 启动阶段 -> 距 STARTED_AT 的秒数
+metrics.gauge('startup_first_paint_seconds', '启动到界面首次画出市场网格的耗时', lambda: STARTUP.get('first_paint', 0))
+metrics.gauge('startup_first_live_price_seconds', '启动到收到第一个实时价格的耗时',
+              lambda: STARTUP.get('first_live_price', 0))
+
+
+def mark_startup(stage):
+    """记录一个启动阶段完成的时间，只记录第一次"""
+    if stage not in STARTUP:
+        STARTUP[stage] = time.perf_counter() - STARTED_AT
+        logging.info(f"启动耗时 {stage}: {STARTUP[stage]:.3f}s")
+
+
+def split_urls(text):
+    """把逗号分隔的分类地址拆成列表"""
+    return [u.strip() for u in text.split(',') if u.strip()]
+
+
+def category_name(category_url):
+    """分类地址的最后一段，首字母大写，例如 Bitcoin"""
+    return category_url.rstrip('/').split('/')[-1].capitalize()
+
+
+def same_value(a, b):
+    """两个解析后的价格是否相同（都无法解析时也视为相同）"""
+    return a == b or (math.isnan(a) and math.isnan(b))
+
+
+def market_layout(market_urls, groups):
+    """[(分类地址, [market_id, ...])]：按市场标识而不是网格位置描述每个分类的市场"""
+    market_ids = [market_id_from_href(market_urls[idx]) for idx in range(len(market_urls))]
+    layout = []
+    start = 0
+    for category_url, count in groups:
+        layout.append((category_url, market_ids[start:start + count]))
+        start += count
+    return layout
+
+
+def resolve_path(path):
+    """配置中的相对路径相对于程序目录，与 config.ini 一致，不受启动时工作目录影响"""
+    return os.path.join(APP_DIR, path)
+
+
+def load_config(path=CONFIG_PATH):
+    """读取配置文件"""
+    config = configparser.ConfigParser()
+    config.read(path, encoding='utf-8')
+    return config
+
+
+def create_scheduler(config):
+    """根据配置创建抓取调度器"""
+    return PollScheduler(
+        min_interval=config.getfloat('Scheduler', 'min_interval', fallback=5),
+        max_interval=config.getfloat('Scheduler', 'max_interval', fallback=60),
+        requests_per_second=config.getfloat('Scheduler', 'requests_per_second', fallback=2),
+        view_boost=config.getfloat('Scheduler', 'view_boost', fallback=120),
+        volatility_scale=config.getfloat('Scheduler', 'volatility_scale', fallback=0.25),
+        min_discovery=config.getfloat('Scheduler', 'min_discovery', fallback=60),
+        max_discovery=config.getfloat('Scheduler', 'max_discovery', fallback=600)
+    )
+
+
+class MonitorCore:
+    """抓取与订阅引擎
+
+    消费者通过 add_consumer 挂接，核心在工作线程中调用消费者上存在的以下方法：
+        on_markets(market_urls)                           市场列表更新，{序号: 链接}
+        on_categories(groups)                             按分类分组，[(分类地址, 市场数)]，序号按组连续
+        on_price(idx, market_id, yes, no, changed, url)   市场价格
+        on_stats(idx, market_id, stats)                   市场的滚动统计，{'1m': {...}, '5m': {...}, ...}
+        on_binance(symbol, price)                         币安价格
+
+    退出时把市场列表、分组和最后价格保存到快照文件，下次启动时先用快照填充，再在后台刷新。
+    """
+
+    def __init__(self, config=None):
+        self.config = config if config is not None else load_config()
+        self.category_urls = split_urls(self.config.get('Monitor', 'url', fallback=DEFAULT_URL)) or [DEFAULT_URL]
+        self.category_links = {}  # 分类地址 -> 最近一次发现的市场链接
+        self.binance_symbols = [
+            s.strip() for s in self.config.get('Binance', 'symbols', fallback='BTCUSDT,ETHUSDT,SOLUSDT').split(',') if s.strip()
+        ]
+        self.consumers = []
+        self.monitoring = False
+        self.price_source = None
+        self.scheduler = None
+        self.monitor_thread = None
+        self.wake = threading.Event()  # 分类变化或停止时提前结束本轮休眠
+        self.market_urls = {}
+        self.market_index = {}  # market_id -> 网格位置
+        self.groups = []        # [(分类地址, 市场数)]
+        self.layout = []        # [(分类地址, [market_id, ...])]，只在市场有增减时通知消费者
+        self.last_prices = {}
+        self.last_values = {}   # market_id -> 解析后的 (yes, no)，用于判断价格是否变化
+        self.binance_prices = {}
+        self.analytics = RollingAnalytics(
+            parse_windows(self.config.get('Analytics', 'windows', fallback='60,300,3600')),
+            self.config.getint('Analytics', 'buckets', fallback=60)
+        )
+        self.tick_store = None
+        self.binance_feed = None
+        self.api = None
+        self.alerts = None
+        self.metrics_server = None
+        self.summary_interval = self.config.getfloat('Metrics', 'summary_interval', fallback=60)
+        # 抓取循环持续出错时，每隔这么多秒才记录一次（附带期间的出错次数）
+        self.error_log_interval = self.config.getfloat('Metrics', 'error_log_interval', fallback=60)
+        self.snapshot_path = None
+        if self.config.getboolean('Snapshot', 'enabled', fallback=True):
+            self.snapshot_path = resolve_path(self.config.get('Snapshot', 'path', fallback='DATA/snapshot.json'))
+        self.restored = None  # 已恢复的快照内容
+
+    def add_consumer(self, consumer):
+        self.consumers.append(consumer)
+
+    def remove_consumer(self, consumer):
+        if consumer in self.consumers:
+            self.consumers.remove(consumer)
+
+    def emit(self, name, *args):
+        for consumer in list(self.consumers):
+            handler = getattr(consumer, name, None)
+            if handler is None:
+                continue
+            try:
+                handler(*args)
+            except Exception as e:
+                logging.error(f"消费者处理 {name} 出错: {str(e)}\n{traceback.format_exc()}")
+
+    def start(self):
+        """启动价格历史和币安订阅（与是否抓取市场无关）"""
+        from alerts import create_alert_engine
+        from api_server import PriceApi
+        from binance_feed import BinanceFeed
+        self.restore_snapshot()
+        # 价格历史，所有观察到的价格都写入本地文件
+        self.tick_store = TickStore(
+            resolve_path(self.config.get('History', 'dir', fallback='DATA/ticks')),
+            flush_interval=self.config.getfloat('History', 'flush_interval', fallback=1.0),
+            max_open_files=self.config.getint('History', 'max_open_files', fallback=64)
+        ).start()
+        # 启动币安价格订阅
+        self.binance_feed = BinanceFeed(
+            self.binance_symbols,
+            self.handle_binance_price,
+            ws_url=self.config.get('Binance', 'ws_url', fallback='wss://stream.binance.com:9443'),
+            rest_url=self.config.get('Binance', 'rest_url', fallback='https://api.binance.com')
+        )
+        self.binance_feed.start()
+        # 本地价格接口，供其他程序读取同一份价格
+        if self.config.getboolean('Api', 'enabled', fallback=False):
+            self.api = PriceApi(
+                self.config.get('Api', 'host', fallback='127.0.0.1'),
+                self.config.getint('Api', 'port', fallback=8780),
+                publish_interval=self.config.getfloat('Api', 'publish_interval', fallback=0.2)
+            )
+            self.api.seed(self)
+            self.api.stats_provider = self.market_stats
+            self.add_consumer(self.api)
+            self.api.start()
+        # 价格提醒规则在自己的线程中评估
+        try:
+            self.alerts = create_alert_engine(self.config)
+        except Exception as e:
+            logging.error(f"加载提醒规则失败: {str(e)}")
+        if self.alerts:
+            self.alerts.start()
+            self.add_consumer(self.alerts)
+        # 未启用价格接口时，可单独开启 /metrics 端点
+        metrics_port = self.config.getint('Metrics', 'port', fallback=0)
+        if metrics_port and not self.api:
+            try:
+                self.metrics_server = metrics.MetricsServer(
+                    self.config.get('Metrics', 'host', fallback='127.0.0.1'), metrics_port
+                ).start()
+            except Exception as e:
+                logging.error(f"指标端点启动失败: {str(e)}")
+        logging.info("监控核心已启动")
+
+    def stop(self):
+        was_monitoring = self.monitoring
+        self.stop_monitoring()
+        self.save_snapshot(was_monitoring)
+        if self.api:
+            self.remove_consumer(self.api)
+            self.api.stop()
+            self.api = None
+        if self.alerts:
+            self.remove_consumer(self.alerts)
+            self.alerts.stop()
+            self.alerts = None
+        if self.metrics_server:
+            self.metrics_server.stop()
+            self.metrics_server = None
+        if self.binance_feed:
+            self.binance_feed.stop()
+            self.binance_feed = None
+        if self.tick_store:
+            self.tick_store.close()
+            self.tick_store = None
+        logging.info("监控核心已停止")
+
+    def setup_price_source(self):
+        """根据配置启动价格来源（Selenium 驱动池、常驻标签页或 HTTP 接口）"""
+        try:
+            from price_source import create_price_source
+            self.price_source = create_price_source(self.config)
+            if not self.price_source.start():
+                return False
+            logging.info("价格来源初始化成功")
+            return True
+        except Exception as e:
+            logging.error(f"价格来源初始化失败: {str(e)}\n{traceback.format_exc()}")
+            return False
+
+    def create_scheduler(self):
+        return create_scheduler(self.config)
+
+    def set_categories(self, category_urls):
+        """更新要监控的分类，正在监控时立即重新发现市场"""
+        category_urls = [u for u in category_urls if u]
+        if not category_urls or category_urls == self.category_urls:
+            return
+        self.category_urls = list(category_urls)
+        if self.scheduler:
+            self.scheduler.request_discovery()
+            self.wake.set()
+
+    def discover_markets(self, source):
+        """发现所有分类的市场，按分类顺序编号，同时出现在多个分类中的市场只保留第一次"""
+        category_urls = list(self.category_urls)
+        found = source.discover_all(category_urls)
+        if not found:
+            raise RuntimeError("所有分类的市场发现都失败了")
+        links = {}
+        for category_url in category_urls:
+            # 本轮发现失败的分类沿用上一次的结果
+            links[category_url] = found.get(category_url, self.category_links.get(category_url, []))
+        self.category_links = links
+        return self.index_markets(category_urls, links)
+
+    def index_markets(self, category_urls, links):
+        """按分类顺序给市场编号，返回 (market_urls, market_index, groups)"""
+        market_urls = {}
+        market_index = {}
+        groups = []
+        for category_url in category_urls:
+            count = 0
+            for href in links[category_url]:
+                market_id = market_id_from_href(href)
+                if market_id in market_index:
+                    continue
+                idx = len(market_urls)
+                market_urls[idx] = href
+                market_index[market_id] = idx
+                count += 1
+            groups.append((category_url, count))
+        return market_urls, market_index, groups
+
+    def restore_snapshot(self):
+        """读取上次退出时保存的快照，立即通知消费者；快照不存在、过期或分类都不同时返回 None"""
+        if self.restored is not None or not self.snapshot_path or self.market_urls:
+            return self.restored
+        try:
+            with open(self.snapshot_path, encoding='utf-8') as f:
+                snapshot = json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logging.error(f"读取快照失败: {str(e)}")
+            return None
+        max_age = self.config.getfloat('Snapshot', 'max_age', fallback=86400)
+        if time.time() - snapshot.get('time', 0) > max_age:
+            logging.info("快照已过期，不再使用")
+            return None
+        # 只恢复仍在监控的分类
+        links = {url: snapshot['category_links'][url] for url in self.category_urls
+                 if url in snapshot.get('category_links', {})}
+        if not links:
+            return None
+        category_urls = [url for url in self.category_urls if url in links]
+        self.category_links = links
+        self.market_urls, self.market_index, self.groups = self.index_markets(category_urls, links)
+        prices = snapshot.get('prices', {})
+        self.last_prices = {market_id: tuple(prices[market_id]) for market_id in self.market_index if market_id in prices}
+        # 同时恢复解析后的价格，恢复后第一次抓到不同的价格才能被识别为变化
+        self.last_values = {market_id: (parse_cents(yes_price), parse_cents(no_price))
+                            for market_id, (yes_price, no_price) in self.last_prices.items()}
+        self.restored = snapshot
+        self.layout = market_layout(self.market_urls, self.groups)
+        self.emit('on_markets', dict(self.market_urls))
+        self.emit('on_categories', list(self.groups))
+        self.emit('on_layout', list(self.layout))
+        for market_id, (yes_price, no_price) in self.last_prices.items():
+            idx = self.market_index[market_id]
+            self.emit('on_price', idx, market_id, yes_price, no_price, False, self.market_urls[idx])
+        mark_startup('snapshot_restored')
+        logging.info(f"已从快照恢复 {len(self.market_urls)} 个市场、{len(self.last_prices)} 个价格")
+        return snapshot
+
+    def save_snapshot(self, monitoring=False):
+        """保存市场列表、分组和最后价格，先写临时文件再替换，避免中途退出留下损坏的快照"""
+        if not self.snapshot_path or not self.market_urls:
+            return
+        snapshot = {
+            'time': time.time(),
+            'monitoring': monitoring,  # 退出时是否正在监控，界面据此决定启动后是否自动开始
+            'category_urls': list(self.category_urls),
+            'category_links': self.category_links,
+            'groups': self.groups,
+            'market_urls': {str(idx): href for idx, href in self.market_urls.items()},
+            'prices': {market_id: list(prices) for market_id, prices in self.last_prices.items()}
+        }
+        try:
+            directory = os.path.dirname(self.snapshot_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            temp_path = self.snapshot_path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, ensure_ascii=False)
+            os.replace(temp_path, self.snapshot_path)
+        except Exception as e:
+            logging.error(f"保存快照失败: {str(e)}")
+
+    def start_monitoring(self):
+        """开始抓取市场价格，成功返回 True"""
+        if self.monitoring:
+            return True
+        if self.stopping:
+            # 不能同时运行两个循环；这里不等待旧循环退出，界面线程调用时不会卡住
+            logging.warning("上一次的监控线程仍在运行，请稍后再开始监控")
+            return False
+        logging.info("开始监控...")
+        self.monitoring = True
+        self.scheduler = self.create_scheduler()
+        if self.setup_price_source():
+            self.monitor_thread = threading.Thread(target=self.monitor_prices, args=(self.price_source,))
+            self.monitor_thread.start()
+            logging.info("监控线程已启动")
+            return True
+        self.monitoring = False
+        logging.error("监控启动失败")
+        return False
+
+    @property
+    def stopping(self):
+        """已经停止监控，但上一次的抓取循环还没退出（正在等待页面加载）"""
+        return not self.monitoring and self.monitor_thread is not None and self.monitor_thread.is_alive()
+
+    def stop_monitoring(self):
+        logging.info("停止监控...")
+        self.monitoring = False
+        self.wake.set()
+        if self.price_source:
+            self.price_source.stop()
+            self.price_source = None
+        logging.info("监控已停止")
+
+    def monitor_prices(self, source):
+        """抓取循环，只使用启动时的价格来源；stop_monitoring 在别的线程中把 self.price_source 置空"""
+        scheduler = self.scheduler
+        last_stats_log = time.time()
+        last_error_log = 0
+        errors = 0
+        # 逐个市场抓取时，先按快照中的市场抓一轮价格，下一轮再重新发现（加载分类页面较慢）
+        cached = bool(self.market_urls) and source.per_market
+        if cached:
+            scheduler.set_markets(list(self.market_urls.values()))
+
+        cycle = 0
+        while self.monitoring and self.price_source is source:
+            cycle_start = time.perf_counter()
+            cycle += 1
+            # 本轮产生的日志都带上轮次编号
+            with log_context(cycle=cycle):
+                try:
+                    current_time = time.time()
+
+                    # 链接发现使用独立的自适应计时器
+                    if cached:
+                        cached = False
+                        scheduler.request_discovery()
+                    elif scheduler.discovery_due(current_time):
+                        try:
+                            with DISCOVERY.time():
+                                market_urls, market_index, groups = self.discover_markets(source)
+                        except Exception:
+                            MONITOR_ERRORS.inc('discovery')
+                            scheduler.discovery_failed(current_time)
+                            raise
+
+                        # 更新链接映射
+                        self.market_urls = market_urls
+                        self.market_index = market_index
+                        self.groups = groups
+                        self.analytics.retain(market_index)
+                        self.retain_prices(market_index)
+                        scheduler.set_markets(list(market_urls.values()), current_time)
+                        self.emit('on_markets', dict(market_urls))
+                        self.emit('on_categories', list(groups))
+                        layout = market_layout(market_urls, groups)
+                        if layout != self.layout:
+                            self.layout = layout
+                            self.emit('on_layout', list(layout))
+
+                    if source.per_market:
+                        # 只抓取已到期的市场，频率由波动率、查看记录和全局预算决定
+                        batch = scheduler.next_batch()
+                        if batch:
+                            source.fetch_prices(batch, self.handle_price)
+                    else:
+                        source.fetch_prices(list(self.market_urls.values()), self.handle_price)
+
+                    CYCLE.observe(time.perf_counter() - cycle_start)
+
+                    # 定期记录调度统计和指标摘要
+                    if time.time() - last_stats_log >= self.summary_interval:
+                        SUMMARY_LOG.info(f"调度统计: {scheduler.stats()}")
+                        SUMMARY_LOG.info(f"指标摘要: {metrics.REGISTRY.summary()}")
+                        last_stats_log = time.time()
+
+                except Exception as e:
+                    MONITOR_ERRORS.inc('cycle')
+                    errors += 1
+                    if time.time() - last_error_log >= self.error_log_interval:
+                        detail = str(e).splitlines()[0] if str(e) else ''
+                        logging.error(f"抓取循环出错（{errors} 次）: {type(e).__name__}: {detail}")
+                        logging.debug(traceback.format_exc())
+                        last_error_log = time.time()
+                        errors = 0
+
+            if source.per_market:
+                self.wake.wait(min(max(scheduler.time_until_next(), 0.05), 1))
+            else:
+                self.wake.wait(source.poll_interval)
+            self.wake.clear()
+
+    def retain_prices(self, market_index):
+        """丢弃已不在监控的市场的最后价格"""
+        for prices in (self.last_prices, self.last_values):
+            for market_id in [m for m in prices if m not in market_index]:
+                prices.pop(market_id, None)
+
+    def handle_price(self, record):
+        """处理价格来源返回的一条 (market_id, yes, no) 记录"""
+        market_id, yes_price, no_price = record
+        idx = self.market_index.get(market_id)
+        if idx is None:
+            return
+
+        # 消费者在这里写的日志都带上市场标识
+        with log_context(market_id=market_id):
+            # 按数值比较，'55' 和 '55.0' 这样的文本差异不算变化
+            yes_value = parse_cents(yes_price)
+            no_value = parse_cents(no_price)
+            price_changed = False
+            if market_id in self.last_values:
+                last_yes, last_no = self.last_values[market_id]
+                price_changed = not (same_value(last_yes, yes_value) and same_value(last_no, no_value))
+
+            mark_startup('first_live_price')
+            self.last_prices[market_id] = (yes_price, no_price)
+            self.last_values[market_id] = (yes_value, no_value)
+            url = self.market_urls.get(idx, '')
+            # 历史和滚动统计使用同一个时间戳，批量重算时结果一致
+            now = time.time()
+            if self.tick_store:
+                self.tick_store.append_market(market_id, yes_value, no_value, now)
+            if self.scheduler:
+                self.scheduler.observe(url, yes_value)
+            self.analytics.update(market_id, yes_value, now)
+            self.emit('on_price', idx, market_id, yes_price, no_price, price_changed, url)
+            # 只有消费者需要时才合并统计
+            if any(hasattr(consumer, 'on_stats') for consumer in self.consumers):
+                self.emit('on_stats', idx, market_id, self.analytics.snapshot(market_id))
+
+    def mark_viewed(self, url):
+        """市场被查看或点击，提高它的抓取频率"""
+        if self.scheduler:
+            self.scheduler.mark_viewed(url)
+
+    def market_stats(self, market_id):
+        """一个市场的滚动统计，以及从价格历史批量重算的同一组统计，用于核对两者"""
+        now = time.time()
+        batch = None
+        if self.tick_store:
+            # 先写出待写记录，批量重算才能看到和滚动统计相同的价格
+            self.tick_store.flush()
+            batch = history_stats(self.tick_store, market_id, now,
+                                  self.analytics.windows, self.analytics.buckets)
+        return {'market': market_id, 'time': now,
+                'online': self.analytics.snapshot(market_id, now), 'batch': batch}
+
+    def handle_binance_price(self, symbol, price):
+        """币安订阅线程收到的价格"""
+        self.binance_prices[symbol] = price
+        if self.tick_store:
+            self.tick_store.append_binance(symbol, price)
+        self.emit('on_binance', symbol, price)
+
+
+class LogConsumer:
+    """无界面模式下把价格变化写入日志"""
+
+    def on_markets(self, market_urls):
+        logging.info(f"发现 {len(market_urls)} 个市场")
+
+    def on_categories(self, groups):
+        logging.info("各分类市场数: " + ', '.join(f"{category_name(url)} {count}" for url, count in groups))
+
+    def on_price(self, idx, market_id, yes_price, no_price, price_changed, url):
+        if price_changed:
+            logging.info(f"价格变化 {market_id}: {yes_price} / {no_price}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Polymarket 价格监控')
+    parser.add_argument('--headless', action='store_true', help='不启动界面，只运行抓取和订阅')
+    parser.add_argument('--config', default=CONFIG_PATH, help='配置文件路径')
+    parser.add_argument('--url', action='append', help='要监控的分类页面地址，可重复指定或用逗号分隔')
+    parser.add_argument('--price-source', choices=['selenium', 'listing', 'tabs', 'http', 'distributed'], help='价格来源')
+    parser.add_argument('--pool-size', type=int, help='并行浏览器数量')
+    parser.add_argument('--api-port', type=int, help='启用本地价格接口并监听该端口')
+    parser.add_argument('--log-level', help='日志级别，如 INFO、DEBUG，默认读取 [Logging] level')
+    return parser.parse_args(argv)
+
+
+def build_config(args):
+    """读取配置文件，并用命令行参数覆盖"""
+    config = load_config(args.config)
+    if not config.has_section('Monitor'):
+        config.add_section('Monitor')
+    if args.url:
+        config.set('Monitor', 'url', ','.join(args.url))
+    if args.price_source:
+        config.set('Monitor', 'price_source', args.price_source)
+    if args.pool_size:
+        config.set('Monitor', 'pool_size', str(args.pool_size))
+    if args.api_port:
+        if not config.has_section('Api'):
+            config.add_section('Api')
+        config.set('Api', 'enabled', 'true')
+        config.set('Api', 'port', str(args.api_port))
+    return config
+
+
+def run_headless(core):
+    """无界面运行，直到收到 SIGINT/SIGTERM"""
+    stop_event = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda signum, frame: stop_event.set())
+    core.add_consumer(LogConsumer())
+    core.start()
+    if not core.start_monitoring():
+        core.stop()
+        return 1
+    while not stop_event.is_set():
+        stop_event.wait(1)
+    core.stop()
+    return 0
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    config = build_config(args)
+    setup_logging(config, args.log_level)
+    core = MonitorCore(config)
+    if args.headless:
+        return run_headless(core)
+    # 只有启动界面时才导入 tkinter
+    from market_monitor import MarketMonitor
+    MarketMonitor(core).run()
+    return 0
+
+
+if __name__ == '__main__':
+    try:
+        raise SystemExit(main())
+    except Exception as e:
+        logging.critical(f"程序发生严重错误: {str(e)}\n{traceback.format_exc()}")
@@ -0,0 +1,568 @@
+import json
+import logging
+from functools import partial
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from selenium.common.exceptions import StaleElementReferenceException, TimeoutException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+import metrics
+from driver_pool import DriverPool, create_chrome_driver, pool_options
+from load_profile import LoadProfile
+from log_pipeline import log_context
+from markets import PRICE_SELECTOR, format_cents, market_id_from_href
+
+SITE_BASE = "https://polymarket.com"
+
+PAGE_LOAD = metrics.histogram('page_load_seconds', '单个市场页面 driver.get 耗时')
+PRICE_WAIT = metrics.histogram('price_wait_seconds', '等待价格元素出现（WebDriverWait）的耗时')
+PRICE_EXTRACT = metrics.histogram('price_extract_seconds', '读取价格元素文本的耗时')
+LISTING_LOAD = metrics.histogram('listing_load_seconds', '加载分类页面并读取列表的耗时')
+TAB_DRAIN = metrics.histogram('tab_drain_seconds', '从汇总标签页取回价格缓冲区的耗时')
+HTTP_FETCH = metrics.histogram('http_fetch_seconds', 'HTTP 价格源请求 /events 的耗时')
+SCRAPE_FAILURES = metrics.counter('scrape_failures_total', '抓取失败次数', label='reason')
+
+
+# 在分类页面中执行：一次返回所有市场的链接和列表上能读到的 Yes/No 价格
+LISTING_SCRIPT = """
+const selector = arguments[0];
+const container = document.getElementById('markets-grid-container');
+if (!container) return null;
+function valid(a) { return a.href && !a.href.includes('#comments'); }
+function pricesOf(el) {
+    const els = el.querySelectorAll(selector);
+    if (els.length >= 2) return [els[0].textContent, els[1].textContent].map(t => t.replace('¢', '').trim());
+    const text = el.innerText || '';
+    const cents = text.match(/<?\\d+(?:\\.\\d+)?¢/g);
+    if (cents && cents.length >= 2) return cents.slice(0, 2).map(t => t.replace('¢', '').trim());
+    // 只认整段文本就是概率的元素（如 "62%"、"62% chance"），标题里的 "up 5%" 不算价格
+    for (const leaf of el.querySelectorAll('*')) {
+        if (leaf.children.length) continue;
+        const chance = (leaf.textContent || '').trim().match(/^(\\d+(?:\\.\\d+)?)%(?:\\s*chance)?$/i);
+        if (chance) {
+            const yes = parseFloat(chance[1]);
+            return [String(yes), String(Math.round((100 - yes) * 10) / 10)];
+        }
+    }
+    return null;
+}
+function pricesFor(a) {
+    // 从链接向上查找价格，父元素包含其他市场的链接时停止，避免读到别的市场的价格
+    let el = a;
+    while (el && el !== container) {
+        const prices = pricesOf(el);
+        if (prices) return prices;
+        const parent = el.parentElement;
+        if (!parent || parent === container) break;
+        if (Array.from(parent.querySelectorAll('a')).some(x => valid(x) && x.href !== a.href)) break;
+        el = parent;
+    }
+    return null;
+}
+const cache = new Map();
+const out = [];
+for (const a of container.querySelectorAll('a')) {
+    if (!valid(a)) continue;
+    if (!cache.has(a.href)) cache.set(a.href, pricesFor(a));
+    const prices = cache.get(a.href);
+    out.push({href: a.href, yes: prices ? prices[0] : null, no: prices ? prices[1] : null});
+}
+return out;
+"""
+
+
+def read_listing(driver, category_url, timeout=10):
+    """加载分类页面，用一次 execute_script 取回 [{href, yes, no}, ...]
+
+    不再固定等待，而是反复执行脚本，直到列表中出现价格为止；超时后返回最后一次读到的链接。
+    """
+    last = []
+
+    def listing_ready(driver):
+        nonlocal last
+        last = driver.execute_script(LISTING_SCRIPT, PRICE_SELECTOR) or []
+        return any(item.get('yes') for item in last) and last
+
+    with LISTING_LOAD.time():
+        driver.get(category_url)
+        try:
+            return WebDriverWait(driver, timeout, poll_frequency=0.1).until(listing_ready)
+        except TimeoutException:
+            if not last:
+                raise
+            return last
+
+
+def find_market_links(driver, category_url):
+    """加载分类页面并返回其中的市场链接"""
+    return [item['href'] for item in read_listing(driver, category_url)]
+
+
+class PriceSource:
+    """价格来源接口：发现市场链接，并以 (market_id, yes, no) 记录返回价格"""
+
+    poll_interval = 5  # 两次抓取之间的间隔（秒）
+    per_market = False  # 是否逐个市场抓取；为 True 时由调度器决定每轮抓取哪些市场
+
+    def start(self):
+        return True
+
+    def stop(self):
+        pass
+
+    def discover(self, category_url):
+        """返回分类页面上的市场链接列表"""
+        raise NotImplementedError
+
+    def discover_all(self, category_urls):
+        """发现多个分类的市场，返回 {分类地址: 市场链接列表}，失败的分类不在结果中"""
+        results = {}
+        for category_url in category_urls:
+            try:
+                results[category_url] = self.discover(category_url)
+            except Exception as e:
+                logging.error(f"发现 {category_url} 的市场失败: {str(e)}")
+        return results
+
+    def fetch_prices(self, hrefs, on_record):
+        """抓取给定市场的价格，每得到一条记录就调用 on_record((market_id, yes, no))"""
+        raise NotImplementedError
+
+    def set_categories(self, category_urls):
+        """不经过链接发现直接指定分类（分布式工作进程使用），按分类批量读取价格的来源需要"""
+        self.category_urls = list(category_urls)
+
+
+class SeleniumPriceSource(PriceSource):
+    """用驱动池中的无头浏览器加载页面并读取价格元素"""
+
+    per_market = True
+
+    def __init__(self, pool_size=3, options=None, profile=None):
+        self.pool_size = pool_size
+        self.options = options or {}  # 浏览器回收相关参数，见 [Driver]
+        self.profile = profile or LoadProfile()
+        self.driver_pool = None
+
+    def start(self):
+        factory = partial(create_chrome_driver, profile=self.profile)
+        self.driver_pool = DriverPool(self.pool_size, factory, **self.options)
+        return self.driver_pool.start()
+
+    def stop(self):
+        if self.driver_pool:
+            self.driver_pool.stop()
+            self.driver_pool = None
+
+    def discover(self, category_url):
+        with self.driver_pool.acquire() as driver:
+            return self.driver_pool.load(driver, find_market_links, category_url)
+
+    def discover_all(self, category_urls):
+        # 多个分类页面由驱动池中的浏览器并行加载
+        results = {}
+
+        def discover(driver, category_url):
+            results[category_url] = self.driver_pool.load(driver, find_market_links, category_url)
+
+        self.driver_pool.run(category_urls, discover)
+        return results
+
+    def fetch_prices(self, hrefs, on_record):
+        # 链接分摊到驱动池中的各个浏览器并行抓取
+        def fetch(driver, href):
+            with log_context(market_id=market_id_from_href(href)):
+                record = self.fetch_market_price(driver, href)
+                if record:
+                    on_record(record)
+
+        self.driver_pool.run(hrefs, fetch)
+
+    def fetch_market_price(self, driver, href):
+        """用指定浏览器抓取单个市场的价格"""
+        try:
+            with PAGE_LOAD.time():
+                driver.get(href)
+            with PRICE_WAIT.time():
+                prices = WebDriverWait(driver, 10).until(
+                    EC.presence_of_all_elements_located((By.CSS_SELECTOR, PRICE_SELECTOR))
+                )
+            if len(prices) >= 2:
+                with PRICE_EXTRACT.time():
+                    # 移除价格中的美分符号
+                    yes_price = prices[0].text.replace('¢', '')
+                    no_price = prices[1].text.replace('¢', '')
+                self.driver_pool.record(driver)
+                self.profile.record(driver)
+                return (market_id_from_href(href), yes_price, no_price)
+            SCRAPE_FAILURES.inc('selector_miss')
+            self.driver_pool.record(driver)
+        except TimeoutException as e:
+            SCRAPE_FAILURES.inc('timeout')
+            self.driver_pool.record(driver, e)
+            logging.debug(f"抓取 {href} 价格超时")
+        except StaleElementReferenceException as e:
+            SCRAPE_FAILURES.inc('stale_element')
+            self.driver_pool.record(driver, e)
+            logging.debug(f"抓取 {href} 价格时元素已失效")
+        except Exception as e:
+            SCRAPE_FAILURES.inc('error')
+            self.driver_pool.record(driver, e)
+            logging.debug(f"抓取 {href} 价格失败: {str(e)}")
+        return None
+
+
+class ListingPriceSource(SeleniumPriceSource):
+    """直接从分类页面的列表读取价格
+
+    每轮每个分类只加载一次分类页面并执行一次脚本，只有列表上读不到价格的市场才单独打开页面。
+    """
+
+    per_market = False
+
+    def __init__(self, pool_size=3, options=None, profile=None):
+        super().__init__(pool_size, options, profile)
+        self.category_urls = []
+        self.listing = {}  # href -> (yes, no) 或 None
+        self.fresh = False
+
+    def load_listing(self):
+        """并行加载所有分类页面，返回 {分类地址: 市场链接列表}"""
+        results = {}
+
+        def load(driver, category_url):
+            results[category_url] = self.driver_pool.load(driver, read_listing, category_url)
+            self.profile.record(driver)
+
+        self.driver_pool.run(self.category_urls, load)
+        listing = {}
+        for items in results.values():
+            for item in items:
+                prices = (item['yes'], item['no']) if item.get('yes') and item.get('no') else None
+                if listing.get(item['href']) is None:
+                    listing[item['href']] = prices
+        self.listing = listing
+        return {url: [item['href'] for item in items] for url, items in results.items()}
+
+    def discover(self, category_url):
+        return self.discover_all([category_url]).get(category_url, [])
+
+    def discover_all(self, category_urls):
+        self.category_urls = list(category_urls)
+        links = self.load_listing()
+        # 刚加载的列表留给紧接着的一轮价格抓取使用
+        self.fresh = True
+        return links
+
+    def fetch_prices(self, hrefs, on_record):
+        if not self.fresh:
+            self.load_listing()
+        self.fresh = False
+        missing = []
+        for href in hrefs:
+            prices = self.listing.get(href)
+            if prices:
+                on_record((market_id_from_href(href), prices[0], prices[1]))
+            else:
+                missing.append(href)
+        if missing:
+            super().fetch_prices(missing, on_record)
+
+
+# 注入到每个市场标签页：价格元素变化时通过 BroadcastChannel 发送最新价格
+OBSERVER_SCRIPT = """
+const marketId = arguments[0], selector = arguments[1];
+if (window.__pmObserver) {
+    window.__pmObserver.disconnect();
+    window.__pmObserverChannel.close();
+}
+const channel = new BroadcastChannel('pm-monitor');
+let last = null, pending = false;
+function report(force) {
+    const els = document.querySelectorAll(selector);
+    if (els.length < 2) return;
+    const yes = els[0].textContent.replace('¢', '').trim();
+    const no = els[1].textContent.replace('¢', '').trim();
+    const key = yes + '|' + no;
+    if (!force && key === last) return;
+    last = key;
+    channel.postMessage({id: marketId, yes: yes, no: no});
+}
+const observer = new MutationObserver(() => {
+    if (pending) return;
+    pending = true;
+    setTimeout(() => { pending = false; report(false); }, 50);
+});
+observer.observe(document.body, {subtree: true, childList: true, characterData: true});
+channel.onmessage = (e) => { if (e.data === 'resync') report(true); };
+window.__pmObserver = observer;
+window.__pmObserverChannel = channel;
+report(true);
+"""
+
+# 在汇总标签页中执行：首次调用时安装监听，之后每次取出并清空缓冲区
+DRAIN_SCRIPT = """
+if (!window.__pmChannel) {
+    window.__pmBuffer = {};
+    window.__pmChannel = new BroadcastChannel('pm-monitor');
+    window.__pmChannel.onmessage = (e) => {
+        if (e.data && e.data.id) window.__pmBuffer[e.data.id] = [e.data.id, e.data.yes, e.data.no];
+    };
+    window.__pmChannel.postMessage('resync');
+}
+const out = Object.values(window.__pmBuffer);
+window.__pmBuffer = {};
+return out;
+"""
+
+
+class TabPriceSource(PriceSource):
+    """每个市场常驻一个标签页，由页面内的 MutationObserver 推送价格变化
+
+    分类页面所在的第一个标签页负责汇总，每轮只需一次 execute_script 取回缓冲区。
+    浏览器由只有一个浏览器的驱动池管理：会话失效、内存或错误率过高时换上备用浏览器，
+    所有标签页在下一轮重新打开。
+    """
+
+    poll_interval = 0.5
+    # 避免后台标签页的定时器和渲染被节流
+    BACKGROUND_ARGS = (
+        '--disable-background-timer-throttling',
+        '--disable-backgrounding-occluded-windows',
+        '--disable-renderer-backgrounding',
+    )
+
+    def __init__(self, profile=None, options=None):
+        self.profile = profile or LoadProfile()
+        # 标签页常驻，按加载次数回收没有意义
+        self.options = dict(options or {}, max_loads=0)
+        self.driver_pool = None
+        self.driver = None
+        self.collector = None
+        self.tabs = {}  # href -> 窗口句柄
+
+    def start(self):
+        self.driver_pool = DriverPool(1, partial(create_chrome_driver, self.BACKGROUND_ARGS, self.profile), **self.options)
+        if not self.driver_pool.start():
+            return False
+        try:
+            self.attach(self.driver_pool.take())
+        except Exception as e:
+            logging.error(f"ChromeDriver 初始化失败: {str(e)}")
+            self.stop()
+            return False
+        return True
+
+    def stop(self):
+        if self.driver_pool:
+            self.driver_pool.stop()
+            self.driver_pool = None
+        self.driver = None
+        self.tabs = {}
+
+    def attach(self, driver):
+        self.driver = driver
+        self.collector = driver.current_window_handle
+        self.tabs = {}
+
+    def ensure_driver(self):
+        """浏览器需要回收时换上新的浏览器（失效时等待重新启动）"""
+        if self.driver_pool.recycle_reason(self.driver_pool.managed.get(self.driver)) is None:
+            return
+        self.driver_pool.release(self.driver)
+        driver = self.driver_pool.take()
+        if driver is not self.driver:
+            logging.info("汇总浏览器已更换，重新打开所有标签页")
+            self.attach(driver)
+
+    def run(self, func, *args):
+        """执行 func(*args) 并把结果计入浏览器的健康状态"""
+        self.ensure_driver()
+        return self.driver_pool.load(self.driver, lambda driver: func(*args))
+
+    def discover(self, category_url):
+        return self.run(self.discover_links, category_url)
+
+    def discover_links(self, category_url):
+        self.driver.switch_to.window(self.collector)
+        links = find_market_links(self.driver, category_url)
+        self.check_tabs()
+        return links
+
+    def open_tab(self, href):
+        """在新标签页中打开市场并注入价格监听脚本"""
+        self.driver.switch_to.new_window('tab')
+        self.tabs[href] = self.driver.current_window_handle
+        try:
+            self.driver.get(href)
+            WebDriverWait(self.driver, 10).until(
+                EC.presence_of_all_elements_located((By.CSS_SELECTOR, PRICE_SELECTOR))
+            )
+            self.driver.execute_script(OBSERVER_SCRIPT, market_id_from_href(href), PRICE_SELECTOR)
+        except Exception as e:
+            logging.debug(f"打开标签页 {href} 失败: {str(e)}")
+
+    def close_tab(self, href):
+        handle = self.tabs.pop(href)
+        try:
+            self.driver.switch_to.window(handle)
+            self.driver.close()
+        except Exception as e:
+            logging.debug(f"关闭标签页 {href} 失败: {str(e)}")
+
+    def check_tabs(self):
+        """重新注入失效的监听脚本（页面被刷新或跳转后），并重开已关闭的标签页"""
+        handles = set(self.driver.window_handles)
+        for href, handle in list(self.tabs.items()):
+            if handle not in handles:
+                del self.tabs[href]
+                continue
+            try:
+                self.driver.switch_to.window(handle)
+                if not self.driver.execute_script("return !!window.__pmObserver"):
+                    self.driver.execute_script(OBSERVER_SCRIPT, market_id_from_href(href), PRICE_SELECTOR)
+            except Exception as e:
+                logging.debug(f"检查标签页 {href} 失败: {str(e)}")
+        self.driver.switch_to.window(self.collector)
+
+    def sync_tabs(self, hrefs):
+        """为新市场打开标签页，关闭已下架市场的标签页"""
+        wanted = set(hrefs)
+        changed = False
+        for href in list(self.tabs):
+            if href not in wanted:
+                self.close_tab(href)
+                changed = True
+        for href in hrefs:
+            if href not in self.tabs:
+                self.open_tab(href)
+                changed = True
+        if changed:
+            self.driver.switch_to.window(self.collector)
+
+    def fetch_prices(self, hrefs, on_record):
+        for market_id, yes_price, no_price in self.run(self.drain, hrefs):
+            on_record((market_id, yes_price, no_price))
+
+    def drain(self, hrefs):
+        self.sync_tabs(hrefs)
+        with TAB_DRAIN.time():
+            return self.driver.execute_script(DRAIN_SCRIPT)
+
+
+class HttpPriceSource(PriceSource):
+    """不启动浏览器，直接从 JSON 接口读取市场列表和价格"""
+
+    def __init__(self, api_base="https://gamma-api.polymarket.com", timeout=(3, 10), pool_size=10):
+        self.api_base = api_base.rstrip('/')
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.session = None
+        self.category_urls = []
+        self.fresh = {}  # 分类地址 -> 刚在链接发现中读到的 {href: 记录}，留给紧接着的一轮价格抓取
+
+    def start(self):
+        # 复用 TCP/TLS 连接，并对瞬时错误做有限次数的重试
+        self.session = requests.Session()
+        retry = Retry(total=2, backoff_factor=0.3, status_forcelist=(429, 500, 502, 503, 504))
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=self.pool_size, max_retries=retry)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        logging.info(f"HTTP 价格源已启动: {self.api_base}")
+        return True
+
+    def stop(self):
+        if self.session:
+            self.session.close()
+            self.session = None
+
+    def fetch_events(self, category_url):
+        """读取分类下所有进行中的事件"""
+        tag_slug = category_url.rstrip('/').split('/')[-1]
+        with HTTP_FETCH.time():
+            response = self.session.get(
+                f"{self.api_base}/events",
+                params={'tag_slug': tag_slug, 'active': 'true', 'closed': 'false', 'limit': 500},
+                timeout=self.timeout
+            )
+        response.raise_for_status()
+        return response.json()
+
+    def parse_markets(self, events):
+        """把事件列表展开成 {href: (market_id, yes, no)}"""
+        markets = {}
+        for event in events:
+            event_markets = event.get('markets') or []
+            for market in event_markets:
+                if market.get('closed'):
+                    continue
+                if len(event_markets) > 1:
+                    href = f"{SITE_BASE}/event/{event['slug']}/{market['slug']}"
+                else:
+                    href = f"{SITE_BASE}/event/{event['slug']}"
+                try:
+                    outcome_prices = market.get('outcomePrices') or '[]'
+                    if isinstance(outcome_prices, str):
+                        outcome_prices = json.loads(outcome_prices)
+                    if len(outcome_prices) < 2:
+                        continue
+                    markets[href] = (
+                        market_id_from_href(href),
+                        format_cents(outcome_prices[0]),
+                        format_cents(outcome_prices[1])
+                    )
+                except (ValueError, TypeError) as e:
+                    logging.debug(f"解析市场 {market.get('slug')} 价格失败: {str(e)}")
+        return markets
+
+    def discover(self, category_url):
+        markets = self.parse_markets(self.fetch_events(category_url))
+        self.fresh[category_url] = markets
+        return list(markets)
+
+    def discover_all(self, category_urls):
+        self.category_urls = list(category_urls)
+        self.fresh = {}
+        return super().discover_all(category_urls)
+
+    def fetch_prices(self, hrefs, on_record):
+        # 每个分类一次请求即可得到其下所有市场的价格，多个分类共有的市场只保留一份；
+        # 刚做过链接发现的分类直接使用发现时的响应
+        fresh, self.fresh = self.fresh, {}
+        markets = {}
+        for category_url in self.category_urls:
+            try:
+                if category_url not in fresh:
+                    fresh[category_url] = self.parse_markets(self.fetch_events(category_url))
+                markets.update(fresh[category_url])
+            except Exception as e:
+                logging.error(f"读取 {category_url} 的价格失败: {str(e)}")
+        for href in hrefs:
+            record = markets.get(href)
+            if record:
+                on_record(record)
+
+
+def create_price_source(config, kind=None):
+    """根据配置文件创建价格来源，kind 不为空时代替 [Monitor] price_source"""
+    kind = kind or config.get('Monitor', 'price_source', fallback='selenium')
+    if kind == 'distributed':
+        # 协调者模块依赖本模块，在这里才导入
+        from distributed import create_coordinator
+        return create_coordinator(config)
+    profile = LoadProfile.from_config(config)
+    if kind == 'listing':
+        return ListingPriceSource(config.getint('Monitor', 'pool_size', fallback=3), pool_options(config), profile)
+    if kind == 'tabs':
+        return TabPriceSource(profile, pool_options(config))
+    if kind == 'http':
+        return HttpPriceSource(
+            api_base=config.get('HttpSource', 'api_base', fallback='https://gamma-api.polymarket.com'),
+            timeout=(
+                config.getfloat('HttpSource', 'connect_timeout', fallback=3),
+                config.getfloat('HttpSource', 'read_timeout', fallback=10)
+            )
+        )
+    return SeleniumPriceSource(config.getint('Monitor', 'pool_size', fallback=3), pool_options(config), profile)
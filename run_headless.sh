@@ -0,0 +1,7 @@
+#!/bin/bash
+
+# 激活虚拟环境
+source venv/bin/activate
+
+# 无界面运行（不导入 tkinter），其余参数原样传给程序，例如 --url、--price-source http
+python3.9 monitor_core.py --headless "$@"
@@ -0,0 +1,190 @@
+import heapq
+import math
+import threading
+import time
+
+
+class MarketState:
+    """单个市场的调度状态"""
+
+    def __init__(self, now, interval):
+        self.next_due = now
+        self.interval = interval
+        self.volatility = 0.0   # 每次抓取价格变动幅度（美分）的指数移动平均
+        self.last_yes = None
+        self.last_change = 0
+        self.viewed_until = 0
+        self.polls = 0
+        self.first_poll = None
+        self.total_wait = 0.0   # 到期后在队列中等待的累计时间
+        self.max_wait = 0.0
+        self.generation = 0     # 堆中旧条目的失效标记
+
+
+class PollScheduler:
+    """按市场自适应的抓取调度器
+
+    每个市场的抓取间隔由近期波动率和是否被查看/点击决定：价格频繁变化或刚被查看的市场
+    接近 min_interval，长期不动的市场逐步放宽到 max_interval。全局用令牌桶限制每秒请求数。
+    链接发现有独立的自适应计时器：市场列表不变时间隔加倍，发生变化时恢复到最小值。
+    """
+
+    def __init__(self, min_interval=5, max_interval=60, requests_per_second=2.0,
+                 view_boost=120, volatility_scale=0.25, alpha=0.3,
+                 min_discovery=60, max_discovery=600):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.requests_per_second = requests_per_second
+        self.view_boost = view_boost              # 被查看后保持高频抓取的时间（秒）
+        self.volatility_scale = volatility_scale  # 波动率达到该值（美分）时间隔减半
+        self.alpha = alpha
+        self.min_discovery = min_discovery
+        self.max_discovery = max_discovery
+        self.discovery_interval = min_discovery
+        self.next_discovery = 0
+        self.markets = {}  # 链接 -> MarketState
+        self.heap = []     # (到期时间, 序号, 链接, generation)
+        self.counter = 0
+        self.burst = max(1.0, requests_per_second)
+        self.tokens = self.burst
+        self.last_refill = None
+        self.lock = threading.Lock()
+
+    # 链接发现
+    def discovery_due(self, now=None):
+        return (now or time.time()) >= self.next_discovery
+
+    def request_discovery(self):
+        """监控的分类变化后尽快重新发现"""
+        self.next_discovery = 0
+        self.discovery_interval = self.min_discovery
+
+    def discovery_failed(self, now=None, retry_delay=5):
+        """链接发现失败时稍后重试"""
+        self.next_discovery = (now or time.time()) + retry_delay
+
+    def set_markets(self, hrefs, now=None):
+        """更新市场列表，返回列表是否发生变化，并据此调整下一次发现的时间"""
+        now = now or time.time()
+        with self.lock:
+            wanted = set(hrefs)
+            changed = wanted != set(self.markets)
+            for href in list(self.markets):
+                if href not in wanted:
+                    del self.markets[href]
+            for href in hrefs:
+                if href not in self.markets:
+                    state = MarketState(now, self.min_interval)
+                    self.markets[href] = state
+                    self.push(href, state)
+            if changed:
+                self.discovery_interval = self.min_discovery
+            else:
+                self.discovery_interval = min(self.discovery_interval * 2, self.max_discovery)
+            self.next_discovery = now + self.discovery_interval
+        return changed
+
+    def push(self, href, state):
+        state.generation += 1
+        self.counter += 1
+        heapq.heappush(self.heap, (state.next_due, self.counter, href, state.generation))
+
+    # 调度
+    def refill(self, now):
+        elapsed = max(0.0, now - self.last_refill) if self.last_refill is not None else 0.0
+        self.last_refill = now
+        self.tokens = min(self.burst, self.tokens + elapsed * self.requests_per_second)
+
+    def next_batch(self, now=None, limit=None):
+        """取出已到期且预算允许的市场，并安排它们的下一次抓取"""
+        now = now or time.time()
+        batch = []
+        with self.lock:
+            self.refill(now)
+            while self.heap and self.tokens >= 1 and (limit is None or len(batch) < limit):
+                due, _, href, generation = self.heap[0]
+                state = self.markets.get(href)
+                if state is None or generation != state.generation:
+                    heapq.heappop(self.heap)
+                    continue
+                if due > now:
+                    break
+                heapq.heappop(self.heap)
+                self.tokens -= 1
+                wait = now - due
+                state.total_wait += wait
+                state.max_wait = max(state.max_wait, wait)
+                state.polls += 1
+                if state.first_poll is None:
+                    state.first_poll = now
+                state.interval = self.interval_for(state, now)
+                state.next_due = now + state.interval
+                self.push(href, state)
+                batch.append(href)
+        return batch
+
+    def interval_for(self, state, now):
+        if now < state.viewed_until:
+            return self.min_interval
+        interval = self.max_interval / (1 + state.volatility / self.volatility_scale)
+        return max(self.min_interval, min(self.max_interval, interval))
+
+    def time_until_next(self, now=None):
+        """距离下一个市场到期或下一次链接发现的秒数"""
+        now = now or time.time()
+        with self.lock:
+            wait = self.next_discovery - now
+            if self.heap:
+                wait = min(wait, self.heap[0][0] - now)
+            if self.tokens < 1:
+                wait = max(wait, (1 - self.tokens) / self.requests_per_second)
+        return max(0.0, wait)
+
+    # 反馈
+    def observe(self, href, yes_value, now=None):
+        """记录一次抓取结果，更新波动率"""
+        now = now or time.time()
+        with self.lock:
+            state = self.markets.get(href)
+            if state is None or math.isnan(yes_value):
+                return
+            change = 0.0 if state.last_yes is None else abs(yes_value - state.last_yes)
+            if change > 0:
+                state.last_change = now
+            state.volatility = self.alpha * change + (1 - self.alpha) * state.volatility
+            state.last_yes = yes_value
+
+    def mark_viewed(self, href, now=None):
+        """市场被查看或点击后，立即安排抓取并在一段时间内保持最高频率"""
+        now = now or time.time()
+        with self.lock:
+            state = self.markets.get(href)
+            if state is None:
+                return
+            state.viewed_until = now + self.view_boost
+            state.interval = self.min_interval
+            if state.next_due > now + self.min_interval:
+                state.next_due = now
+                self.push(href, state)
+
+    def stats(self, now=None):
+        """每个市场的实际抓取频率和排队等待时间"""
+        now = now or time.time()
+        with self.lock:
+            markets = {}
+            for href, state in self.markets.items():
+                elapsed = now - state.first_poll if state.first_poll else 0
+                markets[href] = {
+                    'polls': state.polls,
+                    'polls_per_minute': round(state.polls * 60 / elapsed, 2) if elapsed > 0 else 0,
+                    'interval': round(state.interval, 1),
+                    'volatility': round(state.volatility, 3),
+                    'avg_wait': round(state.total_wait / state.polls, 3) if state.polls else 0,
+                    'max_wait': round(state.max_wait, 3)
+                }
+            return {
+                'markets': markets,
+                'discovery_interval': self.discovery_interval,
+                'queue_length': len(self.markets),
+                'tokens': round(self.tokens, 2)
+            }
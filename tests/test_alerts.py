@@ -0,0 +1,69 @@
+import pytest
+from alerts import AlertEngine, Rule
+
+
+class RecordingNotifier:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, rule, message, url=None):
+        self.sent.append((rule.id, message))
+
+
+def make_engine(*rules):
+    notifier = RecordingNotifier()
+    engine = AlertEngine([Rule.from_dict(data, i, default_cooldown=60) for i, data in enumerate(rules)], notifier)
+    return engine, notifier
+
+
+def test_rule_parsing():
+    rule = Rule.from_dict({'market': 'abc', 'field': 'move', 'op': '<=', 'value': -10,
+                           'binance': {'symbol': 'btcusdt', 'op': '<', 'value': 65000},
+                           'notify': 'desktop'}, 4)
+    assert (rule.id, rule.key, rule.field, rule.window, rule.notify) == ('rule-4', 'abc', 'move', 300, ['desktop'])
+    assert rule.gate[0] == 'BTCUSDT'
+    symbol = Rule.from_dict({'id': 'b', 'symbol': 'ethusdt', 'op': '<', 'value': 3000}, 0)
+    assert (symbol.key, symbol.field, symbol.cooldown) == ('ETHUSDT', 'price', 300)
+
+
+@pytest.mark.parametrize('data', [
+    {'market': 'abc', 'field': 'volume', 'value': 1},
+    {'market': 'abc', 'op': '=>', 'value': 1},
+    {'market': 'abc', 'value': 1, 'binance': {'symbol': 'BTCUSDT', 'op': '~', 'value': 1}},
+])
+def test_rule_parsing_rejects_bad_rules(data):
+    with pytest.raises(ValueError):
+        Rule.from_dict(data, 0)
+
+
+def test_fires_on_crossing_only():
+    engine, notifier = make_engine({'id': 'hi', 'market': 'abc', 'op': '>=', 'value': 60})
+    for now, yes in ((1000, '55'), (1001, '61'), (1002, '62'), (1003, '59'), (1100, '65')):
+        engine.evaluate_market('abc', yes, '40', '', now)
+    # 条件保持满足时不重复触发，回落后再次满足且过了冷却期才再触发
+    assert [message for _, message in notifier.sent] == ['hi: abc yes=61 >= 60', 'hi: abc yes=65 >= 60']
+
+
+def test_cooldown_suppresses_refire():
+    engine, notifier = make_engine({'id': 'hi', 'market': 'abc', 'op': '>=', 'value': 60})
+    for now, yes in ((1000, '61'), (1010, '50'), (1020, '61'), (1070, '50'), (1080, '61')):
+        engine.evaluate_market('abc', yes, '40', '', now)
+    assert len(notifier.sent) == 2
+
+
+def test_binance_gate():
+    engine, notifier = make_engine({'id': 'g', 'market': '*', 'op': '>=', 'value': 60,
+                                    'binance': {'symbol': 'BTCUSDT', 'op': '<', 'value': 65000}})
+    engine.evaluate_market('abc', '61', '39', '', 1000)
+    engine.evaluate_binance('BTCUSDT', 64000, 1001)
+    engine.evaluate_market('abc', '61', '39', '', 1002)
+    assert [rule_id for rule_id, _ in notifier.sent] == ['g']
+
+
+def test_retain_drops_removed_markets():
+    engine, _ = make_engine({'market': '*', 'field': 'move', 'window': 60, 'op': '<=', 'value': -10})
+    engine.evaluate_market('a', '50', '50', '', 0)
+    engine.evaluate_market('b', '50', '50', '', 0)
+    engine.retain({'a'})
+    assert list(engine.market_windows) == ['a']
+    assert all(key[0] == 'a' for key in engine.windows)
@@ -0,0 +1,58 @@
+import random
+import pytest
+from analytics import RollingAnalytics, batch_stats, history_stats, parse_windows
+from tick_store import TickStore
+
+WINDOWS = (60, 300)
+
+
+def random_ticks(now, count=400, seed=3):
+    rng = random.Random(seed)
+    value = 50.0
+    ticks = []
+    for i in range(count):
+        if rng.random() < 0.4:
+            value = min(99.0, max(1.0, value + rng.choice((-1, 1)) * rng.random() * 3))
+        ticks.append((now - 900 + i * 2.2, round(value, 1)))
+    return ticks
+
+
+def online(ticks, now):
+    analytics = RollingAnalytics(WINDOWS, 30)
+    for t, value in ticks:
+        analytics.update('m', value, t)
+    return analytics.snapshot('m', now)
+
+
+def assert_same(left, right):
+    assert left.keys() == right.keys()
+    for label in left:
+        for key, value in left[label].items():
+            assert right[label][key] == pytest.approx(value, rel=1e-9, abs=1e-9), (label, key)
+
+
+def test_batch_matches_online():
+    now = 1_700_000_000.0
+    ticks = random_ticks(now)
+    assert_same(online(ticks, now), batch_stats(ticks, now, WINDOWS, 30))
+
+
+def test_history_stats_reads_tick_store(tmp_path):
+    now = 1_700_000_000.0
+    ticks = random_ticks(now)
+    store = TickStore(str(tmp_path))
+    for t, value in ticks:
+        store.append_market('m', value, 100 - value, t)
+    store.flush()
+    assert_same(online(ticks, now), history_stats(store, 'm', now, WINDOWS, 30, lookback=3600))
+    store.close_files()
+
+
+def test_no_data():
+    assert RollingAnalytics(WINDOWS).snapshot('m') is None
+    assert batch_stats([], 100.0, WINDOWS) is None
+
+
+def test_parse_windows():
+    assert parse_windows('60, 300,') == (60.0, 300.0)
+    assert parse_windows('') == (60, 300, 3600)
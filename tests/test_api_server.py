@@ -0,0 +1,98 @@
+import json
+import socket
+import threading
+import time
+import urllib.request
+import pytest
+from api_server import PriceApi
+
+
+@pytest.fixture
+def api():
+    api = PriceApi(port=0, publish_interval=0.05, keepalive=1, poll_timeout=2).start()
+    yield api
+    api.stop()
+
+
+def get(api, path):
+    with urllib.request.urlopen(f"http://127.0.0.1:{api.port}{path}", timeout=5) as response:
+        return json.loads(response.read())
+
+
+def wait_for_version(api, version, timeout=5):
+    deadline = time.time() + timeout
+    while api.version < version and time.time() < deadline:
+        time.sleep(0.01)
+    assert api.version >= version
+
+
+def test_snapshot_returns_current_prices(api):
+    api.on_price(0, 'abc', '55', '45', False, '/event/abc')
+    api.on_binance('BTCUSDT', 65000.0)
+    wait_for_version(api, 1)
+    snapshot = get(api, '/snapshot')
+    assert snapshot['version'] == 1
+    assert (snapshot['markets']['abc']['yes'], snapshot['markets']['abc']['no']) == ('55', '45')
+    assert snapshot['binance'] == {'BTCUSDT': 65000.0}
+
+
+def test_poll_blocks_until_next_version(api):
+    api.on_price(0, 'abc', '55', '45', False, '/event/abc')
+    wait_for_version(api, 1)
+    result = {}
+
+    def poll():
+        started = time.time()
+        result['body'] = get(api, f"/poll?since={api.version}")
+        result['waited'] = time.time() - started
+    poller = threading.Thread(target=poll)
+    poller.start()
+    time.sleep(0.3)
+    assert poller.is_alive()
+    api.on_price(1, 'def', '10', '90', True, '/event/def')
+    poller.join(5)
+    assert result['waited'] >= 0.3
+    assert result['body']['version'] == 2
+    # 只落后一个版本时返回变化，不包含没有变化的市场
+    assert list(result['body']['markets']) == ['def']
+
+
+def test_poll_returns_snapshot_when_far_behind(api):
+    for i in range(3):
+        api.on_price(0, 'abc', str(50 + i), str(50 - i), True, '/event/abc')
+        wait_for_version(api, i + 1)
+    body = get(api, '/poll?since=0')
+    assert body['version'] == 3 and 'removed' not in body
+
+
+def read_event(stream):
+    event = {}
+    while True:
+        line = stream.readline().decode('utf-8').rstrip('\n')
+        if not line:
+            if 'data' in event:
+                return event
+            continue
+        if line.startswith(':'):
+            continue
+        field, _, value = line.partition(': ')
+        event[field] = value
+
+
+def test_stream_sends_snapshot_then_deltas(api):
+    api.on_price(0, 'abc', '55', '45', False, '/event/abc')
+    wait_for_version(api, 1)
+    with socket.create_connection(('127.0.0.1', api.port), timeout=5) as sock:
+        sock.sendall(b'GET /stream HTTP/1.1\r\nHost: localhost\r\n\r\n')
+        stream = sock.makefile('rb')
+        assert stream.readline().startswith(b'HTTP/1.1 200')
+        while stream.readline() != b'\r\n':
+            pass
+        first = read_event(stream)
+        assert first['event'] == 'snapshot'
+        assert json.loads(first['data'])['markets']['abc']['yes'] == '55'
+        api.on_price(0, 'abc', '60', '40', True, '/event/abc')
+        second = read_event(stream)
+        assert (second['event'], second['id']) == ('update', '2')
+        delta = json.loads(second['data'])
+        assert list(delta['markets']) == ['abc'] and delta['markets']['abc']['yes'] == '60'
@@ -0,0 +1,90 @@
+import json
+import logging
+import socket
+import time
+from urllib.parse import urlparse
+import pytest
+from binance_feed import BinanceFeed
+from fixture_server import FixtureServer, StreamServer
+
+SYMBOLS = ['BTCUSDT', 'ETHUSDT']
+
+
+def closed_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+class Feed:
+    """在测试中运行 BinanceFeed，记录收到的价格和 REST 请求地址"""
+
+    def __init__(self, ws_url, rest_url, **kwargs):
+        self.prices = []
+        self.requests = []
+        self.feed = BinanceFeed(SYMBOLS, lambda symbol, price: self.prices.append((symbol, price)),
+                                ws_url=ws_url, rest_url=rest_url, **kwargs)
+        get = self.feed.session.get
+
+        def recording_get(url, **params):
+            self.requests.append((url, params.get('params')))
+            return get(url, **params)
+        self.feed.session.get = recording_get
+
+    def __enter__(self):
+        self.feed.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.feed.stop()
+
+
+@pytest.fixture
+def server():
+    server = FixtureServer().start()
+    yield server
+    server.stop()
+
+
+def test_websocket_frames_reach_on_price():
+    stream = StreamServer(interval=0.05).start()
+    try:
+        # REST 指向没有服务的端口，价格只能来自 WebSocket
+        with Feed(stream.base_url, f"http://127.0.0.1:{closed_port()}") as feed:
+            assert wait_until(lambda: {s for s, _ in feed.prices} == set(SYMBOLS))
+            assert feed.feed.ws_healthy
+            assert all(price > 0 for _, price in feed.prices)
+    finally:
+        stream.stop()
+
+
+def test_rest_fallback_filters_symbols(server):
+    with Feed(f"ws://127.0.0.1:{closed_port()}", server.base_url) as feed:
+        assert wait_until(lambda: {s for s, _ in feed.prices} == set(SYMBOLS))
+    url, params = feed.requests[0]
+    assert urlparse(url).path == '/api/v3/ticker/price'
+    assert json.loads(params['symbols']) == SYMBOLS
+
+
+def test_rest_failures_back_off_and_log_once(server, caplog):
+    caplog.set_level(logging.INFO)
+    with Feed(f"ws://127.0.0.1:{closed_port()}", f"http://127.0.0.1:{closed_port()}",
+              rest_interval=0.05, max_backoff=0.2) as feed:
+        time.sleep(1.5)
+        failed = len(feed.requests)
+        # 不退避时约 30 次；0.1、0.2、0.2 … 的间隔下不超过 10 次
+        assert 4 <= failed <= 10
+        feed.feed.rest_url = server.base_url
+        assert wait_until(lambda: feed.prices)
+    messages = [record.getMessage() for record in caplog.records]
+    assert sum(m.startswith('获取币安价格出错') for m in messages) == 1
+    assert sum('已恢复' in m for m in messages) == 1
@@ -0,0 +1,109 @@
+import threading
+import time
+import pytest
+from distributed import CoordinatorSource, Worker, assign
+from fixture_server import FixtureServer, MarketFixtures
+from markets import market_id_from_href
+from price_source import HttpPriceSource
+from scheduler import PollScheduler
+
+
+def http_source(server):
+    source = HttpPriceSource(api_base=server.base_url)
+    source.poll_interval = 0.1
+    return source
+
+
+class Cluster:
+    """协调者加若干在线程中运行的工作进程，pump 代替监控循环把价格取回"""
+
+    def __init__(self, server, worker_timeout=1):
+        self.server = server
+        self.category = f"{server.base_url}/markets/crypto/bitcoin"
+        self.coordinator = CoordinatorSource(http_source(server), port=0,
+                                             worker_timeout=worker_timeout, report_interval=0.1)
+        assert self.coordinator.start()
+        self.hrefs = self.coordinator.discover_all([self.category])[self.category]
+        self.workers = {}
+        self.threads = {}
+        self.reported = {}  # market_id -> 最近一次收到价格的时间
+
+    def add_worker(self, worker_id):
+        worker = Worker(self.coordinator.url, http_source(self.server), PollScheduler(), worker_id)
+        self.workers[worker_id] = worker
+        self.threads[worker_id] = threading.Thread(target=worker.run, daemon=True)
+        self.threads[worker_id].start()
+        return worker
+
+    def stop_worker(self, worker_id):
+        self.workers.pop(worker_id).stop()
+        self.threads.pop(worker_id).join(5)
+
+    def pump(self, seconds):
+        deadline = time.time() + seconds
+        while time.time() < deadline:
+            self.coordinator.fetch_prices(self.hrefs, lambda tick: self.reported.__setitem__(tick[0], time.time()))
+            time.sleep(0.05)
+
+    def wait_for(self, condition, timeout=5):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            self.pump(0.1)
+            if condition():
+                return True
+        return False
+
+    def owners(self):
+        return {href: worker_id for worker_id, hrefs in self.coordinator.assignment.items() for href in hrefs}
+
+    def close(self):
+        for worker_id in list(self.workers):
+            self.stop_worker(worker_id)
+        self.coordinator.stop()
+
+
+@pytest.fixture
+def cluster():
+    server = FixtureServer(fixtures=MarketFixtures(num_markets=12)).start()
+    cluster = Cluster(server)
+    yield cluster
+    cluster.close()
+    server.stop()
+
+
+def test_assign_covers_every_href_once():
+    hrefs = [f"/event/market-{i}" for i in range(200)]
+    assignment = assign(hrefs, {'a': 1, 'b': 2, 'c': 1})
+    assigned = [href for owned in assignment.values() for href in owned]
+    assert sorted(assigned) == sorted(hrefs)
+    assert len(assignment['b']) > len(assignment['a'])
+    assert assign(hrefs, {}) == {}
+
+
+def test_workers_share_markets_and_rebalance(cluster):
+    cluster.add_worker('w1')
+    cluster.add_worker('w2')
+    assert cluster.wait_for(lambda: set(cluster.coordinator.workers) == {'w1', 'w2'})
+    owners = cluster.owners()
+    assert sorted(owners) == sorted(cluster.hrefs)
+    assert set(owners.values()) == {'w1', 'w2'}
+    market_ids = {market_id_from_href(href) for href in cluster.hrefs}
+    assert cluster.wait_for(lambda: set(cluster.reported) == market_ids)
+
+    # 新加入的工作进程只从已有的工作进程手里拿走市场，其余市场不动
+    cluster.add_worker('w3')
+    assert cluster.wait_for(lambda: 'w3' in cluster.coordinator.workers)
+    joined = cluster.owners()
+    assert sorted(joined) == sorted(cluster.hrefs)
+    assert all(joined[href] in (owner, 'w3') for href, owner in owners.items())
+
+    # 停止的工作进程超过 worker_timeout 后，它的市场交给其余工作进程，所有市场继续有价格
+    assert 'w1' in joined.values()
+    cluster.stop_worker('w1')
+    assert cluster.wait_for(lambda: 'w1' not in cluster.coordinator.workers)
+    rebalanced = cluster.owners()
+    assert sorted(rebalanced) == sorted(cluster.hrefs)
+    assert set(rebalanced.values()) <= {'w2', 'w3'}
+    assert all(rebalanced[href] == owner for href, owner in joined.items() if owner != 'w1')
+    since = time.time()
+    assert cluster.wait_for(lambda: all(cluster.reported.get(m, 0) > since for m in market_ids))
@@ -0,0 +1,58 @@
+import pytest
+from grid_renderer import GridModel
+
+
+def make_model(**kwargs):
+    model = GridModel(columns=2, **kwargs)
+    model.set_layout([('BTC', ['a', 'b', 'c']), ('ETH', ['d'])])
+    return model
+
+
+def test_set_layout_returns_diff_and_keeps_state():
+    model = make_model()
+    model.update('a', 'A', '55 / 45', True, '/event/a', 100)
+    added, removed = model.set_layout([('BTC', ['a', 'c', 'e'])])
+    assert added == ['e']
+    assert sorted(removed) == ['b', 'd']
+    assert model.rows['a'].price_text == '55 / 45'
+    assert model.rows['c'].order == 1
+
+
+def test_update_unknown_market_is_ignored():
+    model = make_model()
+    assert model.update('zzz', 'Z', '1 / 99', True, '', 100) is None
+
+
+def test_category_lines():
+    model = make_model()
+    assert model.lines(100) == [
+        ('header', 'BTC (3)'), ('cells', ['a', 'b']), ('cells', ['c']),
+        ('header', 'ETH (1)'), ('cells', ['d'])
+    ]
+
+
+def test_volatility_sort_puts_unknown_last():
+    model = make_model(sort='volatility')
+    model.update_stats('c', '', 3.0)
+    model.update_stats('a', '', 1.0)
+    assert model.lines(100) == [('cells', ['c', 'a']), ('cells', ['b', 'd'])]
+
+
+def test_recent_sort_and_filter():
+    model = make_model(recent_seconds=60)
+    model.set_sort('recent', recent_only=True)
+    model.update('b', 'B', '1 / 99', True, '', 50)
+    model.update('d', 'D', '2 / 98', True, '', 90)
+    assert model.lines(100) == [('cells', ['d', 'b'])]
+    # b 已超过 recent_seconds 没有变化
+    assert model.lines(115) == [('cells', ['d'])]
+
+
+def test_sort_change_invalidates_cache():
+    model = make_model()
+    first = model.lines(100)
+    assert model.lines(100) is first
+    model.set_sort('volatility')
+    assert model.lines(100) is not first
+    with pytest.raises(ValueError):
+        model.set_sort('name')
@@ -0,0 +1,44 @@
+import pytest
+from fixture_server import FixtureServer, MarketFixtures
+from price_source import HttpPriceSource
+
+
+@pytest.fixture
+def server():
+    server = FixtureServer(fixtures=MarketFixtures(num_markets=5, change_rate=0)).start()
+    yield server
+    server.stop()
+
+
+def test_discover_and_fetch_against_fixture_server(server):
+    source = HttpPriceSource(api_base=server.base_url)
+    source.start()
+    try:
+        category = f"{server.base_url}/markets/crypto/bitcoin"
+        hrefs = source.discover_all([category])[category]
+        assert len(hrefs) == 5
+        records = []
+        source.fetch_prices(hrefs, records.append)
+        assert len(records) == 5
+        market_id, yes, no = records[0]
+        assert market_id == 'bitcoin-be-above-1000-on-friday'
+        assert float(yes) + float(no) == pytest.approx(100, abs=0.2)
+    finally:
+        source.stop()
+
+
+def test_fetch_reuses_discovery_response(server, monkeypatch):
+    source = HttpPriceSource(api_base=server.base_url)
+    source.start()
+    calls = []
+    fetch_events = source.fetch_events
+    monkeypatch.setattr(source, 'fetch_events', lambda url: calls.append(url) or fetch_events(url))
+    try:
+        category = f"{server.base_url}/markets/crypto/bitcoin"
+        hrefs = source.discover_all([category])[category]
+        source.fetch_prices(hrefs, lambda record: None)
+        assert len(calls) == 1
+        source.fetch_prices(hrefs, lambda record: None)
+        assert len(calls) == 2
+    finally:
+        source.stop()
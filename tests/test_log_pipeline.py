@@ -0,0 +1,43 @@
+import logging
+import os
+import time
+from log_pipeline import RotatingLogHandler, parse_level, parse_levels
+
+
+def record(message):
+    return logging.LogRecord('test', logging.ERROR, __file__, 1, message, None, None)
+
+
+def test_rotates_by_size_and_keeps_backup_count(tmp_path):
+    path = tmp_path / 'monitor.log'
+    handler = RotatingLogHandler(str(path), max_bytes=100, rotate_seconds=0, backup_count=2)
+    for i in range(20):
+        handler.emit(record('x' * 60))
+    handler.close()
+    rotated = [f for f in os.listdir(tmp_path) if f.startswith('monitor.log.')]
+    assert len(rotated) == 2
+    assert path.stat().st_size <= 100 + 61
+
+
+def test_prunes_files_older_than_retention(tmp_path):
+    old = tmp_path / 'monitor.log.20200101_000000'
+    recent = tmp_path / 'monitor.log.20990101_000000'
+    other = tmp_path / 'other.log.20200101_000000'
+    for f in (old, recent, other):
+        f.write_text('x')
+    stale = time.time() - 10 * 86400
+    for f in (old, other):
+        os.utime(f, (stale, stale))
+    handler = RotatingLogHandler(str(tmp_path / 'monitor.log'), retention_days=7)
+    handler.close()
+    assert not old.exists()
+    assert recent.exists() and other.exists()
+
+
+def test_level_parsing_reports_problems():
+    problems = []
+    assert parse_level('warning') == logging.WARNING
+    assert parse_level('verbose', logging.ERROR, problems) == logging.ERROR
+    levels = parse_levels('summary:INFO, selenium:LOUD', logging.ERROR, problems)
+    assert levels == {'summary': logging.INFO, 'selenium': logging.ERROR}
+    assert len(problems) == 2
@@ -0,0 +1,41 @@
+from metrics import Counter, Histogram, Registry
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    latency = registry.register(Histogram('load_seconds', '页面加载耗时', buckets=(0.1, 1, 5)))
+    for value in (0.05, 0.1, 0.5, 2, 60):
+        latency.observe(value)
+    lines = registry.render().splitlines()
+    assert lines[:2] == ['# HELP load_seconds 页面加载耗时', '# TYPE load_seconds histogram']
+    # 上界包含等于它的值（le），超过最大上界的只计入 +Inf
+    assert lines[2:] == [
+        'load_seconds_bucket{le="0.1"} 2',
+        'load_seconds_bucket{le="1"} 3',
+        'load_seconds_bucket{le="5"} 4',
+        'load_seconds_bucket{le="+Inf"} 5',
+        'load_seconds_sum 62.65',
+        'load_seconds_count 5',
+    ]
+    assert latency.quantile(0.5) == 1
+    assert latency.quantile(1) == float('inf')
+
+
+def test_labelled_counter_escapes_values():
+    registry = Registry()
+    failures = registry.register(Counter('failures_total', '失败次数', label='reason'))
+    failures.inc('timeout')
+    failures.inc('timeout', amount=2)
+    failures.inc('bad "quote" \\ path\nnext')
+    lines = registry.render().splitlines()
+    assert lines[2:] == [
+        'failures_total{reason="bad \\"quote\\" \\\\ path\\nnext"} 1',
+        'failures_total{reason="timeout"} 3',
+    ]
+
+
+def test_unlabelled_counter_renders_zero_and_registry_reuses_metrics():
+    registry = Registry()
+    counter = registry.register(Counter('ticks_total', '价格数'))
+    assert registry.register(Counter('ticks_total', '价格数')) is counter
+    assert registry.render().splitlines()[-1] == 'ticks_total 0'
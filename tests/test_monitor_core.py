@@ -0,0 +1,92 @@
+import configparser
+import json
+import threading
+import time
+from monitor_core import MonitorCore
+from price_source import PriceSource
+
+
+class Prices:
+    def __init__(self):
+        self.received = []
+        self.event = threading.Event()
+
+    def on_price(self, idx, market_id, yes_price, no_price, changed, url):
+        self.received.append((market_id, yes_price, no_price, changed))
+        self.event.set()
+
+
+def make_config(tmp_path, api_base='http://127.0.0.1:1', url='http://127.0.0.1:1/markets/crypto/bitcoin'):
+    config = configparser.ConfigParser()
+    config.read_dict({
+        'Monitor': {'url': url, 'price_source': 'http'},
+        'HttpSource': {'api_base': api_base},
+        'Snapshot': {'enabled': 'true', 'path': str(tmp_path / 'snapshot.json')},
+        'History': {'dir': str(tmp_path / 'ticks')},
+    })
+    return config
+
+
+def test_restored_prices_detect_first_change(tmp_path):
+    config = make_config(tmp_path)
+    category = config.get('Monitor', 'url')
+    (tmp_path / 'snapshot.json').write_text(json.dumps({
+        'time': time.time(), 'category_links': {category: ['/event/abc']}, 'prices': {'abc': ['55', '45']}
+    }))
+    core = MonitorCore(config)
+    assert core.restore_snapshot() is not None
+    prices = Prices()
+    core.add_consumer(prices)
+    core.handle_price(('abc', '55.0', '45'))
+    core.handle_price(('abc', '56', '44'))
+    assert [changed for *_, changed in prices.received] == [False, True]
+
+
+class SlowSource(PriceSource):
+    """抓取时一直等到 release 被设置，模拟停止监控时仍在加载的页面"""
+
+    poll_interval = 0.05
+
+    def __init__(self):
+        self.fetching = threading.Event()
+        self.release = threading.Event()
+
+    def discover(self, category_url):
+        return ['/event/abc']
+
+    def fetch_prices(self, hrefs, on_record):
+        self.fetching.set()
+        self.release.wait(5)
+
+
+def test_restart_does_not_wait_for_the_old_loop(tmp_path):
+    config = make_config(tmp_path)
+    config['Snapshot']['enabled'] = 'false'
+    core = MonitorCore(config)
+    sources = []
+
+    def setup_price_source():
+        core.price_source = SlowSource()
+        sources.append(core.price_source)
+        return True
+    core.setup_price_source = setup_price_source
+    try:
+        assert core.start_monitoring()
+        assert sources[0].fetching.wait(5)
+        first = core.monitor_thread
+        core.stop_monitoring()
+        started = time.time()
+        assert not core.start_monitoring()
+        assert time.time() - started < 0.5
+        assert core.stopping and len(sources) == 1
+        sources[0].release.set()
+        first.join(5)
+        assert not core.stopping
+        assert core.start_monitoring()
+        assert core.monitor_thread is not first and core.monitor_thread.is_alive()
+    finally:
+        core.stop_monitoring()
+        for source in sources:
+            source.release.set()
+        if core.monitor_thread:
+            core.monitor_thread.join(5)
@@ -0,0 +1,51 @@
+from scheduler import PollScheduler
+
+
+def test_token_bucket_limits_batch():
+    scheduler = PollScheduler(min_interval=5, max_interval=60, requests_per_second=2)
+    scheduler.set_markets(['a', 'b', 'c', 'd'], now=1000)
+    assert len(scheduler.next_batch(now=1000)) == 2
+    assert scheduler.next_batch(now=1000) == []
+    assert len(scheduler.next_batch(now=1001)) == 2
+
+
+def test_volatile_markets_poll_faster():
+    scheduler = PollScheduler(min_interval=5, max_interval=60, requests_per_second=100)
+    scheduler.set_markets(['calm', 'busy'], now=1000)
+    scheduler.next_batch(now=1000)
+    for i, yes in enumerate((50, 55, 48, 56)):
+        scheduler.observe('busy', yes, now=1000 + i)
+        scheduler.observe('calm', 50, now=1000 + i)
+    scheduler.next_batch(now=1060)
+    stats = scheduler.stats(now=1060)['markets']
+    assert stats['busy']['interval'] < stats['calm']['interval'] == 60
+
+
+def test_mark_viewed_schedules_immediately():
+    scheduler = PollScheduler(min_interval=5, max_interval=60, requests_per_second=100)
+    scheduler.set_markets(['a'], now=1000)
+    scheduler.next_batch(now=1000)
+    assert scheduler.next_batch(now=1010) == []
+    scheduler.mark_viewed('a', now=1010)
+    assert scheduler.next_batch(now=1010) == ['a']
+    assert scheduler.stats(now=1010)['markets']['a']['interval'] == 5
+
+
+def test_discovery_backs_off_while_unchanged():
+    scheduler = PollScheduler(min_discovery=60, max_discovery=200)
+    assert scheduler.set_markets(['a'], now=1000)
+    assert not scheduler.set_markets(['a'], now=1060)
+    assert scheduler.discovery_interval == 120
+    scheduler.set_markets(['a'], now=1180)
+    assert scheduler.discovery_interval == 200
+    assert scheduler.set_markets(['a', 'b'], now=1380)
+    assert scheduler.discovery_interval == 60
+    assert not scheduler.discovery_due(now=1400)
+    assert scheduler.discovery_due(now=1440)
+
+
+def test_removed_markets_are_skipped():
+    scheduler = PollScheduler(requests_per_second=100)
+    scheduler.set_markets(['a', 'b'], now=1000)
+    scheduler.set_markets(['b'], now=1000)
+    assert scheduler.next_batch(now=1000) == ['b']
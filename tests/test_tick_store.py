@@ -0,0 +1,59 @@
+import time
+from datetime import datetime
+from tick_store import TickStore
+
+
+def test_range_query_is_half_open(tmp_path):
+    store = TickStore(str(tmp_path))
+    now = time.time()
+    for i in range(10):
+        store.append_market('abc', 40 + i, 60 - i, now + i)
+    store.append_market('other', 1, 99, now + 3)
+    store.flush()
+    ticks = store.query_market('abc', now + 2, now + 5)
+    assert [t[1] for t in ticks] == [42, 43, 44]
+    assert ticks[0][0] == now + 2
+    assert store.query_market('abc', now + 100, now + 200) == []
+    assert store.query_market('missing', now, now + 10) == []
+    store.close_files()
+
+
+def test_binance_query(tmp_path):
+    store = TickStore(str(tmp_path))
+    now = time.time()
+    store.append_binance('BTCUSDT', 65000.5, now)
+    store.flush()
+    assert store.query_binance('BTCUSDT', now - 1, now + 1) == [(now, 65000.5)]
+    store.close_files()
+
+
+def test_flush_across_midnight(tmp_path):
+    store = TickStore(str(tmp_path))
+    midnight = datetime(2026, 3, 2).timestamp()
+    store.append_market('abc', 1, 99, midnight + 5)
+    store.flush()
+    # 写过新的一天之后才到达的前一天记录
+    store.append_market('abc', 2, 98, midnight - 5)
+    store.append_market('abc', 3, 97, midnight + 6)
+    store.flush()
+    assert sorted(tmp_path.iterdir()) == [tmp_path / '20260301', tmp_path / '20260302']
+    assert [t[1] for t in store.query_market('abc', midnight - 60, midnight + 60)] == [2, 1, 3]
+    assert list(store.files) == [('20260302', 'm_abc.bin')]
+    store.close_files()
+
+
+def test_open_files_are_capped(tmp_path):
+    store = TickStore(str(tmp_path), max_open_files=3)
+    now = time.time()
+    for i in range(10):
+        store.append_market(f"m{i}", i, 100 - i, now)
+    store.append_market('m0', 50, 50, now + 1)
+    store.flush()
+    # 每个市场都完整写入，但同时只保持最近写过的 3 个文件
+    assert len(store.files) == 3
+    assert [t[1] for t in store.query_market('m0', now, now + 2)] == [0, 50]
+    assert all(len(store.query_market(f"m{i}", now, now + 1)) == 1 for i in range(10))
+    store.append_market('m9', 1, 99, now + 2)
+    store.flush()
+    assert list(store.files)[-1][1] == 'm_m9.bin'
+    store.close_files()
@@ -0,0 +1,188 @@
+import bisect
+import logging
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+# 每条记录固定 24 字节：时间戳、数值 1、数值 2（均为 float64）
+# 市场记录为 (时间, yes, no)，币安记录为 (时间, 价格, nan)
+RECORD = struct.Struct('<ddd')
+FIELDS = 3
+
+
+class TimeColumn:
+    """把映射到内存的记录数组看作时间戳序列，供 bisect 二分查找"""
+
+    def __init__(self, values):
+        self.values = values
+
+    def __len__(self):
+        return len(self.values) // FIELDS
+
+    def __getitem__(self, i):
+        return self.values[i * FIELDS]
+
+
+class TickStore:
+    """只追加的本地价格历史
+
+    每个市场/交易对每天一个文件（DATA/ticks/YYYYMMDD/m_<市场>.bin、b_<交易对>.bin），
+    文件内是按时间递增的定长记录，查询时用 mmap 映射并按时间二分查找，不需要扫描其他市场。
+    append 只在内存中打包，后台线程按批写盘。
+    """
+
+    def __init__(self, base_dir='DATA/ticks', flush_interval=1.0, max_pending=5000, max_open_files=64):
+        self.base_dir = base_dir
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_open_files = max_open_files  # 同时保持打开的追加文件数，超过时关闭最久没写的
+        self.pending = []  # [(文件名, 时间戳, 打包后的记录), ...]
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()  # 写盘线程和查询前的 flush 不能同时写文件
+        self.wakeup = threading.Event()
+        self.files = OrderedDict()  # (日期, 文件名) -> 打开的文件，按最近写入排序
+        self.names = {}  # (类型, 名称) -> 文件名缓存
+        self.current_day = None
+        self.running = False
+        self.thread = None
+        self.written = 0
+
+    def start(self):
+        os.makedirs(self.base_dir, exist_ok=True)
+        self.running = True
+        self.thread = threading.Thread(target=self.writer, daemon=True)
+        self.thread.start()
+        return self
+
+    def close(self):
+        self.running = False
+        self.wakeup.set()
+        if self.thread:
+            self.thread.join(timeout=5)
+        self.flush()
+        self.close_files()
+
+    @staticmethod
+    def file_name(kind, key):
+        return f"{kind}_{re.sub(r'[^A-Za-z0-9_.-]', '_', key)}.bin"
+
+    def append(self, kind, key, timestamp, value1, value2=float('nan')):
+        """记录一条价格，只在内存中打包，耗时在微秒级"""
+        name = self.names.get((kind, key))
+        if name is None:
+            name = self.names[(kind, key)] = self.file_name(kind, key)
+        record = RECORD.pack(timestamp, value1, value2)
+        with self.lock:
+            self.pending.append((name, timestamp, record))
+            full = len(self.pending) >= self.max_pending
+        if full:
+            self.wakeup.set()
+
+    def append_market(self, market_id, yes, no, timestamp=None):
+        self.append('m', market_id, timestamp or time.time(), yes, no)
+
+    def append_binance(self, symbol, price, timestamp=None):
+        self.append('b', symbol, timestamp or time.time(), price)
+
+    def writer(self):
+        while self.running:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logging.error(f"写入价格历史出错: {str(e)}")
+
+    def flush(self):
+        """把待写记录按天、按文件分组后批量追加，也可以在查询前由其他线程调用"""
+        with self.write_lock:
+            with self.lock:
+                pending, self.pending = self.pending, []
+            if not pending:
+                return
+            groups = {}
+            for name, timestamp, record in pending:
+                day = datetime.fromtimestamp(timestamp).strftime('%Y%m%d')
+                groups.setdefault((day, name), []).append((timestamp, record))
+            # 按日期顺序写入，一批记录跨过午夜时先写完前一天再切换到新的一天
+            for (day, name), records in sorted(groups.items()):
+                records.sort(key=lambda r: r[0])
+                data = b''.join(r for _, r in records)
+                if self.current_day is not None and day < self.current_day:
+                    # 已经切换到新的一天后才到达的前一天记录：追加到前一天的文件后立即关闭
+                    with open(self.day_path(day, name), 'ab') as f:
+                        f.write(data)
+                else:
+                    self.open_file(day, name).write(data)
+            for f in self.files.values():
+                f.flush()
+            self.written += len(pending)
+
+    def open_file(self, day, name):
+        if self.current_day is None or day > self.current_day:
+            # 日期变化时关闭前一天的文件
+            self.close_files()
+            self.current_day = day
+        f = self.files.get((day, name))
+        if f is None:
+            f = open(self.day_path(day, name), 'ab')
+            self.files[(day, name)] = f
+            # 市场和交易对很多时只保留最近写过的文件，避免耗尽文件描述符
+            while len(self.files) > self.max_open_files:
+                self.files.popitem(last=False)[1].close()
+        else:
+            self.files.move_to_end((day, name))
+        return f
+
+    def day_path(self, day, name):
+        day_dir = os.path.join(self.base_dir, day)
+        os.makedirs(day_dir, exist_ok=True)
+        return os.path.join(day_dir, name)
+
+    def close_files(self):
+        for f in self.files.values():
+            f.close()
+        self.files = OrderedDict()
+
+    def days_between(self, start, end):
+        """返回时间范围内已有数据的日期目录"""
+        first = datetime.fromtimestamp(start).strftime('%Y%m%d')
+        last = datetime.fromtimestamp(end).strftime('%Y%m%d')
+        if not os.path.isdir(self.base_dir):
+            return []
+        return sorted(d for d in os.listdir(self.base_dir) if first <= d <= last)
+
+    def query(self, kind, key, start, end):
+        """返回 [start, end) 时间范围内的记录 [(时间, 数值 1, 数值 2), ...]"""
+        name = self.file_name(kind, key)
+        results = []
+        for day in self.days_between(start, end):
+            path = os.path.join(self.base_dir, day, name)
+            if not os.path.exists(path) or os.path.getsize(path) < RECORD.size:
+                continue
+            with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                usable = len(mm) - len(mm) % RECORD.size
+                raw = memoryview(mm)
+                values = raw[:usable].cast('d')
+                try:
+                    times = TimeColumn(values)
+                    lo = bisect.bisect_left(times, start)
+                    hi = bisect.bisect_left(times, end, lo)
+                    for i in range(lo, hi):
+                        j = i * FIELDS
+                        results.append((values[j], values[j + 1], values[j + 2]))
+                finally:
+                    values.release()
+                    raw.release()
+        return results
+
+    def query_market(self, market_id, start, end):
+        return self.query('m', market_id, start, end)
+
+    def query_binance(self, symbol, start, end):
+        return [(t, price) for t, price, _ in self.query('b', symbol, start, end)]
@@ -0,0 +1,58 @@
+import threading
+from collections import OrderedDict
+
+
+class UpdateQueue:
+    """生产者线程与 Tk 主循环之间的有界合并队列
+
+    生产者调用 push(key, payload)，同一个 key 只保留最新的 payload；
+    Tk 线程按固定帧率调用 drain() 一次取走全部更新。队列满时丢弃最早的 key。
+    """
+
+    def __init__(self, maxsize=1000):
+        self.maxsize = maxsize
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+        self.pushed = 0     # 累计推入次数
+        self.coalesced = 0  # 被同 key 新值覆盖的次数
+        self.dropped = 0    # 因队列已满被丢弃的次数
+        self.max_depth = 0  # 出现过的最大队列深度
+        self.drains = 0     # 累计取出次数
+
+    def push(self, key, payload, merge=None):
+        """推入一条更新；提供 merge(旧值, 新值) 时用它合并同 key 的旧值"""
+        with self.lock:
+            self.pushed += 1
+            if key in self.items:
+                self.coalesced += 1
+                if merge is not None:
+                    payload = merge(self.items[key], payload)
+                # 移到末尾，保证取出顺序与最近一次推入顺序一致
+                self.items.move_to_end(key)
+            elif len(self.items) >= self.maxsize:
+                self.items.popitem(last=False)
+                self.dropped += 1
+            self.items[key] = payload
+            if len(self.items) > self.max_depth:
+                self.max_depth = len(self.items)
+
+    def drain(self):
+        """取走当前所有更新，返回 [(key, payload), ...]"""
+        with self.lock:
+            items, self.items = self.items, OrderedDict()
+            self.drains += 1
+        return list(items.items())
+
+    def __len__(self):
+        return len(self.items)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'depth': len(self.items),
+                'max_depth': self.max_depth,
+                'pushed': self.pushed,
+                'coalesced': self.coalesced,
+                'dropped': self.dropped,
+                'drains': self.drains
+            }